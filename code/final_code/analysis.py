@@ -0,0 +1,669 @@
+# This module computes the analysis aggregates and renders the charts.
+# Results are cached by data version and filter parameters, so repeated analyses return instantly.
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from PIL import Image
+
+from logic import (
+    DATA_FILE, USER_FILE, CHART_DIRECTORY, START_EPOCH, DURATION,
+    create_chart_directory, load_csv, load_user_weights, participant_names, to_epoch
+)
+from cohorts import PARTICIPANT_ID, participant_ids, selection_bitmap, trip_mask
+from trip_store import session_frame
+from tours import build_tours, summarize_tours
+
+# global constants
+ANALYSIS_CACHE_SIZE = 16
+ANALYSIS_STAGES = ("Daten laden", "Wege filtern", "Kennwerte berechnen", "Diagramme zeichnen")
+SECONDS_PER_DAY = 86400
+
+# Höchste plausible Durchschnittsgeschwindigkeit (km/h) je Verkehrsmittel
+MAX_PLAUSIBLE_SPEED = {
+    "Fuß": 10,
+    "Fahrrad": 45,
+    "MIV": 250,
+    "MIV-Mitfahrer": 250,
+    "ÖV": 320,
+    "Sonstiges": 1000,
+}
+SPEED_PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+SPEED_BINS = np.arange(0, 152, 2)        # km/h, letzte Klasse = "150 und mehr"
+DURATION_BINS = np.arange(0, 185, 5)     # Minuten, letzte Klasse = "180 und mehr"
+
+PROFILE_BIN_MINUTES = (60, 15)           # Auflösungen der Tagesganglinien
+WEEKDAY_NAMES = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+DAY_TYPES = ["Werktag", "Wochenende"]
+
+BOOTSTRAP_REPLICATES = 1000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_CHUNK_CELLS = 5_000_000        # max. Replikate x Personen je Rechenblock (Speicher)
+BOOTSTRAP_PARALLEL_MIN_CELLS = 2_000_000 # darunter lohnt sich kein Prozess-Pool
+
+COLOR_MAP_MODE = {
+    "MIV": "red",
+    "MIV-Mitfahrer": "orange",
+    "Fuß": "lightskyblue",
+    "Fahrrad": "darkblue",
+    "ÖV": "green",
+    "Sonstiges": "pink",
+}
+
+COLOR_MAP_PURPOSE = {
+    "Arbeit": "lightskyblue",
+    "Dienstlich": "blue",
+    "Ausbildung": "darkblue",
+    "Einkauf": "brown",
+    "Erledigung": "red",
+    "Freizeit": "yellow",
+    "Begleitung": "lightgreen",
+}
+
+
+class AnalysisError(Exception):
+    """Fehler während der Auswertung; die Nachricht wird direkt im GUI angezeigt."""
+
+
+class AnalysisCancelled(AnalysisError):
+    """Die Auswertung wurde vom Benutzer abgebrochen."""
+
+
+# ------------------ Daten laden und filtern ------------------
+def load_trips():
+    """
+    Liefert das Wegetagebuch aus dem Sitzungsspeicher (bereits im Arbeitsspeicher, kein Text-Parsing).
+    Neue Zeilen der CSV-Datei werden vorher inkrementell übernommen.
+    """
+    try:
+        df = session_frame()
+    except ValueError as e:
+        raise AnalysisError(f"Datum/Zeit-Umwandlung fehlgeschlagen: {e}")
+    if not len(df):
+        raise AnalysisError("Keine Daten zum Auswerten vorhanden.")
+    return df
+
+
+def load_analysis_trips():
+    """
+    Lädt die Wege und die Benutzerdatei für eine Auswertung.
+    Gibt (df, participants) zurück; ist die Benutzerdatei vorhanden, enthält df die Spalte PARTICIPANT_ID.
+    """
+    df, participants = load_trips(), None
+    user_df = load_csv(USER_FILE)
+    if user_df is not None:
+        participants = participant_names(user_df)
+        df[PARTICIPANT_ID] = participant_ids(df["Benutzer/in"], participants)
+    return df, participants
+
+
+def parse_period(start_date, end_date):
+    """
+    Wandelt einen Analyse-Zeitraum (TT.MM.JJJJ, beide Grenzen inklusive) in Epoch-Grenzen um.
+    Gibt None zurück, wenn nicht beide Daten gesetzt sind.
+    """
+    if not (start_date and end_date):
+        return None
+    try:
+        analysis_start_dt = datetime.strptime(start_date, "%d.%m.%Y")
+        analysis_end_dt = datetime.strptime(end_date, "%d.%m.%Y")
+        analysis_end_dt = analysis_end_dt.replace(hour=23, minute=59, second=59)
+    except ValueError:
+        raise AnalysisError("Analyse-Zeitraum ungültig oder unvollständig.")
+    return to_epoch(analysis_start_dt), to_epoch(analysis_end_dt)
+
+
+def user_mask(df, selected_users, participants=None):
+    """Boolesche Wege-Maske für eine Namensliste oder eine Bitmap über die Teilnehmer/innen."""
+    if participants is None:
+        return df["Benutzer/in"].isin(selected_users).to_numpy()
+    if not isinstance(selected_users, np.ndarray):
+        selected_users = selection_bitmap(participants, selected_users)
+    elif len(selected_users) < len(participants):
+        # Benutzerdatei wurde seit der Auswahl ergänzt: neue Personen sind nicht ausgewählt
+        selected_users = np.append(selected_users, np.zeros(len(participants) - len(selected_users), dtype=bool))
+    return trip_mask(df[PARTICIPANT_ID].to_numpy(), selected_users)
+
+
+def filter_trips(df, selected_users=None, start_date="", end_date="", participants=None):
+    """
+    Filtert nach Analyse-Zeitraum (TT.MM.JJJJ, beide Grenzen inklusive) und Benutzer/innen.
+    Der Zeitraum wird nur angewendet, wenn Start- und Enddatum gesetzt sind.
+    - selected_users: Namensliste oder Bitmap über die Teilnehmer/innen (leer/keine Auswahl = alle)
+    - participants: volle Namen der Benutzerdatei (Position = ID); dann wird über die Spalte
+      PARTICIPANT_ID per Bitmap gefiltert statt per String-Vergleich über alle Wege
+    """
+    period = parse_period(start_date, end_date)
+    if period is not None:
+        df = df[df[START_EPOCH].between(*period)]
+        if df.empty:
+            raise AnalysisError("Keine Einträge im ausgewählten Zeitraum gefunden.")
+
+    if selected_users is not None and np.any(selected_users):
+        df = df[user_mask(df, selected_users, participants)]
+        if df.empty:
+            raise AnalysisError("Keine Einträge für die gewählten Benutzer/innen.")
+    return df
+
+
+# ------------------ Kennwerte ------------------
+def trip_weights(df, user_weights=None):
+    """Gewicht je Weg = Hochrechnungsfaktor der Person (unbekannte Personen: 1)."""
+    if user_weights is None or user_weights.empty:
+        return np.ones(len(df))
+    return df["Benutzer/in"].map(user_weights).fillna(1.0).to_numpy(dtype="float64")
+
+
+def _weighted_percent(keys, weights):
+    """Gewichtete Anteile in Prozent, absteigend sortiert (wie value_counts)."""
+    sums = pd.Series(weights, index=keys.to_numpy()).groupby(level=0).sum()
+    return (sums / sums.sum() * 100).sort_values(ascending=False)
+
+
+def compute_aggregates(df, user_weights=None):
+    """
+    Berechnet Modal Split (Wege/km), Wegezweck-Anteile und durchschnittliche Tageswerte.
+    Mit 'user_weights' (Name -> Hochrechnungsfaktor) werden die Anteile gewichtet;
+    ohne Gewichte entsprechen sie den einfachen Häufigkeiten.
+    """
+    weights = trip_weights(df, user_weights)
+    km = df["Distanz (km)"].fillna(0).to_numpy(dtype="float64")
+    if km.sum() == 0:
+        raise AnalysisError("Keine Distanz vorhanden, kein Diagramm möglich.")
+
+    day_count = (df[START_EPOCH] // SECONDS_PER_DAY).nunique()
+    number_of_ways = len(df)
+    total_distance = df["Distanz (km)"].sum()
+    if day_count > 0:
+        avg_ways = number_of_ways / day_count
+        avg_distance = total_distance / day_count
+    else:
+        avg_ways = 0
+        avg_distance = 0
+
+    return {
+        "ways_by_mode_percent": _weighted_percent(df["Modus"], weights),
+        "km_by_mode_percent": _weighted_percent(df["Modus"], weights * km).sort_index(),
+        "purpose_percent": _weighted_percent(df["Wegezweck"], weights),
+        "avg_ways": avg_ways,
+        "avg_distance": avg_distance,
+        "trip_count": number_of_ways,
+        "day_count": int(day_count),
+        "weighted": bool((weights != 1).any()),
+    }
+
+
+def compute_participant_aggregates(df):
+    """
+    Kennwerte aller Personen in einem gruppierten Durchlauf (statt die Wege je Person neu zu filtern):
+    Wege/km je Verkehrsmittel und Wege je Zweck als Matrizen (Person x Kategorie) per bincount,
+    dazu Wege, km und Tage mit Wegen je Person. Einzelne Personen liest participant_aggregate aus.
+    """
+    user_codes, names = pd.factorize(df["Benutzer/in"], sort=True)
+    mode_codes, modes = pd.factorize(df["Modus"])
+    purpose_codes, purposes = pd.factorize(df["Wegezweck"])
+    day_codes, days = pd.factorize(df[START_EPOCH].to_numpy() // SECONDS_PER_DAY)
+    km = df["Distanz (km)"].fillna(0).to_numpy(dtype="float64")
+    n_users = len(names)
+    # Wege ohne Person (Code -1) gehören zu keiner Zeile
+    known_users = user_codes >= 0
+    users = user_codes[known_users]
+
+    def matrix(codes, n_cat, weights=None):
+        # fehlende Kategorie (Code -1): Weg zählt nicht in die Anteile dieser Matrix
+        known = known_users & (codes >= 0)
+        return np.bincount(
+            user_codes[known] * n_cat + codes[known],
+            weights=None if weights is None else weights[known],
+            minlength=n_users * n_cat,
+        ).reshape(n_users, n_cat)
+
+    return {
+        "names": names,
+        "modes": modes,
+        "purposes": purposes,
+        "ways": matrix(mode_codes, len(modes)),
+        "km": matrix(mode_codes, len(modes), km),
+        "purpose": matrix(purpose_codes, len(purposes)),
+        "trip_count": np.bincount(users, minlength=n_users),
+        "total_km": np.bincount(users, weights=km[known_users], minlength=n_users),
+        "day_count": np.bincount(
+            np.unique(users * len(days) + day_codes[known_users]) // len(days), minlength=n_users
+        ),
+    }
+
+
+def _row_percent(row, categories):
+    """Anteile einer Matrixzeile in Prozent (nur vorkommende Kategorien)."""
+    present = row > 0
+    return pd.Series(row[present] / row.sum() * 100, index=categories[present])
+
+
+def participant_aggregate(table, i):
+    """
+    Kennwerte der Person an Position 'i' aus compute_participant_aggregates,
+    im selben Format wie compute_aggregates (ungewichtet).
+    """
+    if table["total_km"][i] == 0:
+        raise AnalysisError("Keine Distanz vorhanden, kein Diagramm möglich.")
+    day_count = int(table["day_count"][i])
+    return {
+        "ways_by_mode_percent": _row_percent(table["ways"][i], table["modes"]).sort_values(ascending=False),
+        "km_by_mode_percent": _row_percent(table["km"][i], table["modes"]).sort_index(),
+        "purpose_percent": _row_percent(table["purpose"][i], table["purposes"]).sort_values(ascending=False),
+        "avg_ways": table["trip_count"][i] / day_count,
+        "avg_distance": table["total_km"][i] / day_count,
+        "trip_count": int(table["trip_count"][i]),
+        "day_count": day_count,
+        "weighted": False,
+    }
+
+
+def process_pool(workers):
+    """
+    Prozess-Pool für rechenintensive Teile. Die Prozesse werden per "spawn" statt per fork gestartet:
+    die Aufrufe kommen aus Hintergrund-Threads, und ein fork des Tk-Prozesses mit mehreren Threads
+    kann im Kindprozess an einem von einem anderen Thread gehaltenen Lock hängen bleiben.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _bootstrap_chunk(matrices, replicates, seed):
+    """
+    Zieht 'replicates' Bootstrap-Stichproben von Personen (mit Zurücklegen) und gibt je Matrix
+    die Anteile je Replikat zurück. Eine Stichprobe ist ein Vektor von Ziehungshäufigkeiten,
+    die Summen ergeben sich als Matrixprodukt - ohne Schleife über Personen oder Wege.
+    """
+    rng = np.random.default_rng(seed)
+    n_persons = matrices[0].shape[0]
+    block = max(1, BOOTSTRAP_CHUNK_CELLS // max(n_persons, 1))
+    results = [[] for _ in matrices]
+    for done in range(0, replicates, block):
+        draws = rng.multinomial(n_persons, np.full(n_persons, 1 / n_persons), size=min(block, replicates - done))
+        for i, matrix in enumerate(matrices):
+            totals = draws @ matrix
+            with np.errstate(invalid="ignore"):
+                results[i].append(totals / totals.sum(axis=1, keepdims=True) * 100)
+    return [np.vstack(r) for r in results]
+
+
+def compute_bootstrap_intervals(df, user_weights=None, replicates=BOOTSTRAP_REPLICATES, seed=0):
+    """
+    Konfidenzintervalle (Perzentil-Bootstrap) für den gewichteten Modal Split (Wege und km)
+    und die Wegezweck-Anteile. Gezogen werden Personen, nicht einzelne Wege, da die Wege
+    einer Person nicht unabhängig sind. Große Probleme werden auf mehrere CPU-Kerne verteilt.
+    Gibt je Kennzahl ("ways", "km", "purpose") ein DataFrame mit Anteil und Intervallgrenzen zurück.
+    """
+    weights = trip_weights(df, user_weights)
+    km = df["Distanz (km)"].fillna(0).to_numpy(dtype="float64")
+    person, _ = pd.factorize(df["Benutzer/in"])
+    mode, modes = pd.factorize(df["Modus"], sort=True)
+    purpose, purposes = pd.factorize(df["Wegezweck"], sort=True)
+    n_persons = person.max() + 1
+
+    def person_matrix(codes, n_cat, values):
+        # Wege ohne Person oder Kategorie (Code -1) zählen nicht mit
+        known = (person >= 0) & (codes >= 0)
+        flat = np.bincount(person[known] * n_cat + codes[known], weights=values[known], minlength=n_persons * n_cat)
+        return flat.reshape(n_persons, n_cat)
+
+    matrices = [
+        person_matrix(mode, len(modes), weights),
+        person_matrix(mode, len(modes), weights * km),
+        person_matrix(purpose, len(purposes), weights),
+    ]
+
+    workers = os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers > 1 and replicates * n_persons >= BOOTSTRAP_PARALLEL_MIN_CELLS:
+        sizes = [len(part) for part in np.array_split(np.arange(replicates), workers)]
+        with process_pool(workers) as pool:
+            parts = list(pool.map(_bootstrap_chunk, [matrices] * workers, sizes, seeds))
+        samples = [np.vstack([part[i] for part in parts]) for i in range(len(matrices))]
+    else:
+        samples = _bootstrap_chunk(matrices, replicates, seeds[0])
+
+    alpha = (1 - BOOTSTRAP_CONFIDENCE) / 2
+    intervals = {}
+    for key, matrix, labels, sample in zip(("ways", "km", "purpose"), matrices, (modes, modes, purposes), samples):
+        totals = matrix.sum(axis=0)
+        lower, upper = np.nanquantile(sample, [alpha, 1 - alpha], axis=0)
+        intervals[key] = pd.DataFrame({
+            "Anteil (%)": totals / totals.sum() * 100,
+            "KI unten (%)": lower,
+            "KI oben (%)": upper,
+        }, index=pd.Index(labels, name="Kategorie"))
+    return intervals
+
+
+def compute_speed_stats(df):
+    """
+    Reisezeit- und Geschwindigkeitsauswertung über die gefilterte Auswahl (vollständig vektorisiert).
+    Gibt zurück:
+    - "by_mode" / "by_user": Perzentile von Dauer (min) und Geschwindigkeit (km/h), Anzahl unplausibler Wege
+    - "implausible": die als unplausibel markierten Wege
+    - "speed_hist" / "duration_hist": Häufigkeiten je Verkehrsmittel (Zeilen) und Klasse (Spalten)
+    """
+    duration_min = df[DURATION].to_numpy(dtype="float64") / 60
+    distance = df["Distanz (km)"].to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(duration_min > 0, distance / (duration_min / 60), np.nan)
+    max_speed = df["Modus"].map(MAX_PLAUSIBLE_SPEED).fillna(np.inf).to_numpy(dtype="float64")
+    implausible = speed > max_speed
+
+    frame = pd.DataFrame({
+        "Benutzer/in": df["Benutzer/in"].to_numpy(),
+        "Modus": df["Modus"].to_numpy(),
+        "Dauer (min)": duration_min,
+        "Geschwindigkeit (km/h)": speed,
+        "unplausibel": implausible,
+    })
+
+    def summarize(key):
+        grouped = frame.groupby(key)
+        quantiles = grouped[["Dauer (min)", "Geschwindigkeit (km/h)"]].quantile(SPEED_PERCENTILES).unstack()
+        quantiles.columns = [f"{col} P{int(q * 100)}" for col, q in quantiles.columns]
+        quantiles.insert(0, "Wege", grouped.size())
+        quantiles["unplausibel"] = grouped["unplausibel"].sum()
+        return quantiles
+
+    # Histogramme aller Verkehrsmittel in einem Durchlauf: Kombinierter Index (Modus, Klasse)
+    mode_codes, modes = pd.factorize(frame["Modus"], sort=True)
+
+    def histogram(values, bins):
+        classes = np.clip(np.digitize(values, bins) - 1, 0, len(bins) - 2)
+        valid = ~np.isnan(values) & (mode_codes >= 0)     # Code -1 = Modus fehlt
+        flat = mode_codes[valid] * (len(bins) - 1) + classes[valid]
+        counts = np.bincount(flat, minlength=len(modes) * (len(bins) - 1))
+        return pd.DataFrame(counts.reshape(len(modes), len(bins) - 1), index=modes, columns=bins[:-1])
+
+    return {
+        "by_mode": summarize("Modus"),
+        "by_user": summarize("Benutzer/in"),
+        "implausible": df[implausible],
+        "speed_hist": histogram(speed, SPEED_BINS),
+        "duration_hist": histogram(duration_min, DURATION_BINS),
+    }
+
+
+def compute_time_profiles(df):
+    """
+    Tagesganglinien der Abfahrten je Verkehrsmittel und Wegezweck, getrennt nach Werktag/Wochenende.
+    Alles wird per Ganzzahl-Binning auf den Epoch-Sekunden berechnet (ein bincount je Auflösung),
+    ohne Zeilenschleifen oder Datums-Parsing.
+    Gibt zurück:
+    - "profiles": {Auflösung (min): {"Modus"/"Wegezweck": {Tagestyp: DataFrame (Zeitklasse x Kategorie)}}}
+    - "weekday_counts": Wege je Wochentag (Mo-So)
+    """
+    start = df[START_EPOCH].to_numpy()
+    days = start // SECONDS_PER_DAY
+    seconds_of_day = start - days * SECONDS_PER_DAY
+    weekday = (days + 3) % 7                 # 01.01.1970 war ein Donnerstag -> Montag = 0
+    day_type = (weekday >= 5).astype("int64")
+
+    profiles = {}
+    for minutes in PROFILE_BIN_MINUTES:
+        n_bins = SECONDS_PER_DAY // (minutes * 60)
+        time_bin = seconds_of_day // (minutes * 60)
+        labels = [f"{(b * minutes) // 60:02d}:{(b * minutes) % 60:02d}" for b in range(n_bins)]
+        profiles[minutes] = {}
+        for column in ("Modus", "Wegezweck"):
+            codes, categories = pd.factorize(df[column], sort=True)
+            n_cat = len(categories)
+            # fehlende Kategorie (Code -1) wird wie beim groupby nicht mitgezählt
+            known = codes >= 0
+            flat = (day_type[known] * n_cat + codes[known]) * n_bins + time_bin[known]
+            counts = np.bincount(flat, minlength=2 * n_cat * n_bins).reshape(2, n_cat, n_bins)
+            profiles[minutes][column] = {
+                name: pd.DataFrame(counts[i].T, index=labels, columns=categories)
+                for i, name in enumerate(DAY_TYPES)
+            }
+
+    weekday_counts = pd.Series(np.bincount(weekday, minlength=7), index=WEEKDAY_NAMES)
+    return {"profiles": profiles, "weekday_counts": weekday_counts}
+
+
+# ------------------ Diagramme ------------------
+def pie_chart_figure(values, color_map, title):
+    """
+    Zeichnet ein Kreisdiagramm (Angaben in Prozent).
+    Verwendet die objektorientierte Matplotlib-API (kein globaler pyplot-Zustand).
+    """
+    fig = Figure(figsize=(6, 6))
+    ax = fig.add_subplot()
+    ax.pie(
+        values,
+        labels=values.index,
+        autopct="%.1f%%",
+        startangle=140,
+        colors=[color_map.get(v, "grey") for v in values.index],
+    )
+    ax.set_title(title, fontsize=14, fontweight="bold")
+    fig.text(0.5, 0.01, "Angaben in Prozent", ha="center", fontsize=10)
+    fig.tight_layout()
+    return fig
+
+
+def speed_chart_figure(speed_stats):
+    """Zeichnet die Verteilungen von Reisezeit und Geschwindigkeit je Verkehrsmittel (Stufenlinien)."""
+    fig = Figure(figsize=(12, 5))
+    plots = (
+        (speed_stats["duration_hist"], DURATION_BINS, "Reisezeit je Verkehrsmittel", "Dauer (min)"),
+        (speed_stats["speed_hist"], SPEED_BINS, "Geschwindigkeit je Verkehrsmittel", "Geschwindigkeit (km/h)"),
+    )
+    for i, (hist, bins, title, xlabel) in enumerate(plots, start=1):
+        ax = fig.add_subplot(1, 2, i)
+        for mode, counts in hist.iterrows():
+            ax.stairs(counts.to_numpy(), bins, label=mode, color=COLOR_MAP_MODE.get(mode, "grey"), linewidth=2)
+        ax.set_title(title, fontsize=14, fontweight="bold")
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel("Anzahl Wege")
+        ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def time_profile_chart_figure(time_profiles, minutes=PROFILE_BIN_MINUTES[0]):
+    """Zeichnet die Tagesganglinien als gestapelte Flächendiagramme (Modus/Wegezweck x Werktag/Wochenende)."""
+    fig = Figure(figsize=(12, 8))
+    profiles = time_profiles["profiles"][minutes]
+    color_maps = {"Modus": COLOR_MAP_MODE, "Wegezweck": COLOR_MAP_PURPOSE}
+    for row, column in enumerate(("Modus", "Wegezweck")):
+        for col, day_type in enumerate(DAY_TYPES):
+            ax = fig.add_subplot(2, 2, row * 2 + col + 1)
+            profile = profiles[column][day_type]
+            x = np.arange(len(profile)) * minutes / 60
+            ax.stackplot(
+                x,
+                profile.to_numpy().T,
+                labels=profile.columns,
+                colors=[color_maps[column].get(c, "grey") for c in profile.columns],
+                step="post",
+            )
+            ax.set_title(f"Abfahrten nach {column} ({day_type})", fontsize=12, fontweight="bold")
+            ax.set_xlim(0, 24)
+            ax.set_xticks(range(0, 25, 3))
+            ax.set_xlabel("Uhrzeit (h)")
+            ax.set_ylabel("Anzahl Wege")
+            ax.legend(fontsize=8, loc="upper left")
+    fig.tight_layout()
+    return fig
+
+
+def chart_figures(aggregates):
+    """
+    Erzeugt alle Standard-Diagramme als Figure-Objekte: Schlüssel -> (Dateiname ohne Endung, Figure).
+    Diagramme, deren Kennwerte fehlen (z.B. "speed"), werden übersprungen.
+    """
+    note = " (gewichtet)" if aggregates["weighted"] else ""
+    pies = {
+        "ways": (aggregates["ways_by_mode_percent"], COLOR_MAP_MODE, "Modal Split Wege" + note, "modal_split_ways"),
+        "km": (aggregates["km_by_mode_percent"], COLOR_MAP_MODE, "Modal Split Personenkilometer" + note, "modal_split_km"),
+        "purpose": (aggregates["purpose_percent"], COLOR_MAP_PURPOSE, "Verkehrsaufkommen (Wege)" + note, "verkehrsaufkommen_wege"),
+    }
+    figures = {key: (name, pie_chart_figure(values, colors, title)) for key, (values, colors, title, name) in pies.items()}
+    if "speed" in aggregates:
+        figures["speed"] = ("reisezeit_geschwindigkeit", speed_chart_figure(aggregates["speed"]))
+    if "time_profiles" in aggregates:
+        figures["time_profiles"] = ("tagesganglinien", time_profile_chart_figure(aggregates["time_profiles"]))
+    return figures
+
+
+def render_charts(aggregates, suffix=""):
+    """Rendert die Standard-Diagramme und gibt ihre Dateipfade zurück."""
+    create_chart_directory()
+    paths = {}
+    for key, (name, fig) in chart_figures(aggregates).items():
+        paths[key] = os.path.join(CHART_DIRECTORY, f"{name}{suffix}.png")
+        fig.savefig(paths[key])
+    return paths
+
+
+# ------------------ Ergebnis-Cache ------------------
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+
+def data_version(file_name=DATA_FILE):
+    """Version der Datendatei: ändert sich mit jedem Schreibvorgang (Größe/Änderungszeit)."""
+    try:
+        st = os.stat(file_name)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def invalidate_analysis_cache():
+    """Leert den Cache (nach dem Speichern eines Eintrags oder dem Zurücksetzen aller Daten)."""
+    with _analysis_cache_lock:
+        _analysis_cache.clear()
+
+
+def _cache_key(selected_users, start_date, end_date):
+    if selected_users is None or not np.any(selected_users):
+        users = None
+    elif isinstance(selected_users, np.ndarray):
+        # Bitmap: kompakter Fingerabdruck statt Zehntausender Namen im Schlüssel
+        users = hashlib.sha1(np.packbits(selected_users).tobytes()).hexdigest()
+    else:
+        users = tuple(sorted(selected_users))
+    # Die Benutzerdatei enthält die Gewichte und gehört deshalb mit zur Datenversion
+    return (data_version(), data_version(USER_FILE), users, start_date, end_date)
+
+
+def run_analysis(selected_users=None, start_date="", end_date="", progress=None):
+    """
+    Führt die komplette Auswertung aus (laden, filtern, Kennwerte, Diagramme).
+    'selected_users' ist eine Namensliste oder eine Bitmap über die Zeilen der Benutzerdatei (z.B. eine Kohorte).
+    Ergebnisse werden nach (Datenversion, Benutzer/innen, Zeitraum) zwischengespeichert;
+    ein Treffer liefert Kennwerte und bereits gerenderte Diagramme ohne Neuberechnung.
+    'progress' wird vor jedem Teilschritt mit dem Index der Stufe (ANALYSIS_STAGES) aufgerufen und darf
+    AnalysisCancelled auslösen, um die Auswertung abzubrechen.
+    """
+    progress = progress or (lambda stage: None)
+    progress(0)
+    key = _cache_key(selected_users, start_date, end_date)
+    with _analysis_cache_lock:
+        cached = _analysis_cache.get(key)
+        if cached is not None and all(os.path.exists(p) for p in cached["charts"].values()):
+            _analysis_cache.move_to_end(key)
+            return cached
+
+    df, participants = load_analysis_trips()
+    progress(1)
+    df = filter_trips(df, selected_users, start_date, end_date, participants)
+    progress(2)
+    user_weights = load_user_weights()
+    aggregates = compute_aggregates(df, user_weights)
+    steps = (
+        ("confidence", lambda: compute_bootstrap_intervals(df, user_weights)),
+        ("speed", lambda: compute_speed_stats(df)),
+        ("time_profiles", lambda: compute_time_profiles(df)),
+        ("tours", lambda: summarize_tours(build_tours(df))),
+    )
+    for name, step in steps:
+        progress(2)
+        aggregates[name] = step()
+    progress(3)
+    # Eindeutiger Dateiname pro Cache-Eintrag, damit sich Ergebnisse nicht überschreiben
+    suffix = "_" + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:10]
+    result = dict(aggregates, charts=render_charts(aggregates, suffix))
+
+    with _analysis_cache_lock:
+        _analysis_cache[key] = result
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _, evicted = _analysis_cache.popitem(last=False)
+            for path in evicted["charts"].values():
+                if os.path.exists(path):
+                    os.remove(path)
+    return result
+
+
+class BackgroundJob:
+    """
+    Führt eine Funktion in einem Hintergrund-Thread aus. Die Funktion erhält das Schlüsselwort 'progress',
+    einen Rückruf, mit dem sie ihren Fortschritt meldet (z.B. eine Stufe oder (fertig, gesamt)); nach cancel()
+    löst dieser Rückruf AnalysisCancelled aus. Der UI-Thread fragt Fortschritt und Ergebnis per poll() ab
+    (z.B. mit after()), Tk wird also nie aus dem Thread heraus benutzt.
+    """
+
+    def __init__(self, function, *args, initial_progress=None, **kwargs):
+        self.progress = initial_progress
+        self.cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.future = executor.submit(function, *args, progress=self._report, **kwargs)
+        executor.shutdown(wait=False)
+
+    def _report(self, value):
+        if self.cancelled.is_set():
+            raise AnalysisCancelled("Abgebrochen.")
+        self.progress = value
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def poll(self):
+        """
+        None, solange die Funktion läuft, danach ihr Ergebnis.
+        Ihre Fehler (auch AnalysisCancelled) werden hier im aufrufenden Thread ausgelöst.
+        """
+        if not self.future.done():
+            return None
+        return self.future.result()
+
+
+def _analysis_with_images(selected_users, start_date, end_date, progress):
+    result = run_analysis(selected_users, start_date, end_date, progress)
+    progress(len(ANALYSIS_STAGES) - 1)
+    # Bilder schon hier dekodieren, im UI-Thread bleibt nur das Erzeugen der PhotoImages
+    images = {}
+    try:
+        for key, path in result["charts"].items():
+            with Image.open(path) as img:
+                img.load()
+                images[key] = img.copy()
+    except OSError as e:
+        raise AnalysisError(f"Fehler beim Laden der Diagramme: {e}")
+    return result, images
+
+
+class AnalysisJob(BackgroundJob):
+    """
+    run_analysis im Hintergrund; der Fortschritt ist der Index der Stufe (ANALYSIS_STAGES),
+    das Ergebnis (Ergebnis, Diagrammbilder je Schlüssel).
+    """
+
+    def __init__(self, selected_users=None, start_date="", end_date=""):
+        super().__init__(_analysis_with_images, selected_users, start_date, end_date, initial_progress=0)
@@ -0,0 +1,111 @@
+# This module provides type-ahead suggestions for the address search on the map.
+# Suggestions come from a local prefix index (addresses used in the diary, geocode cache, gazetteer); remote lookups run in a thread.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from geocoding import MAX_SUGGESTIONS, GazetteerProvider, normalize_address
+from widgets import PrefixIndex
+
+# global constants
+REMOTE_MIN_CHARS = 3        # kürzere Eingaben werden nicht an Online-Dienste geschickt
+
+
+class AddressIndex:
+    """
+    Lokaler Vorschlagsindex: jede Adresse einmal (normalisiert), mit Anzeigetext, Häufigkeit im
+    Wegetagebuch und (falls bekannt) Koordinaten. Eine Abfrage ist eine Binärsuche je Suchwort
+    plus eine Sortierung der Treffer nach Häufigkeit, also auch bei vielen Adressen wenige Millisekunden.
+    """
+
+    def __init__(self, entries):
+        """'entries': iterierbar aus (Anzeigetext, Häufigkeit, (lat, lon) oder None)."""
+        texts, counts, coordinates, positions = [], [], [], {}
+        for text, count, location in entries:
+            key = normalize_address(text)
+            if not key:
+                continue
+            if key in positions:
+                i = positions[key]
+                counts[i] += count
+                coordinates[i] = coordinates[i] or location
+                continue
+            positions[key] = len(texts)
+            texts.append(str(text).strip())
+            counts.append(count)
+            coordinates.append(location)
+        self.texts = texts
+        self.counts = np.asarray(counts, dtype="int64")
+        self.coordinates = coordinates
+        self.index = PrefixIndex(texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        """Bis zu 'limit' passende Adressen als (Text, (lat, lon) oder None), häufig benutzte zuerst."""
+        hits = self.index.search(query)
+        if hits is None or len(hits) == 0:
+            return []
+        if len(hits) > limit:
+            # nur die 'limit' häufigsten vollständig sortieren
+            hits = hits[np.argpartition(-self.counts[hits], limit - 1)[:limit]]
+        hits = hits[np.lexsort((hits, -self.counts[hits]))]
+        return [(self.texts[i], self.coordinates[i]) for i in hits]
+
+
+def build_address_index(store, geocoder):
+    """
+    Baut den Index aus den Adressen des Sitzungsspeichers (gezählt über Start- und Endpunkte),
+    den Einträgen des Geocode-Caches und eines Ortsverzeichnisses der Geocoder-Kette.
+    """
+    places = store.dictionary.values["place"]
+    codes = np.concatenate([store.records["start_place"], store.records["end_place"]])
+    counts = np.bincount(codes[codes >= 0], minlength=len(places))
+    cache = geocoder.cache.coordinates if geocoder.cache is not None else {}
+    entries = [(text, int(count), cache.get(normalize_address(text))) for text, count in zip(places, counts)]
+    entries += [(text, 0, location) for text, location in cache.items()]
+    for provider in geocoder.providers:
+        if isinstance(provider, GazetteerProvider):
+            entries += [(provider.names[key], 0, location) for key, location in provider.coordinates.items()]
+    return AddressIndex(entries)
+
+
+class RemoteSuggestions:
+    """
+    Fragt Vorschläge der Online-Anbieter in einem Hintergrund-Thread ab. Es läuft höchstens eine Anfrage;
+    eine neue Eingabe ersetzt eine noch wartende (nicht die gerade laufende) Anfrage.
+    """
+
+    def __init__(self, geocoder):
+        self.geocoder = geocoder
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.query = None
+
+    def request(self, query):
+        if len(query) < REMOTE_MIN_CHARS:
+            self.query, self.future = None, None
+            return
+        if self.future is not None and not self.future.running():
+            self.future.cancel()
+        self.query = query
+        self.future = self.executor.submit(self.geocoder.suggest, query)
+
+    @property
+    def pending(self):
+        return self.future is not None
+
+    def poll(self):
+        """(Anfrage, Vorschläge), sobald die zuletzt gestellte Anfrage fertig ist, sonst None."""
+        if self.future is None or not self.future.done() or self.future.cancelled():
+            return None
+        future, self.future = self.future, None
+        try:
+            return self.query, future.result()
+        except Exception:
+            return self.query, []
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
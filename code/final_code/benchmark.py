@@ -0,0 +1,246 @@
+# This module contains small benchmarks for the performance-critical parts of the application.
+# Run e.g. "python benchmark.py writers --writers 8 --rows 200" or
+# "python benchmark.py reports --participants 10000 --workers 1 4 8" or
+# "python benchmark.py store --trips 1000000" or "python benchmark.py routing --grid 200" from the final_code folder.
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from logic import START_EPOCH, END_EPOCH, DURATION, save_many_to_csv, save_to_csv
+from analysis import COLOR_MAP_MODE, COLOR_MAP_PURPOSE, compute_participant_aggregates
+from binary_trips import sync_binary_trips
+from report import write_participant_reports
+from trip_store import TripStore
+from routing import RoadGraph
+
+
+def _sample_trip(writer_id, i):
+    """Erzeugt einen künstlichen Wegeeintrag für die Benchmarks."""
+    return {
+        "Benutzer/in": f"Schreiber {writer_id}",
+        START_EPOCH: 1735718400,   # 01.01.2025 08:00
+        END_EPOCH: 1735720200,     # 01.01.2025 08:30
+        DURATION: 1800,
+        "Startpunkt": "49.00937, 8.40444",
+        "Endpunkt": "49.01234, 8.41234",
+        "Distanz (km)": 1.0 + i,
+        "Modus": "Fahrrad",
+        "Wegezweck": "Arbeit",
+    }
+
+
+# ------------------ Parallele Schreibzugriffe ------------------
+def _writer_process(file_name, writer_id, rows, batch_size, start_event):
+    start_event.wait()
+    batch = []
+    for i in range(rows):
+        batch.append(_sample_trip(writer_id, i))
+        if len(batch) >= batch_size:
+            save_many_to_csv(batch, file_name)
+            batch = []
+    save_many_to_csv(batch, file_name)
+
+
+def benchmark_concurrent_writers(writers=4, rows=200, batch_size=1):
+    """
+    Startet 'writers' Prozesse, die gleichzeitig je 'rows' Zeilen in dieselbe CSV-Datei schreiben.
+    Gibt Zeilen pro Sekunde zurück und prüft, dass keine Zeile verloren ging oder zerstückelt wurde.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, "traffic_diary.csv")
+        start_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=_writer_process,
+                args=(file_name, w, rows, batch_size, start_event)
+            )
+            for w in range(writers)
+        ]
+        for p in processes:
+            p.start()
+        t0 = time.perf_counter()
+        start_event.set()
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - t0
+
+        df = pd.read_csv(file_name)
+        expected = writers * rows
+        if len(df) != expected or df["Distanz (km)"].isna().any():
+            raise RuntimeError(f"Datei inkonsistent: {len(df)} statt {expected} Zeilen.")
+        counts = df["Benutzer/in"].value_counts()
+        if not (counts == rows).all():
+            raise RuntimeError("Zeilen einzelner Schreiber fehlen.")
+    return expected / elapsed
+
+
+# ------------------ Einzelberichte ------------------
+def _sample_diary(participants, trips_per_participant, seed=0):
+    """Künstliches Wegetagebuch mit zufälligen Verkehrsmitteln, Zwecken, Distanzen und Tagen (Januar 2025)."""
+    rng = np.random.default_rng(seed)
+    n = participants * trips_per_participant
+    start = 1735718400 + rng.integers(0, 31 * 86400, n)
+    duration = rng.integers(300, 3600, n)
+    return pd.DataFrame({
+        "Benutzer/in": np.repeat([f"Person {i}" for i in range(participants)], trips_per_participant),
+        START_EPOCH: start,
+        END_EPOCH: start + duration,
+        DURATION: duration,
+        "Startpunkt": "49.00937, 8.40444",
+        "Endpunkt": "49.01234, 8.41234",
+        "Distanz (km)": rng.random(n) * 20,
+        "Modus": rng.choice(list(COLOR_MAP_MODE), n),
+        "Wegezweck": rng.choice(list(COLOR_MAP_PURPOSE), n),
+    })
+
+
+def benchmark_participant_reports(participants=10000, trips=40, workers=None, formats=("html",)):
+    """
+    Erzeugt Einzelberichte für 'participants' Personen mit je 'trips' Wegen.
+    Gibt (Sekunden für die gruppierten Kennwerte, Berichte pro Sekunde insgesamt) zurück.
+    """
+    df = _sample_diary(participants, trips)
+    t0 = time.perf_counter()
+    compute_participant_aggregates(df)
+    aggregate_time = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        t0 = time.perf_counter()
+        results = write_participant_reports(df, formats=formats, directory=tmp_dir, workers=workers)
+        elapsed = time.perf_counter() - t0
+        written = sum(1 for _, paths, _ in results if paths)
+        if written != participants:
+            raise RuntimeError(f"Nur {written} von {participants} Berichten erstellt.")
+    return aggregate_time, participants / elapsed
+
+
+# ------------------ Sitzungsspeicher ------------------
+def benchmark_trip_store(trips=1000000, participants=2000):
+    """
+    Lädt ein künstliches Wegetagebuch in den Sitzungsspeicher und misst Ladezeit,
+    Speicherbedarf je Weg (Puffer und Wörterbuch, per tracemalloc), Zeit für ein
+    Analyse-DataFrame und Zeit für das Übernehmen eines neu gespeicherten Weges.
+    """
+    df = _sample_diary(participants, max(1, trips // participants))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, "traffic_diary.csv")
+        df.to_csv(file_name, index=False)
+        sync_binary_trips(file_name)        # einmaliger Aufbau der Binärdatei, nicht Teil der Messung
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        store = TripStore(file_name)
+        store.refresh()
+        load_time = time.perf_counter() - t0
+        bytes_per_trip = tracemalloc.get_traced_memory()[0] / len(store)
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        store.frame()
+        frame_time = time.perf_counter() - t0
+
+        save_to_csv(_sample_trip(0, 0), file_name)
+        t0 = time.perf_counter()
+        store.refresh()
+        append_time = time.perf_counter() - t0
+    return len(store), load_time, bytes_per_trip, frame_time, append_time
+
+
+# ------------------ Routing ------------------
+def _grid_edges(size, spacing_deg=0.001, seed=0):
+    """Künstliches Straßennetz: Gitter aus size x size Knoten (ca. 100 m Abstand), ein Teil der Kanten Einbahn."""
+    rng = np.random.default_rng(seed)
+    i, j = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    lat, lon = 49.0 + i * spacing_deg, 8.4 + j * spacing_deg
+    right, down = j < size - 1, i < size - 1
+    edges = pd.DataFrame({
+        "Von_Lat": np.concatenate([lat[right], lat[down]]),
+        "Von_Lon": np.concatenate([lon[right], lon[down]]),
+        "Nach_Lat": np.concatenate([lat[right], lat[down] + spacing_deg]),
+        "Nach_Lon": np.concatenate([lon[right] + spacing_deg, lon[down]]),
+    })
+    edges["Einbahn"] = np.where(rng.random(len(edges)) < 0.05, 1, np.nan)
+    return edges
+
+
+def benchmark_routing(size=200, pairs=1000, trip_km=3.0, seed=0):
+    """
+    Routet 'pairs' zufällige Start-Ziel-Paare (ca. 'trip_km' Luftlinie) auf einem Gitternetz mit size x size
+    Knoten. Gibt (Knoten, Aufbauzeit, Routen/s ohne Cache, Routen/s bei wiederholten Paaren aus dem Cache) zurück.
+    """
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    graph = RoadGraph(_grid_edges(size), "car")
+    build_time = time.perf_counter() - t0
+
+    # Paare mit Start und Ziel im Netz, Versatz je Achse bis etwa trip_km
+    steps = max(1, int(trip_km / 0.1))
+    start = rng.integers(0, size, (pairs, 2))
+    end = np.clip(start + rng.integers(-steps, steps + 1, (pairs, 2)), 0, size - 1)
+    nodes = [
+        (graph.nearest_node(49.0 + a * 0.001, 8.4 + b * 0.001), graph.nearest_node(49.0 + c * 0.001, 8.4 + d * 0.001))
+        for (a, b), (c, d) in zip(start, end)
+    ]
+
+    t0 = time.perf_counter()
+    for source, target in nodes:
+        graph.route_length(source, target)
+    uncached = pairs / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for source, target in nodes:
+        graph.route_length(source, target)
+    cached = pairs / (time.perf_counter() - t0)
+    return len(graph.node_lat), build_time, uncached, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks für das Traffic Diary Analysis Tool")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    writers_parser = sub.add_parser("writers", help="Parallele Schreibzugriffe auf die CSV-Datei")
+    writers_parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    writers_parser.add_argument("--rows", type=int, default=200)
+    writers_parser.add_argument("--batch-size", type=int, default=1)
+
+    reports_parser = sub.add_parser("reports", help="Einzelberichte für viele Personen")
+    reports_parser.add_argument("--participants", type=int, default=10000)
+    reports_parser.add_argument("--trips", type=int, default=40, help="Wege je Person")
+    reports_parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1])
+    reports_parser.add_argument("--formats", nargs="+", default=["html"], choices=["html", "pdf"])
+
+    store_parser = sub.add_parser("store", help="Sitzungsspeicher: Laden, Speicher je Weg, Anhängen")
+    store_parser.add_argument("--trips", type=int, default=1000000)
+
+    routing_parser = sub.add_parser("routing", help="Netzdistanzen auf einem künstlichen Straßengitter")
+    routing_parser.add_argument("--grid", type=int, default=200, help="Knoten je Gitterkante")
+    routing_parser.add_argument("--pairs", type=int, default=1000)
+    routing_parser.add_argument("--trip-km", type=float, default=3.0)
+
+    args = parser.parse_args()
+    if args.benchmark == "writers":
+        for n in args.writers:
+            rate = benchmark_concurrent_writers(n, args.rows, args.batch_size)
+            print(f"{n:>3} Schreiber: {rate:10.0f} Zeilen/s")
+    elif args.benchmark == "reports":
+        for n in args.workers:
+            aggregate_time, rate = benchmark_participant_reports(args.participants, args.trips, n, args.formats)
+            print(f"{n:>3} Prozesse: Kennwerte {aggregate_time:6.2f} s, {rate:8.1f} Berichte/s")
+    elif args.benchmark == "store":
+        count, load_time, bytes_per_trip, frame_time, append_time = benchmark_trip_store(args.trips)
+        print(f"{count} Wege: Laden {load_time:.2f} s, {bytes_per_trip:.1f} Bytes/Weg, "
+              f"DataFrame {frame_time:.2f} s, neuer Eintrag {append_time * 1000:.1f} ms")
+    elif args.benchmark == "routing":
+        nodes, build_time, uncached, cached = benchmark_routing(args.grid, args.pairs, args.trip_km)
+        print(f"{nodes} Knoten: Aufbau {build_time:.2f} s, {uncached:8.0f} Routen/s, "
+              f"{cached:8.0f} Routen/s aus dem Cache")
+
+
+if __name__ == "__main__":
+    main()
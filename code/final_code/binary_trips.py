@@ -0,0 +1,390 @@
+# This module maintains a fixed-width binary copy of the traffic diary for fast analyses.
+# The CSV file stays the source of truth; the binary file is appended with every new CSV delta and read via np.memmap.
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from logic import (
+    DATA_FILE, START_EPOCH, END_EPOCH, DURATION, TRIP_COLUMNS, TRIP_DTYPES, TMP_SUFFIX,
+    START_LAT, START_LON, END_LAT, END_LON, convert_legacy_trips, file_lock
+)
+from tours import point_coordinates
+
+# global constants
+BINARY_SUFFIX = ".bin"
+DICTIONARY_SUFFIX = ".dict"
+MAGIC = b"TDTRIPS4"
+FINGERPRINT_BYTES = 256         # so viele Bytes vor dem Abgleichstand kennzeichnen den bereits gelesenen CSV-Inhalt
+# Kopf: Kennung, Datensatzlänge, Anzahl gültiger Datensätze, Generation (Zufallszahl je Neuaufbau) sowie
+# Inode, Größe, Änderungszeit und Fingerabdruck (Hash der letzten gelesenen Bytes) der CSV-Datei beim letzten Abgleich
+HEADER = np.dtype([
+    ("magic", "S8"), ("itemsize", "<u8"), ("count", "<u8"), ("generation", "<u8"),
+    ("csv_ino", "<u8"), ("csv_size", "<u8"), ("csv_mtime", "<i8"), ("csv_tail", "<u8"),
+])
+
+# Ein Weg = ein Datensatz fester Länge (56 Bytes); Texte liegen als Codes im Wörterbuch
+TRIP_RECORD = np.dtype([
+    ("user", "<i4"),
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("duration", "<i4"),        # gespeicherte Dauer (kann bei fehlerhaften Zeilen von end - start abweichen)
+    ("start_lat", "<f4"),
+    ("start_lon", "<f4"),
+    ("end_lat", "<f4"),
+    ("end_lon", "<f4"),
+    ("distance", "<f4"),
+    ("mode", "<i2"),
+    ("purpose", "<i2"),
+    ("start_place", "<i4"),     # Adresstext, -1 bei Koordinaten
+    ("end_place", "<i4"),
+])
+
+# Wörterbuch-Arten und die zugehörigen CSV-Spalten
+_TEXT_FIELDS = {"user": "Benutzer/in", "mode": "Modus", "purpose": "Wegezweck"}
+
+
+def binary_path(csv_file=DATA_FILE):
+    return os.path.splitext(csv_file)[0] + BINARY_SUFFIX
+
+
+def dictionary_path(csv_file=DATA_FILE):
+    return os.path.splitext(csv_file)[0] + DICTIONARY_SUFFIX
+
+
+class TextTable:
+    """Texte je Art (Name, Verkehrsmittel, Wegezweck, Adresse); der Code eines Textes ist seine Position."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def decode(self, kind, codes):
+        """Texte zu Codes als Object-Array (ohne Parsen, nur ein Gather); -1 ergibt NaN."""
+        table = np.array(self.values[kind] + [np.nan], dtype=object)
+        return table[codes]
+
+
+class TripDictionary(TextTable):
+    """
+    Nur anhängbares Wörterbuch für Namen, Verkehrsmittel, Wegezwecke und Adressen.
+    Jede Zeile der Datei ist ein JSON-Paar [Art, Text]; der Code ist die laufende Nummer je Art,
+    dadurch bleiben bereits geschriebene Codes stabil.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._reset()
+        self.refresh()
+
+    def _reset(self):
+        self.values = {kind: [] for kind in (*_TEXT_FIELDS, "place")}
+        self.codes = {kind: {} for kind in self.values}
+        self.offset = 0
+        self.ino = None
+        self.last_line = b""
+
+    def _unchanged(self, f):
+        """Prüft, ob die Datei noch die bereits gelesene ist (gleiche Inode, letzte gelesene Zeile an ihrem Platz)."""
+        st = os.fstat(f.fileno())
+        if st.st_ino != self.ino or st.st_size < self.offset:
+            return False
+        f.seek(self.offset - len(self.last_line))
+        return f.read(len(self.last_line)) == self.last_line
+
+    def _consumed(self, complete):
+        """Merkt sich gelesene bzw. selbst geschriebene vollständige Zeilen."""
+        if complete:
+            self.last_line = complete[complete.rfind(b"\n", 0, len(complete) - 1) + 1:]
+            self.offset += len(complete)
+
+    def refresh(self):
+        """
+        Liest nur die seit dem letzten Aufruf angehängten Einträge der Datei. Wurde die Datei
+        ersetzt oder gelöscht (Neuaufbau), wird sie beim nächsten Mal vollständig neu gelesen.
+        """
+        if not os.path.exists(self.file_name):
+            self._reset()
+            return
+        with open(self.file_name, "rb") as f:
+            if not self._unchanged(f):
+                self._reset()
+                self.ino = os.fstat(f.fileno()).st_ino
+            f.seek(self.offset)
+            tail = f.read()
+        # eine gerade erst angehängte, unvollständige Zeile wird noch nicht gelesen
+        complete = tail[:tail.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            if line.strip():
+                kind, value = json.loads(line)
+                self._add(kind, value)
+        self._consumed(complete)
+
+    def _add(self, kind, value):
+        self.codes[kind][value] = len(self.values[kind])
+        self.values[kind].append(value)
+
+    def encode(self, kind, values):
+        """Codes für eine Series; unbekannte Texte werden angehängt, fehlende Werte ergeben -1."""
+        codes, uniques = pd.factorize(values)
+        new = [v for v in uniques if v not in self.codes[kind]]
+        if new:
+            payload = "".join(json.dumps([kind, value], ensure_ascii=False) + "\n" for value in new).encode("utf-8")
+            self._repair_tail()
+            with open(self.file_name, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                self.ino = os.fstat(f.fileno()).st_ino
+            for value in new:
+                self._add(kind, value)
+            self._consumed(payload)
+        mapping = np.array([self.codes[kind][v] for v in uniques] + [-1], dtype="int64")
+        return mapping[codes]
+
+    def _repair_tail(self):
+        """
+        Bringt das Wörterbuch auf den Stand der Datei und schneidet eine unvollständige letzte Zeile ab
+        (Rest eines abgebrochenen Schreibvorgangs; geschrieben wird nur unter der Sperre der CSV-Datei),
+        damit die nächste Zeile nicht an sie angehängt wird. Danach steht der Lesezeiger am Dateiende.
+        """
+        self.refresh()
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, "r+b") as f:
+            if f.seek(0, os.SEEK_END) > self.offset:
+                f.truncate(self.offset)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def snapshot(self):
+        """Kopie der Texte, die sich lesen lässt, während das Wörterbuch weiter wächst (z.B. aus einem anderen Thread)."""
+        return TextTable({kind: list(values) for kind, values in self.values.items()})
+
+
+def encode_trips(df, dictionary):
+    """Wandelt Wege im CSV-Schema in ein strukturiertes Array (TRIP_RECORD) um."""
+    records = np.zeros(len(df), dtype=TRIP_RECORD)
+    for kind, column in _TEXT_FIELDS.items():
+        records[kind] = dictionary.encode(kind, df[column])
+    records["start"] = df[START_EPOCH].to_numpy()
+    records["end"] = df[END_EPOCH].to_numpy()
+    records["duration"] = df[DURATION].to_numpy()
+    records["distance"] = pd.to_numeric(df["Distanz (km)"], errors="coerce").to_numpy(dtype="float64")
+    for prefix, column in (("start", "Startpunkt"), ("end", "Endpunkt")):
+        lat, lon = point_coordinates(df[column])
+        records[f"{prefix}_lat"] = lat
+        records[f"{prefix}_lon"] = lon
+        # Nur Adressen kommen ins Wörterbuch; Koordinaten stehen bereits in lat/lon
+        addresses = df[column].where(np.isnan(lat))
+        records[f"{prefix}_place"] = dictionary.encode("place", addresses)
+    return records
+
+
+def _read_header(f):
+    raw = f.read(HEADER.itemsize)
+    if len(raw) < HEADER.itemsize:
+        return None
+    header = np.frombuffer(raw, dtype=HEADER).copy()[0]
+    if header["magic"] != MAGIC or header["itemsize"] != TRIP_RECORD.itemsize:
+        return None
+    return header
+
+
+def _csv_fingerprint(csv_file, size):
+    """Hash der letzten FINGERPRINT_BYTES Bytes vor Position 'size' (erkennt eine ersetzte Datei gleicher Inode)."""
+    with open(csv_file, "rb") as f:
+        f.seek(max(0, size - FINGERPRINT_BYTES))
+        tail = f.read(min(size, FINGERPRINT_BYTES))
+    return int.from_bytes(hashlib.blake2b(tail, digest_size=8).digest(), "little")
+
+
+def _same_csv(header, csv_stat, csv_file):
+    """
+    Prüft, ob die CSV-Datei noch die beim letzten Abgleich gelesene ist (höchstens gewachsen).
+    Die Inode allein reicht nicht: Nach Löschen und Neuanlegen kann das Dateisystem sie wiederverwenden.
+    Daher müssen auch die zuletzt gelesenen Bytes unverändert sein, bei gleicher Größe zusätzlich die Änderungszeit.
+    """
+    if header["csv_ino"] != csv_stat.st_ino or header["csv_size"] > csv_stat.st_size:
+        return False
+    if header["csv_size"] == csv_stat.st_size and header["csv_mtime"] != csv_stat.st_mtime_ns:
+        return False
+    return header["csv_tail"] == _csv_fingerprint(csv_file, int(header["csv_size"]))
+
+
+def _write_binary(records, csv_stat, csv_file):
+    """
+    Schreibt die Binärdatei neu (temporäre Datei + Ersetzen). Jeder Neuaufbau erhält eine neue Generation,
+    an der Leser erkennen, dass ihre bisherigen Datensätze nicht mehr gelten (auch bei wiederverwendeter Inode).
+    """
+    path = binary_path(csv_file)
+    generation = int.from_bytes(os.urandom(8), "little")
+    header = np.array([(
+        MAGIC, TRIP_RECORD.itemsize, len(records), generation, csv_stat.st_ino, csv_stat.st_size,
+        csv_stat.st_mtime_ns, _csv_fingerprint(csv_file, csv_stat.st_size),
+    )], dtype=HEADER)
+    with open(path + TMP_SUFFIX, "wb") as f:
+        f.write(header.tobytes())
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + TMP_SUFFIX, path)
+
+
+def _append_binary(header, records, csv_stat, csv_file):
+    """
+    Hängt Datensätze hinter den letzten gültigen an und aktualisiert danach den Kopf.
+    Stürzt das Programm dazwischen ab, zählen die angehängten Datensätze nicht (der Kopf ist noch alt)
+    und werden beim nächsten Abgleich überschrieben.
+    """
+    with open(binary_path(csv_file), "r+b") as f:
+        f.seek(HEADER.itemsize + int(header["count"]) * TRIP_RECORD.itemsize)
+        f.write(records.tobytes())
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        header["count"] += len(records)
+        header["csv_size"] = csv_stat.st_size
+        header["csv_mtime"] = csv_stat.st_mtime_ns
+        header["csv_tail"] = _csv_fingerprint(csv_file, csv_stat.st_size)
+        f.seek(0)
+        f.write(np.array([header], dtype=HEADER).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Wörterbücher je Datei, damit ein Abgleich nur die neu angehängten Einträge liest
+_dictionaries = {}
+
+
+def cached_dictionary(csv_file=DATA_FILE):
+    """Das (auf den neuesten Stand gebrachte) Wörterbuch zur CSV-Datei, einmal je Prozess geladen."""
+    path = dictionary_path(csv_file)
+    dictionary = _dictionaries.get(path)
+    if dictionary is None:
+        dictionary = _dictionaries[path] = TripDictionary(path)
+    else:
+        dictionary.refresh()
+    return dictionary
+
+
+def _remove_binary(csv_file):
+    for path in (binary_path(csv_file), dictionary_path(csv_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _rebuild(csv_file, csv_stat):
+    """Baut Binärdatei und Wörterbuch vollständig aus der CSV-Datei neu auf (Sperre hält der Aufrufer)."""
+    _remove_binary(csv_file)
+    with open(csv_file, encoding="utf-8") as f:
+        columns = f.readline()
+    if START_EPOCH in columns:
+        df = pd.read_csv(csv_file, dtype=TRIP_DTYPES)
+    else:
+        df = convert_legacy_trips(pd.read_csv(csv_file))
+    _write_binary(encode_trips(df, cached_dictionary(csv_file)), csv_stat, csv_file)
+
+
+def sync_binary_trips(csv_file=DATA_FILE):
+    """
+    Gleicht die Binärdatei mit der CSV-Datei ab. Normalfall: Die CSV-Datei ist seit dem letzten
+    Abgleich nur gewachsen; dann werden ausschließlich die neuen Bytes gelesen und angehängt.
+    Wurde die CSV-Datei ersetzt (andere Inode oder anderer Inhalt bis zum letzten Abgleichstand)
+    oder ist sie kleiner geworden, oder ist die Binärdatei beschädigt, wird neu aufgebaut.
+    """
+    if not os.path.exists(csv_file):
+        _remove_binary(csv_file)
+        return
+    with file_lock(csv_file):
+        csv_stat = os.stat(csv_file)
+        csv_size = csv_stat.st_size
+        header = None
+        if os.path.exists(binary_path(csv_file)):
+            with open(binary_path(csv_file), "rb") as f:
+                header = _read_header(f)
+        if header is None or not _same_csv(header, csv_stat, csv_file):
+            _rebuild(csv_file, csv_stat)
+            return
+        if header["csv_size"] == csv_size:
+            return
+        with open(csv_file, "rb") as f:
+            columns = f.readline()
+            if START_EPOCH.encode("utf-8") not in columns:
+                # altes Text-Schema: einmalig vollständig umwandeln
+                _rebuild(csv_file, csv_stat)
+                return
+            f.seek(int(header["csv_size"]))
+            delta = f.read(csv_size - int(header["csv_size"]))
+        df = pd.read_csv(io.BytesIO(columns + delta), dtype=TRIP_DTYPES)
+        records = encode_trips(df, cached_dictionary(csv_file))
+        _append_binary(header, records, csv_stat, csv_file)
+
+
+def read_binary_header(csv_file=DATA_FILE):
+    """Kopf der Binärdatei (oder None, wenn sie fehlt oder beschädigt ist)."""
+    path = binary_path(csv_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return _read_header(f)
+
+
+def open_binary_trips(csv_file=DATA_FILE):
+    """
+    Gibt (Kopf, Datensätze) der Binärdatei zurück (ohne Abgleich). Beide stammen aus derselben geöffneten
+    Datei, passen also auch dann zusammen, wenn die Datei gleichzeitig neu aufgebaut wird.
+    Kopf ist None, wenn die Datei fehlt oder beschädigt ist; Datensätze sind None, wenn es keine gibt.
+    """
+    try:
+        f = open(binary_path(csv_file), "rb")
+    except FileNotFoundError:
+        return None, None
+    with f:
+        header = _read_header(f)
+        count = int(header["count"]) if header is not None else 0
+        if count == 0:
+            return header, None
+        return header, np.memmap(f, dtype=TRIP_RECORD, mode="r", offset=HEADER.itemsize, shape=(count,))
+
+
+def map_binary_trips(csv_file=DATA_FILE):
+    """Öffnet die gültigen Datensätze schreibgeschützt als np.memmap (ohne Abgleich). None, wenn leer."""
+    return open_binary_trips(csv_file)[1]
+
+
+def open_trips_memmap(csv_file=DATA_FILE):
+    """
+    Gleicht ab und öffnet die Binärdatei schreibgeschützt als np.memmap (kein Parsen, kein Kopieren;
+    mehrere Prozesse teilen sich die Seiten im Page-Cache). Gibt None zurück, wenn es keine Wege gibt.
+    """
+    sync_binary_trips(csv_file)
+    return map_binary_trips(csv_file)
+
+
+def trips_frame(records, dictionary=None, csv_file=DATA_FILE):
+    """
+    Baut aus den Datensätzen ein DataFrame im Analyse-Schema (TRIP_COLUMNS plus Koordinatenspalten).
+    Texte werden per Gather aus dem Wörterbuch gelesen; "Startpunkt"/"Endpunkt" enthalten nur
+    Adressen (NaN bei Koordinaten, diese stehen in START_LAT/START_LON bzw. END_LAT/END_LON).
+    """
+    dictionary = dictionary or TripDictionary(dictionary_path(csv_file))
+    df = pd.DataFrame({
+        "Benutzer/in": dictionary.decode("user", records["user"]),
+        START_EPOCH: records["start"].astype("int64"),
+        END_EPOCH: records["end"].astype("int64"),
+        DURATION: records["duration"].astype("int64"),
+        "Startpunkt": dictionary.decode("place", records["start_place"]),
+        "Endpunkt": dictionary.decode("place", records["end_place"]),
+        "Distanz (km)": records["distance"].astype("float64"),
+        "Modus": dictionary.decode("mode", records["mode"]),
+        "Wegezweck": dictionary.decode("purpose", records["purpose"]),
+        START_LAT: records["start_lat"].astype("float64"),
+        START_LON: records["start_lon"].astype("float64"),
+        END_LAT: records["end_lat"].astype("float64"),
+        END_LON: records["end_lon"].astype("float64"),
+    })
+    return df[TRIP_COLUMNS + [START_LAT, START_LON, END_LAT, END_LON]]
@@ -0,0 +1,69 @@
+# This module resolves participant cohorts (saved selections and attribute groups) to ID bitmaps.
+# A participant's ID is its row in users.csv; filtering trips by a cohort is a single array lookup.
+
+import numpy as np
+import pandas as pd
+
+from logic import COHORT_COLUMN, COHORT_SEPARATOR, WEIGHT_COLUMN
+
+# global constants
+PARTICIPANT_ID = "Benutzer-ID"  # Hilfsspalte der geladenen Wege (nicht in der CSV-Datei)
+MAX_GROUP_VALUES = 50           # Spalten mit mehr verschiedenen Werten sind keine sinnvollen Gruppen
+NON_ATTRIBUTE_COLUMNS = ("Vorname", "Nachname", WEIGHT_COLUMN, COHORT_COLUMN)
+
+
+def participant_ids(trip_users, names):
+    """
+    Ordnet jedem Weg die ID seiner Person zu (ein Hash-Durchlauf über die Wege).
+    Personen, die nicht in der Benutzerdatei stehen, erhalten -1.
+    """
+    return pd.Categorical(trip_users, categories=names).codes.astype("int64")
+
+
+def selection_bitmap(names, selected_users):
+    """Wandelt eine Namensliste in ein boolesches Array über alle Teilnehmer/innen um."""
+    return names.isin(selected_users)
+
+
+def trip_mask(ids, bitmap):
+    """Wege-Maske aus einer Personen-Bitmap; unbekannte Personen (-1) fallen auf den angehängten False-Eintrag."""
+    return np.append(np.asarray(bitmap, dtype=bool), False)[ids]
+
+
+def attribute_groups(user_df):
+    """
+    Leitet Kohorten aus zusätzlichen Spalten der Benutzerdatei ab (z.B. "Haushalt" oder "Region").
+    Gibt ein Dict "Spalte = Wert" -> Bitmap über alle Teilnehmer/innen zurück.
+    """
+    groups = {}
+    for column in user_df.columns.difference(NON_ATTRIBUTE_COLUMNS, sort=False):
+        codes, values = user_df[column].factorize()
+        if len(values) > MAX_GROUP_VALUES:
+            continue
+        for code, value in enumerate(values):
+            groups[f"{column} = {value}"] = codes == code
+    return groups
+
+
+def saved_cohorts(user_df):
+    """
+    Liest die gespeicherten Kohorten aus der Spalte COHORT_COLUMN
+    (je Person eine durch COHORT_SEPARATOR getrennte Liste von Kohortennamen).
+    """
+    if COHORT_COLUMN not in user_df.columns:
+        return {}
+    memberships = user_df[COHORT_COLUMN].fillna("").astype(str).str.split(COHORT_SEPARATOR).explode()
+    memberships = memberships[memberships != ""]
+    positions = user_df.index.get_indexer(memberships.index)
+    cohorts = {}
+    for name, members in pd.Series(positions).groupby(memberships.to_numpy()):
+        bitmap = np.zeros(len(user_df), dtype=bool)
+        bitmap[members.to_numpy()] = True
+        cohorts[name] = bitmap
+    return cohorts
+
+
+def resolve_cohorts(user_df):
+    """Alle Kohorten (gespeicherte zuerst, dann Merkmalsgruppen) als Name -> Bitmap."""
+    user_df = user_df.reset_index(drop=True)
+    return {**saved_cohorts(user_df), **attribute_groups(user_df)}
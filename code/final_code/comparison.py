@@ -0,0 +1,164 @@
+# This module compares several groups (cohorts and/or periods) side by side.
+# All groups are aggregated together in one grouped pass instead of running the full analysis per group.
+
+import os
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from logic import CHART_DIRECTORY, START_EPOCH, create_chart_directory, load_user_weights
+from analysis import (
+    AnalysisError, SECONDS_PER_DAY, load_analysis_trips, parse_period, trip_weights, user_mask
+)
+
+# global constants
+COMPARISON_CHART_FILE = "vergleich.png"
+DAILY_COLUMNS = ["Wege pro Tag", "km pro Tag", "Wege", "Personen", "Tage"]
+
+# (Schlüssel, Kategoriespalte, nach Distanz gewichtet, Titel)
+COMPARISON_SHARES = [
+    ("ways", "Modus", False, "Modal Split Wege"),
+    ("km", "Modus", True, "Modal Split Personenkilometer"),
+    ("purpose", "Wegezweck", False, "Verkehrsaufkommen (Wege)"),
+]
+
+
+def group_membership(df, groups, participants=None):
+    """
+    Boolesche Matrix (Wege x Gruppen): gehört ein Weg zur Gruppe?
+    Eine Gruppe ist ein Dict mit "label" und optional "selected_users" (Namen oder Bitmap),
+    "start_date" und "end_date"; Gruppen dürfen sich überschneiden.
+    """
+    start = df[START_EPOCH].to_numpy()
+    membership = np.ones((len(df), len(groups)), dtype=bool)
+    for g, group in enumerate(groups):
+        selected_users = group.get("selected_users")
+        if selected_users is not None and np.any(selected_users):
+            membership[:, g] &= user_mask(df, selected_users, participants)
+        period = parse_period(group.get("start_date", ""), group.get("end_date", ""))
+        if period is not None:
+            membership[:, g] &= (start >= period[0]) & (start <= period[1])
+    return membership
+
+
+def compute_comparison(df, groups, participants=None, user_weights=None):
+    """
+    Berechnet Modal Split (Wege/km), Wegezweck-Anteile und Tageswerte für alle Gruppen gemeinsam:
+    Jeder Weg wird einmal je Gruppenzugehörigkeit gezählt und alle Kennwerte entstehen aus
+    je einem bincount über den kombinierten Index (Gruppe, Kategorie).
+    Gibt "shares" (je Kennwert Kategorie x Gruppe in Prozent), "differences" (Prozentpunkte
+    gegenüber der ersten Gruppe), "daily" (Gruppe x Tageswerte) und "weighted" zurück.
+    """
+    labels = [group["label"] for group in groups]
+    if len(set(labels)) != len(labels):
+        raise AnalysisError("Die Vergleichsgruppen benötigen unterschiedliche Namen.")
+    membership = group_membership(df, groups, participants)
+    rows, group_idx = np.nonzero(membership)
+    n_groups = len(groups)
+    trip_counts = np.bincount(group_idx, minlength=n_groups)
+    for label, count in zip(labels, trip_counts):
+        if count == 0:
+            raise AnalysisError(f"Keine Einträge für die Vergleichsgruppe '{label}'.")
+
+    weights = trip_weights(df, user_weights)[rows]
+    km = df["Distanz (km)"].fillna(0).to_numpy(dtype="float64")[rows]
+
+    shares = {}
+    for key, column, by_distance, _ in COMPARISON_SHARES:
+        codes, categories = pd.factorize(df[column])
+        n_cat = len(categories)
+        # Wege ohne Kategorie (Code -1) fließen nicht in die Anteile ein
+        codes = codes[rows]
+        known = codes >= 0
+        values = weights * km if by_distance else weights
+        totals = np.bincount(
+            group_idx[known] * n_cat + codes[known],
+            weights=values[known],
+            minlength=n_groups * n_cat,
+        ).reshape(n_groups, n_cat)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percent = totals / totals.sum(axis=1, keepdims=True) * 100
+        table = pd.DataFrame(percent.T, index=pd.Index(categories, name="Kategorie"), columns=labels)
+        shares[key] = table.loc[table.mean(axis=1).sort_values(ascending=False).index]
+
+    # Tageswerte wie in der Einzelauswertung: Wege bzw. km je Kalendertag mit Wegen
+    day_codes, days = pd.factorize(df[START_EPOCH].to_numpy() // SECONDS_PER_DAY)
+    user_codes, users = pd.factorize(df["Benutzer/in"])
+    day_count = np.bincount(np.unique(group_idx * len(days) + day_codes[rows]) // len(days), minlength=n_groups)
+    person_count = np.bincount(np.unique(group_idx * len(users) + user_codes[rows]) // len(users), minlength=n_groups)
+    total_km = np.bincount(group_idx, weights=km, minlength=n_groups)
+    daily = pd.DataFrame(
+        {
+            "Wege pro Tag": trip_counts / day_count,
+            "km pro Tag": total_km / day_count,
+            "Wege": trip_counts,
+            "Personen": person_count,
+            "Tage": day_count,
+        },
+        index=pd.Index(labels, name="Gruppe"),
+    )[DAILY_COLUMNS]
+
+    differences = {
+        key: table.iloc[:, 1:].sub(table.iloc[:, 0], axis=0).add_suffix(f" − {labels[0]}")
+        for key, table in shares.items()
+    }
+    return {
+        "shares": shares,
+        "differences": differences,
+        "daily": daily,
+        "weighted": bool((weights != 1).any()),
+    }
+
+
+def render_comparison_chart(comparison, path):
+    """
+    Zeichnet je Kennwert ein gruppiertes Balkendiagramm (Gruppen nebeneinander) und
+    rechts daneben die Differenz zur ersten Gruppe in Prozentpunkten.
+    """
+    fig = Figure(figsize=(13, 4 * len(COMPARISON_SHARES)))
+    note = " (gewichtet)" if comparison["weighted"] else ""
+    for i, (key, _, _, title) in enumerate(COMPARISON_SHARES):
+        table = comparison["shares"][key]
+        ax = fig.add_subplot(len(COMPARISON_SHARES), 2, 2 * i + 1)
+        x = np.arange(len(table))
+        width = 0.8 / len(table.columns)
+        for g, label in enumerate(table.columns):
+            ax.bar(x + (g - (len(table.columns) - 1) / 2) * width, table[label].to_numpy(), width, label=label)
+        ax.set_xticks(x, table.index, rotation=30, ha="right")
+        ax.set_ylabel("Anteil (%)")
+        ax.set_title(title + note, fontsize=12, fontweight="bold")
+        ax.legend(fontsize=8)
+
+        diff = comparison["differences"][key]
+        ax = fig.add_subplot(len(COMPARISON_SHARES), 2, 2 * i + 2)
+        for g, label in enumerate(diff.columns):
+            ax.bar(
+                x + (g - (len(diff.columns) - 1) / 2) * (0.8 / len(diff.columns)),
+                diff[label].to_numpy(), 0.8 / len(diff.columns),
+                label=label, color=f"C{g + 1}",
+            )
+        ax.axhline(0, color="black", linewidth=0.8)
+        ax.set_xticks(x, diff.index, rotation=30, ha="right")
+        ax.set_ylabel("Differenz (Prozentpunkte)")
+        ax.set_title(f"{title}: Differenz", fontsize=12, fontweight="bold")
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def run_comparison(groups):
+    """
+    Vergleicht mehrere Gruppen in einem Durchgang (laden, gruppiert aggregieren, Diagramm).
+    Gibt das Ergebnis von compute_comparison mit dem Pfad des Diagramms unter "chart" zurück.
+    """
+    if len(groups) < 2:
+        raise AnalysisError("Für einen Vergleich werden mindestens zwei Gruppen benötigt.")
+    df, participants = load_analysis_trips()
+    comparison = compute_comparison(df, groups, participants, load_user_weights())
+    create_chart_directory()
+    comparison["chart"] = render_comparison_chart(
+        comparison, os.path.join(CHART_DIRECTORY, COMPARISON_CHART_FILE)
+    )
+    return comparison
@@ -0,0 +1,97 @@
+# This module tells coordinate texts apart from addresses for whole columns at once.
+# Coordinates (decimal or degrees/minutes/seconds) are parsed with one regex pass; only the distinct addresses go to a geocoder.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# global constants
+_NUMBER = r"\d+(?:[.,]\d+)?"            # Dezimalpunkt oder -komma
+_SEPARATOR = r"\s*[,;/]\s*|\s+"
+
+
+def _component(name, hemispheres):
+    """Regex für eine Koordinate: Grad (optional mit Minuten ' und Sekunden "), Vorzeichen oder Himmelsrichtung."""
+    return (
+        rf"(?P<{name}_hem1>[{hemispheres}])?\s*"
+        rf"(?P<{name}_sign>[-+])?\s*"
+        rf"(?P<{name}_deg>{_NUMBER})\s*°?\s*"
+        rf"(?:(?P<{name}_min>{_NUMBER})\s*['′’]\s*"
+        rf"(?:(?P<{name}_sec>{_NUMBER})\s*(?:\"|″|”|'')\s*)?)?"
+        rf"(?P<{name}_hem2>[{hemispheres}])?"
+    )
+
+
+# Breite zuerst (wie von der Kartenauswahl gespeichert); O = Ost
+COORDINATE_PATTERN = re.compile(
+    rf"^\s*{_component('lat', 'NS')}(?:{_SEPARATOR}){_component('lon', 'EWO')}\s*$",
+    re.IGNORECASE,
+)
+
+
+def _to_float(column):
+    return pd.to_numeric(column.str.replace(",", ".", regex=False), errors="coerce").to_numpy(dtype="float64")
+
+
+def _degrees(parts, name, negative_hemisphere):
+    """Dezimalgrad aus den Regex-Gruppen einer Koordinate (NaN bei ungültigen Minuten/Sekunden)."""
+    minutes = np.nan_to_num(_to_float(parts[f"{name}_min"]))
+    seconds = np.nan_to_num(_to_float(parts[f"{name}_sec"]))
+    value = _to_float(parts[f"{name}_deg"]) + minutes / 60 + seconds / 3600
+    value[(minutes >= 60) | (seconds >= 60)] = np.nan
+    hemisphere = parts[f"{name}_hem1"].fillna(parts[f"{name}_hem2"]).str.upper()
+    negative = (parts[f"{name}_sign"] == "-").to_numpy() | (hemisphere == negative_hemisphere).to_numpy()
+    return np.where(negative, -value, value)
+
+
+def parse_coordinates(points):
+    """
+    Liest Koordinaten aus einer Series von Orts-Texten, z.B. "49.0069, 8.4037", "49,0069; 8,4037",
+    "49.0069 8.4037" oder "49°0'24.8\"N 8°24'13.3\"E". Jeder verschiedene Text wird nur einmal geparst.
+    Gibt (lat, lon, needs_geocoding) zurück: Float-Arrays (NaN, wo keine Koordinate steht) und eine Maske
+    der Zeilen, die stattdessen eine Adresse enthalten. Fehlende/leere Werte sind weder Koordinate noch Adresse.
+    """
+    codes, uniques = pd.factorize(pd.Series(points, dtype=object))
+    texts = pd.Series(uniques, dtype=object).astype(str)
+    parts = texts.str.extract(COORDINATE_PATTERN)
+    lat = _degrees(parts, "lat", "S")
+    lon = _degrees(parts, "lon", "W")
+    # Werte außerhalb des gültigen Bereichs sind keine Koordinaten (z.B. "12, 76131" = Hausnummer, PLZ)
+    invalid = ~((np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+    lat[invalid] = np.nan
+    lon[invalid] = np.nan
+    is_address = (invalid & (texts.str.strip() != "").to_numpy())
+    # angehängter Eintrag für fehlende Werte (Code -1)
+    lat, lon = np.append(lat, np.nan), np.append(lon, np.nan)
+    is_address = np.append(is_address, False)
+    return lat[codes], lon[codes], is_address[codes]
+
+
+def resolve_points(points, geocode, verify=None):
+    """
+    Koordinaten für eine Series aus Adressen und Koordinaten-Texten.
+    'geocode(adresse)' wird genau einmal je verschiedener (getrimmter) Adresse aufgerufen, 'verify(lat, lon)'
+    (optional) einmal je verschiedener Koordinate. Beide geben (lat, lon) bzw. einen Wahrheitswert zurück;
+    nicht auflösbare Orte ergeben NaN.
+    """
+    points = pd.Series(points, dtype=object).reset_index(drop=True)
+    lat, lon, needs_geocoding = parse_coordinates(points)
+    addresses = points[needs_geocoding].astype(str).str.strip()
+    codes, uniques = pd.factorize(addresses)
+    found = np.full((len(uniques) + 1, 2), np.nan)
+    for i, address in enumerate(uniques):
+        location = geocode(address)
+        if location:
+            found[i] = location
+    lat[needs_geocoding] = found[codes, 0]
+    lon[needs_geocoding] = found[codes, 1]
+    if verify is not None:
+        parsed = ~needs_geocoding & ~np.isnan(lat)
+        pairs = pd.MultiIndex.from_arrays([lat[parsed], lon[parsed]])
+        codes, uniques = pd.factorize(pairs)
+        valid = np.array([bool(verify(pair_lat, pair_lon)) for pair_lat, pair_lon in uniques], dtype=bool)
+        rejected = np.flatnonzero(parsed)[~valid[codes]]
+        lat[rejected] = np.nan
+        lon[rejected] = np.nan
+    return lat, lon
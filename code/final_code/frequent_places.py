@@ -0,0 +1,116 @@
+# This module finds the places a participant visits again and again (home, work, school, ...).
+# Start and end points are clustered on a coarse grid so they can be offered as quick picks without geocoding or the map.
+
+import numpy as np
+
+from geocoding import normalize_address
+from tours import EARTH_RADIUS_M
+
+# global constants
+PLACE_CELL_M = 100          # Kantenlänge einer Rasterzelle; ein Ort umfasst die Zelle und ihre 8 Nachbarn
+MIN_VISITS = 3              # seltener besuchte Orte werden nicht vorgeschlagen
+MAX_FREQUENT_PLACES = 6
+
+_NEIGHBOURS = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+
+
+def user_points(records, dictionary, user, cache_coordinates=None):
+    """
+    Alle Start- und Endpunkte einer Person als (lat, lon, Adress-Code). Adressen ohne gespeicherte
+    Koordinaten werden, soweit möglich, über den Geocode-Cache ergänzt (je verschiedener Adresse ein Lookup).
+    """
+    code = dictionary.codes["user"].get(user)
+    if code is None:
+        empty = np.zeros(0)
+        return empty, empty, np.zeros(0, dtype="int64")
+    own = records[records["user"] == code]
+    lat = np.concatenate([own["start_lat"], own["end_lat"]]).astype("float64")
+    lon = np.concatenate([own["start_lon"], own["end_lon"]]).astype("float64")
+    place = np.concatenate([own["start_place"], own["end_place"]]).astype("int64")
+    if cache_coordinates:
+        missing = np.isnan(lat) & (place >= 0)
+        codes, positions = np.unique(place[missing], return_inverse=True)
+        found = np.full((len(codes) + 1, 2), np.nan)
+        for i, c in enumerate(codes):
+            location = cache_coordinates.get(normalize_address(dictionary.values["place"][c]))
+            if location:
+                found[i] = location
+        lat[missing] = found[positions, 0]
+        lon[missing] = found[positions, 1]
+    valid = ~np.isnan(lat)
+    return lat[valid], lon[valid], place[valid]
+
+
+def cluster_places(lat, lon, place=None, cell_m=PLACE_CELL_M, min_visits=MIN_VISITS, limit=MAX_FREQUENT_PLACES):
+    """
+    Rasterbasiertes Clustern (ähnlich DBSCAN mit fester Zellgröße): Punkte werden Zellen zugeordnet,
+    je Zelle wird die Summe über ihre 3x3-Nachbarschaft gebildet (vektorisiert per Binärsuche), und die
+    dichtesten Zellen werden nacheinander samt ihrer Nachbarzellen zu Orten zusammengefasst.
+    Gibt eine Liste von (lat, lon, Besuche, häufigster Adress-Code oder -1) zurück, häufigste zuerst.
+    """
+    if len(lat) == 0:
+        return []
+    cell_lat = np.degrees(cell_m / EARTH_RADIUS_M)
+    cell_lon = cell_lat / max(np.cos(np.radians(np.median(lat))), 0.01)
+    row = np.floor(lat / cell_lat).astype("int64")
+    col = np.floor(lon / cell_lon).astype("int64")
+    cells, inverse, counts = np.unique(np.stack([row, col], axis=1), axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    sum_lat = np.bincount(inverse, weights=lat)
+    sum_lon = np.bincount(inverse, weights=lon)
+
+    # Nachbarzellen per Binärsuche über die sortierten Zellschlüssel finden
+    span = int(col.max() - col.min()) + 3
+    keys = (cells[:, 0] - row.min() + 1) * span + (cells[:, 1] - col.min() + 1)
+    neighbours = np.full((len(cells), len(_NEIGHBOURS)), -1, dtype="int64")
+    for k, (di, dj) in enumerate(_NEIGHBOURS):
+        target = keys + di * span + dj
+        pos = np.minimum(np.searchsorted(keys, target), len(keys) - 1)
+        neighbours[:, k] = np.where(keys[pos] == target, pos, -1)
+    density = np.where(neighbours >= 0, counts[neighbours], 0).sum(axis=1)
+
+    # häufigste Adresse je Zelle (nur für die Beschriftung)
+    cell_place = np.full(len(cells), -1, dtype="int64")
+    if place is not None and (place >= 0).any():
+        labelled = place >= 0
+        pairs, pair_counts = np.unique(
+            np.stack([inverse[labelled], place[labelled]], axis=1), axis=0, return_counts=True
+        )
+        order = np.lexsort((-pair_counts, pairs[:, 0]))
+        first = np.unique(pairs[order, 0], return_index=True)[1]
+        cell_place[pairs[order[first], 0]] = pairs[order[first], 1]
+
+    taken = np.zeros(len(cells), dtype=bool)
+    result = []
+    for seed in np.argsort(-density, kind="stable"):
+        if taken[seed] or density[seed] < min_visits:
+            continue
+        members = neighbours[seed][neighbours[seed] >= 0]
+        if taken[members].any():
+            continue    # Randzelle eines bereits gefundenen Ortes: kein zweiter Ort direkt daneben
+        visits = counts[members].sum()
+        if visits < min_visits:
+            continue
+        taken[members] = True
+        result.append((
+            sum_lat[members].sum() / visits,
+            sum_lon[members].sum() / visits,
+            int(visits),
+            int(cell_place[seed]),
+        ))
+        if len(result) == limit:
+            break
+    return sorted(result, key=lambda p: -p[2])
+
+
+def frequent_places(records, dictionary, user, cache_coordinates=None, limit=MAX_FREQUENT_PLACES):
+    """
+    Die häufigsten Orte einer Person als Liste von (Beschriftung, (lat, lon), Besuche).
+    Die Beschriftung ist die dort am häufigsten eingegebene Adresse oder die Koordinate.
+    """
+    lat, lon, place = user_points(records, dictionary, user, cache_coordinates)
+    places = []
+    for place_lat, place_lon, visits, code in cluster_places(lat, lon, place, limit=limit):
+        name = dictionary.values["place"][code] if code >= 0 else f"{place_lat:.5f}, {place_lon:.5f}"
+        places.append((f"{name} ({visits}×)", (place_lat, place_lon), visits))
+    return places
@@ -0,0 +1,318 @@
+# This module puts several geocoding backends (cache, offline gazetteer, local Nominatim, MapBox) behind one interface.
+# Providers are asked in order; slow or failing providers are skipped for a while (circuit breaker) so saving never stalls.
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from geopy.geocoders import MapBox, Nominatim
+
+# global constants
+GEOCODE_CACHE_FILE = "geocode_cache.csv"
+GAZETTEER_FILE = "gazetteer.csv"        # optional: Name,Lat,Lon (z.B. Haltestellen, Stadtteile, Betriebe)
+GEOCODER_TIMEOUT = 3.0                  # Sekunden je Anfrage an einen Online-Dienst
+SLOW_CALL_S = 2.0                       # langsamere Antworten zählen für den Circuit Breaker als Fehler
+FAILURE_THRESHOLD = 3                   # Fehler in Folge, bis ein Anbieter übersprungen wird
+BREAKER_COOLDOWN_S = 60.0               # so lange wird ein gestörter Anbieter übersprungen
+GAZETTEER_REVERSE_RADIUS_M = 200
+EARTH_RADIUS_M = 6371008.8
+MAX_SUGGESTIONS = 8
+USER_AGENT = "traffic-diary-analysis-tool"
+
+
+def normalize_address(address):
+    """Schlüssel für Cache und Ortsverzeichnis: getrimmt, klein geschrieben, einfache Leerzeichen."""
+    return " ".join(str(address).lower().split())
+
+
+class CircuitBreaker:
+    """
+    Nach FAILURE_THRESHOLD Fehlern in Folge ist der Breaker offen und der Anbieter wird übersprungen.
+    Nach der Abkühlzeit darf genau ein Probeaufruf durch (halb offen); gelingt er, schließt der Breaker wieder.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN_S, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "geschlossen"
+        return "offen" if self.clock() < self.opened_at + self.cooldown else "halb offen"
+
+    def allow(self):
+        state = self.state
+        if state == "halb offen":
+            # nur ein Probeaufruf: bis zu seinem Ergebnis gilt der Breaker wieder als offen
+            self.opened_at = self.clock()
+            return True
+        return state == "geschlossen"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+
+class GeocoderProvider:
+    """
+    Basisklasse eines Anbieters. geocode() gibt (lat, lon) oder None (nicht gefunden) zurück,
+    reverse() True/False oder None (keine Aussage möglich). Störungen werden als Exception gemeldet.
+    """
+
+    name = "Anbieter"
+
+    def geocode(self, address):
+        return None
+
+    def reverse(self, lat, lon):
+        return None
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        """Vorschläge für eine (unvollständige) Eingabe als Liste von (Adresse, (lat, lon))."""
+        return []
+
+
+class GeopyProvider(GeocoderProvider):
+    """Online-Dienst über einen geopy-Geocoder (MapBox, Nominatim, ...)."""
+
+    def __init__(self, name, geocoder):
+        self.name = name
+        self.geocoder = geocoder
+
+    def geocode(self, address):
+        location = self.geocoder.geocode(address)
+        return (location.latitude, location.longitude) if location else None
+
+    def reverse(self, lat, lon):
+        return self.geocoder.reverse((lat, lon)) is not None
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        locations = self.geocoder.geocode(query, exactly_one=False) or []
+        return [(location.address, (location.latitude, location.longitude)) for location in locations[:limit]]
+
+
+def mapbox_provider(api_key, timeout=GEOCODER_TIMEOUT):
+    return GeopyProvider("MapBox", MapBox(api_key=api_key, timeout=timeout, user_agent=USER_AGENT))
+
+
+def nominatim_provider(domain, scheme="http", timeout=GEOCODER_TIMEOUT):
+    """Nominatim-kompatibler Server, z.B. ein lokaler Docker-Container unter "localhost:8080"."""
+    return GeopyProvider(
+        f"Nominatim ({domain})",
+        Nominatim(domain=domain, scheme=scheme, timeout=timeout, user_agent=USER_AGENT),
+    )
+
+
+class GazetteerProvider(GeocoderProvider):
+    """
+    Offline-Ortsverzeichnis (Name, Lat, Lon): findet Namen exakt (normalisiert) und bestätigt
+    Koordinaten, die höchstens GAZETTEER_REVERSE_RADIUS_M von einem Eintrag entfernt liegen.
+    """
+
+    name = "Ortsverzeichnis"
+
+    def __init__(self, places):
+        places = places.dropna(subset=["Name", "Lat", "Lon"])
+        keys = places["Name"].map(normalize_address)
+        self.coordinates = dict(zip(keys, zip(places["Lat"].astype(float), places["Lon"].astype(float))))
+        self.names = dict(zip(keys, places["Name"].astype(str)))
+        self.lat = np.radians(places["Lat"].to_numpy(dtype="float64"))
+        self.lon = np.radians(places["Lon"].to_numpy(dtype="float64"))
+
+    @classmethod
+    def from_csv(cls, file_name=GAZETTEER_FILE):
+        return cls(pd.read_csv(file_name))
+
+    def geocode(self, address):
+        return self.coordinates.get(normalize_address(address))
+
+    def reverse(self, lat, lon):
+        if len(self.lat) == 0:
+            return None
+        phi, lmb = np.radians(lat), np.radians(lon)
+        a = (np.sin((self.lat - phi) / 2) ** 2
+             + np.cos(phi) * np.cos(self.lat) * np.sin((self.lon - lmb) / 2) ** 2)
+        nearest = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a.min()))
+        # kein Eintrag in der Nähe heißt nicht, dass dort nichts ist
+        return True if nearest <= GAZETTEER_REVERSE_RADIUS_M else None
+
+
+class CacheProvider(GeocoderProvider):
+    """
+    Bereits gefundene Adressen (dauerhaft in GEOCODE_CACHE_FILE, nur anhängend) und
+    bereits bestätigte Koordinaten (nur im Speicher).
+    """
+
+    name = "Cache"
+
+    def __init__(self, file_name=GEOCODE_CACHE_FILE):
+        self.file_name = file_name
+        self.coordinates = {}
+        self.confirmed = set()
+        # store() wird auch aus dem Vorschlags-Thread aufgerufen
+        self.lock = threading.Lock()
+        if file_name and os.path.exists(file_name):
+            # eine bei einem Absturz halb geschriebene letzte Zeile wird übersprungen
+            cache = pd.read_csv(file_name, on_bad_lines="skip").dropna()
+            self.coordinates = dict(zip(cache["Adresse"], zip(cache["Lat"], cache["Lon"])))
+
+    def geocode(self, address):
+        return self.coordinates.get(normalize_address(address))
+
+    def reverse(self, lat, lon):
+        return True if (round(lat, 5), round(lon, 5)) in self.confirmed else None
+
+    def store(self, address, location):
+        key = normalize_address(address)
+        with self.lock:
+            if key in self.coordinates:
+                return
+            self.coordinates[key] = location
+            if self.file_name:
+                new_file = not os.path.exists(self.file_name)
+                line = pd.DataFrame([{"Adresse": key, "Lat": location[0], "Lon": location[1]}]).to_csv(
+                    index=False, header=new_file
+                )
+                with open(self.file_name, "a", encoding="utf-8") as f:
+                    f.write(line)
+
+    def store_confirmed(self, lat, lon):
+        with self.lock:
+            self.confirmed.add((round(lat, 5), round(lon, 5)))
+
+
+class ProviderStats:
+    """Kennzahlen eines Anbieters: Aufrufe, Treffer, Fehler, übersprungene Aufrufe und Antwortzeiten."""
+
+    __slots__ = ("calls", "hits", "errors", "skipped", "total_s", "max_s", "last_error")
+
+    def __init__(self):
+        self.calls = self.hits = self.errors = self.skipped = 0
+        self.total_s = self.max_s = 0.0
+        self.last_error = ""
+
+
+class GeocoderChain:
+    """
+    Fragt die Anbieter der Reihe nach, bis einer eine Antwort hat. Störungen und langsame Antworten
+    werden je Anbieter gezählt; der Circuit Breaker überspringt gestörte Anbieter für BREAKER_COOLDOWN_S.
+    Gefundene Adressen und bestätigte Koordinaten landen im Cache (erster Anbieter).
+    """
+
+    def __init__(self, providers, cache=None, clock=time.monotonic):
+        self.cache = cache
+        self.providers = ([cache] if cache is not None else []) + list(providers)
+        self.clock = clock
+        self.breakers = {p.name: CircuitBreaker(clock=clock) for p in self.providers}
+        self.stats = {p.name: ProviderStats() for p in self.providers}
+        # Breaker und Kennzahlen werden aus UI- und Vorschlags-Thread verändert; der Aufruf
+        # des Anbieters selbst läuft außerhalb der Sperre, damit ein langsamer Dienst niemanden blockiert
+        self.lock = threading.Lock()
+
+    def _call(self, provider, method, *args):
+        """Ruft einen Anbieter auf; gibt (ok, Ergebnis) zurück, ok=False bei Störung oder offenem Breaker."""
+        breaker, stats = self.breakers[provider.name], self.stats[provider.name]
+        with self.lock:
+            if not breaker.allow():
+                stats.skipped += 1
+                return False, None
+            stats.calls += 1
+        started = self.clock()
+        try:
+            result = getattr(provider, method)(*args)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        elapsed = self.clock() - started
+        with self.lock:
+            stats.total_s += elapsed
+            stats.max_s = max(stats.max_s, elapsed)
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = f"{type(error).__name__}: {error}"
+                breaker.record_failure()
+                return False, None
+            if elapsed > SLOW_CALL_S:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if result:
+                stats.hits += 1
+        return True, result
+
+    def geocode(self, address):
+        """(lat, lon) der Adresse oder None, wenn kein erreichbarer Anbieter sie kennt."""
+        for provider in self.providers:
+            _, location = self._call(provider, "geocode", address)
+            if location:
+                if self.cache is not None and provider is not self.cache:
+                    self.cache.store(address, location)
+                return location
+        return None
+
+    def reverse(self, lat, lon):
+        """
+        Prüft, ob an der Koordinate ein Ort bekannt ist. Konnte kein Anbieter antworten (z.B. offline),
+        wird die Koordinate akzeptiert, damit das Speichern nicht an einem gestörten Dienst scheitert.
+        """
+        answered = False
+        for provider in self.providers:
+            ok, known = self._call(provider, "reverse", lat, lon)
+            if known:
+                if self.cache is not None:
+                    self.cache.store_confirmed(lat, lon)
+                return True
+            answered |= ok and known is not None
+        return not answered
+
+    def suggest(self, query, limit=MAX_SUGGESTIONS):
+        """Vorschläge des ersten erreichbaren Anbieters, der Vorschläge liefern kann (langsam, nicht im UI-Thread aufrufen)."""
+        for provider in self.providers:
+            if type(provider).suggest is GeocoderProvider.suggest:
+                continue
+            ok, suggestions = self._call(provider, "suggest", query, limit)
+            if ok and suggestions:
+                return suggestions
+        return []
+
+    def metrics(self):
+        """Kennzahlen je Anbieter als DataFrame (z.B. zur Fehlersuche)."""
+        rows = {}
+        with self.lock:
+            for provider in self.providers:
+                stats = self.stats[provider.name]
+                rows[provider.name] = {
+                    "Aufrufe": stats.calls,
+                    "Treffer": stats.hits,
+                    "Fehler": stats.errors,
+                    "Übersprungen": stats.skipped,
+                    "Ø Antwortzeit (ms)": 1000 * stats.total_s / stats.calls if stats.calls else np.nan,
+                    "Max. Antwortzeit (ms)": 1000 * stats.max_s,
+                    "Breaker": self.breakers[provider.name].state,
+                    "Letzter Fehler": stats.last_error,
+                }
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def default_geocoder(mapbox_api_key=None, nominatim_domain=None, gazetteer_file=GAZETTEER_FILE,
+                     cache_file=GEOCODE_CACHE_FILE):
+    """Standardkette: Cache, Ortsverzeichnis (falls vorhanden), lokaler Nominatim-Server (falls konfiguriert), MapBox."""
+    providers = []
+    if gazetteer_file and os.path.exists(gazetteer_file):
+        providers.append(GazetteerProvider.from_csv(gazetteer_file))
+    if nominatim_domain:
+        providers.append(nominatim_provider(nominatim_domain))
+    if mapbox_api_key:
+        providers.append(mapbox_provider(mapbox_api_key))
+    return GeocoderChain(providers, CacheProvider(cache_file))
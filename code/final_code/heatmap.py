@@ -0,0 +1,208 @@
+# This module rasterizes trip start/end points into a density heatmap for the map view.
+# Rasters are updated incrementally when the participant selection changes and rendered in a background thread.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib import colormaps
+from PIL import Image
+
+from logic import START_EPOCH
+from analysis import AnalysisError, load_analysis_trips
+from cohorts import PARTICIPANT_ID
+from trip_map import TILE_SIZE_PX, to_pixels, trip_endpoints
+
+# global constants
+HEATMAP_BINS = 256              # Rasterauflösung (Zellen je Kante)
+HEATMAP_COLORMAP = "YlOrRd"
+HEATMAP_MAX_ALPHA = 0.8
+HEATMAP_KINDS = ("start", "end", "both")
+
+
+class HeatmapModel:
+    """
+    Dichteraster einer Punktmenge (Start- oder Zielpunkte) über dem Untersuchungsgebiet.
+    Die Zellen sind gleich groß in Web-Mercator-Koordinaten, das Raster lässt sich also verzerrungsfrei
+    als Bild über die Karte legen. Die Punkte sind nach Person sortiert; ändert sich nur die Auswahl der
+    Personen, werden lediglich die Punkte der hinzugekommenen bzw. entfernten Personen addiert bzw. abgezogen.
+    """
+
+    def __init__(self, lat, lon, user_ids, start_epochs, n_users, bins=HEATMAP_BINS):
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        x, y = to_pixels(lat[valid], lon[valid], 0)
+        self.bins = bins
+        if valid.any():
+            # quadratischer Ausschnitt mit etwas Rand, damit einzelne Punkte nicht am Bildrand liegen
+            size = max(x.max() - x.min(), y.max() - y.min(), 1e-6) * 1.05
+            self.x0 = (x.max() + x.min() - size) / 2
+            self.y0 = (y.max() + y.min() - size) / 2
+            self.size = size
+        else:
+            self.x0 = self.y0 = 0.0
+            self.size = 1.0
+        col = np.clip(((x - self.x0) / self.size * bins).astype("int64"), 0, bins - 1)
+        row = np.clip(((y - self.y0) / self.size * bins).astype("int64"), 0, bins - 1)
+        # Slot 0 = Personen, die nicht in der Benutzerdatei stehen (ID -1)
+        slots = user_ids[valid] + 1
+        order = np.argsort(slots, kind="stable")
+        self.cell = (row * bins + col)[order]
+        self.epoch = start_epochs[valid][order]
+        self.offsets = np.searchsorted(slots[order], np.arange(n_users + 2))
+        self.n_users = n_users
+        self.raster = np.zeros(bins * bins, dtype="float64")
+        self.selection = None
+        self.period = None
+
+    def _points_of(self, slots):
+        """Indizes aller Punkte der angegebenen Personen-Slots (vektorisiertes Aneinanderhängen der Bereiche)."""
+        starts = self.offsets[slots]
+        lengths = self.offsets[slots + 1] - starts
+        total = lengths.sum()
+        if total == 0:
+            return np.zeros(0, dtype="int64")
+        shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.arange(total) + shift
+
+    def _histogram(self, points, period):
+        cells = self.cell[points]
+        if period is not None:
+            epochs = self.epoch[points]
+            cells = cells[(epochs >= period[0]) & (epochs <= period[1])]
+        return np.bincount(cells, minlength=self.bins * self.bins)
+
+    def update(self, selection=None, period=None):
+        """
+        Raster (bins x bins, Anzahl Punkte je Zelle) für eine Personen-Bitmap und einen Zeitraum (Epoch-Grenzen).
+        Keine oder eine leere Auswahl bedeutet alle Personen (wie in der Auswertung).
+        """
+        slots = np.zeros(self.n_users + 1, dtype=bool)
+        if selection is None or not np.any(selection):
+            slots[:] = True
+        else:
+            selection = np.asarray(selection, dtype=bool)[:self.n_users]
+            slots[1:len(selection) + 1] = selection
+        if self.selection is not None and period == self.period:
+            added = np.flatnonzero(slots & ~self.selection)
+            removed = np.flatnonzero(self.selection & ~slots)
+            # nur die Differenz nachführen, solange sie kleiner ist als eine Neuberechnung
+            if len(added) + len(removed) < slots.sum():
+                self.raster += self._histogram(self._points_of(added), period)
+                self.raster -= self._histogram(self._points_of(removed), period)
+                self.selection = slots
+                return self.raster.reshape(self.bins, self.bins)
+        self.raster = self._histogram(self._points_of(np.flatnonzero(slots)), period).astype("float64")
+        self.selection = slots
+        self.period = period
+        return self.raster.reshape(self.bins, self.bins)
+
+    def world_bounds(self):
+        """(x0, y0, Kantenlänge) des Rasters in Web-Mercator-Pixeln der Zoomstufe 0."""
+        return self.x0, self.y0, self.size
+
+
+def _smooth(raster):
+    """Leichte Glättung mit dem separierbaren Kern [1, 2, 1] / 4 in beide Richtungen."""
+    padded = np.pad(raster, 1, mode="constant")
+    rows = (padded[:-2, :] + 2 * padded[1:-1, :] + padded[2:, :]) / 4
+    return (rows[:, :-2] + 2 * rows[:, 1:-1] + rows[:, 2:]) / 4
+
+
+def render_heatmap(raster, colormap=HEATMAP_COLORMAP):
+    """Färbt ein Dichteraster ein (logarithmische Skala) und gibt ein RGBA-Bild zurück; leere Zellen bleiben durchsichtig."""
+    smoothed = _smooth(raster)
+    peak = smoothed.max()
+    level = np.log1p(smoothed) / np.log1p(peak) if peak > 0 else smoothed
+    rgba = colormaps[colormap](level, bytes=True)
+    alpha = np.clip(0.25 + level, 0, 1) * HEATMAP_MAX_ALPHA
+    rgba[..., 3] = np.where(smoothed > 0, alpha * 255, 0).astype("uint8")
+    return Image.fromarray(rgba, mode="RGBA")
+
+
+class HeatmapWorker:
+    """
+    Lädt die Wege und berechnet und rendert Heatmaps in einem Hintergrund-Thread. Die Modelle (je Punktart)
+    werden dort beim ersten Bedarf aufgebaut und nur von diesem Thread verändert. Eine neue Anfrage ersetzt
+    eine noch wartende; der UI-Thread holt fertige Ergebnisse mit poll() ab (z.B. per after()).
+    """
+
+    def __init__(self, cache_coordinates=None):
+        self.points = None
+        self.n_users = 0
+        self.models = {}
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # läuft als erste Aufgabe des Threads, alle Anfragen warten dahinter
+        self.loading = self.executor.submit(self._load, cache_coordinates)
+        self.future = None
+
+    def _load(self, cache_coordinates):
+        df, participants = load_analysis_trips()
+        (start_lat, start_lon), (end_lat, end_lon) = trip_endpoints(df, cache_coordinates)
+        if np.isnan(start_lat).all() and np.isnan(end_lat).all():
+            raise AnalysisError("Keine Wege mit bekannten Koordinaten.")
+        if PARTICIPANT_ID in df.columns:
+            user_ids = df[PARTICIPANT_ID].to_numpy(dtype="int64")
+        else:
+            user_ids = np.full(len(df), -1, dtype="int64")
+        epochs = df[START_EPOCH].to_numpy(dtype="int64")
+        self.points = {
+            "start": (start_lat, start_lon, user_ids, epochs),
+            "end": (end_lat, end_lon, user_ids, epochs),
+            "both": (
+                np.concatenate([start_lat, end_lat]), np.concatenate([start_lon, end_lon]),
+                np.concatenate([user_ids, user_ids]), np.concatenate([epochs, epochs]),
+            ),
+        }
+        self.n_users = len(participants) if participants is not None else 0
+
+    def _compute(self, kind, selection, period):
+        self.loading.result()       # Fehler beim Laden (z.B. AnalysisError) bei jeder Anfrage melden
+        if kind not in self.models:
+            self.models[kind] = HeatmapModel(*self.points[kind], self.n_users)
+        model = self.models[kind]
+        raster = model.update(selection, period)
+        return kind, model.world_bounds(), int(raster.sum()), render_heatmap(raster)
+
+    def request(self, kind, selection=None, period=None):
+        if self.future is not None and not self.future.running():
+            self.future.cancel()
+        selection = None if selection is None else np.array(selection, dtype=bool)
+        self.future = self.executor.submit(self._compute, kind, selection, period)
+
+    @property
+    def pending(self):
+        return self.future is not None
+
+    def poll(self):
+        """
+        (Art, Rastergrenzen, Anzahl Punkte, Bild), sobald die letzte Anfrage fertig ist, sonst None.
+        Fehler beim Laden oder Rechnen werden hier im aufrufenden Thread ausgelöst.
+        """
+        if self.future is None or not self.future.done():
+            return None
+        future, self.future = self.future, None
+        if future.cancelled():
+            return None
+        return future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def overlay_geometry(world_bounds, upper_left_tile, lower_right_tile, width, height, zoom):
+    """
+    Lage des Rasters auf der Karte: gibt (Zuschnitt im Bild als (links, oben, rechts, unten) in Rasterzellen,
+    Zielrechteck auf der Leinwand als (x, y, Breite, Höhe)) zurück oder None, wenn das Raster nicht sichtbar ist.
+    """
+    x0, y0, size = world_bounds
+    tiles_per_world_px = 2.0 ** zoom / TILE_SIZE_PX
+    px_per_tile = width / max(lower_right_tile[0] - upper_left_tile[0], 1e-9)
+    left = (x0 * tiles_per_world_px - upper_left_tile[0]) * px_per_tile
+    top = (y0 * tiles_per_world_px - upper_left_tile[1]) * px_per_tile
+    extent = size * tiles_per_world_px * px_per_tile
+    visible = (max(left, 0), max(top, 0), min(left + extent, width), min(top + extent, height))
+    if visible[2] - visible[0] < 1 or visible[3] - visible[1] < 1:
+        return None
+    scale = HEATMAP_BINS / extent
+    crop = tuple((v - o) * scale for v, o in zip(visible, (left, top, left, top)))
+    target = (int(visible[0]), int(visible[1]), int(visible[2] - visible[0]), int(visible[3] - visible[1]))
+    return crop, target
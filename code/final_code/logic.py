@@ -1,20 +1,39 @@
 # This module handles data processing, CSV operations and geocoding logic.
 
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 import pandas as pd
 from geopy.distance import geodesic
-from geopy.geocoders import MapBox
 from datetime import datetime
+from routing import routed_distance
+from coordinates import resolve_points
+from geocoding import default_geocoder
 
 # global constants
 DATA_FILE = "traffic_diary.csv"
 USER_FILE = "users.csv"
 CHART_DIRECTORY = "charts"
+WEIGHT_COLUMN = "Gewicht"     # Hochrechnungsfaktor je Person in USER_FILE
+COHORT_COLUMN = "Kohorten"    # gespeicherte Kohorten je Person in USER_FILE
+COHORT_SEPARATOR = ";"
+TMP_SUFFIX = ".tmp"
+CORRUPT_SUFFIX = ".defekt"    # unbrauchbare Dateien werden beim Start unter diesem Namen beiseitegelegt
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 10.0           # Sekunden, bis ein Schreibversuch aufgibt
+LOCK_RETRY_INTERVAL = 0.02    # Sekunden zwischen zwei Lock-Versuchen
 
-MAPBOX_API_KEY = "pk.eyJ1IjoibWF0dGhpYXNoZmwiLCJhIjoiY201ZWI5dzBkMjU2MjJ1czc2ZTI0OTlnNyJ9.6DFtWqtEQp5ufQeodVZ5dQ"
+MAPBOX_API_KEY = os.environ.get(
+    "MAPBOX_API_KEY",
+    "pk.eyJ1IjoibWF0dGhpYXNoZmwiLCJhIjoiY201ZWI5dzBkMjU2MjJ1czc2ZTI0OTlnNyJ9.6DFtWqtEQp5ufQeodVZ5dQ"
+)
+NOMINATIM_DOMAIN = os.environ.get("NOMINATIM_DOMAIN")  # z.B. "localhost:8080" für einen lokalen Server
 
-# Create a global Geolocator-Objekt
-geolocator = MapBox(api_key=MAPBOX_API_KEY)
+# Globale Geocoder-Kette: Cache, Ortsverzeichnis, lokaler Nominatim-Server, MapBox
+geolocator = default_geocoder(MAPBOX_API_KEY, NOMINATIM_DOMAIN)
 
 
 # ------------------ Allgemeine Helper-Funktionen ------------------
@@ -34,48 +53,428 @@ def create_chart_directory():
         os.makedirs(CHART_DIRECTORY)
 
 
+def geocode_address(address):
+    """Forward-Geocoding einer Adresse über die Geocoder-Kette; gibt (lat, lon) oder None zurück."""
+    return geolocator.geocode(address)
+
+
+def verify_coordinates(lat, lon):
+    """Prüft per Reverse-Geocoding, ob an der Koordinate ein Ort bekannt ist (ohne erreichbaren Dienst: ja)."""
+    return geolocator.reverse(lat, lon)
+
+
+def resolve_point_texts(points):
+    """
+    Koordinaten (lat, lon als Arrays) für mehrere Adress- oder Koordinatentexte: Koordinaten werden
+    gemeinsam geparst und per Reverse-Geocoding validiert, jede verschiedene Adresse wird nur einmal geocodiert.
+    Nicht auflösbare Orte ergeben NaN.
+    """
+    return resolve_points(pd.Series(points, dtype=object), geocode_address, verify_coordinates)
+
+
 def parse_or_reverse_geocode(s):
     """
     Bestimmt Koordinaten zu einem Adress- oder Koordinatentext.
-    - Ist 's' eine Koordinate (lat, lon), wird per Reverse-Geocoding validiert.
-    - Ist 's' eine Adresse, wird per Forward-Geocoding die Koordinate gesucht.
+    - Ist 's' eine Koordinate (dezimal oder Grad/Minuten/Sekunden), wird per Reverse-Geocoding validiert.
+    - Ist 's' eine Adresse (auch mit Kommas, z.B. "Kaiserstraße 12, Karlsruhe"), wird per Forward-Geocoding gesucht.
     Gibt ein Tupel (lat, lon) oder None zurück.
     """
-    if "," in s:
-        try:
-            lat_str, lon_str = s.split(",")
-            lat = float(lat_str.strip())
-            lon = float(lon_str.strip())
-            location = geolocator.reverse((lat, lon))
-            return (lat, lon) if location else None
-        except ValueError:
-            pass
-    loc = geolocator.geocode(s)
-    return (loc.latitude, loc.longitude) if loc else None
-
-
-def calculate_distance(start_point, end_point):
-    """Berechnet die Distanz (in km) zwischen zwei Adressen/Koordinaten."""
+    lat, lon = resolve_point_texts([s])
+    return None if pd.isna(lat[0]) else (float(lat[0]), float(lon[0]))
+
+
+def calculate_distance(start_point, end_point, mode=None):
+    """
+    Berechnet die Distanz (in km) zwischen zwei Adressen/Koordinaten.
+    Liegt für das Verkehrsmittel 'mode' ein lokaler Straßengraph vor, wird die Netzdistanz
+    verwendet, ansonsten (oder falls keine Route gefunden wird) die Luftlinie.
+    """
     try:
-        start_coords = parse_or_reverse_geocode(start_point)
-        end_coords = parse_or_reverse_geocode(end_point)
-        if not start_coords or not end_coords:
+        lat, lon = resolve_point_texts([start_point, end_point])
+        if pd.isna(lat).any():
             return None
+        start_coords = (float(lat[0]), float(lon[0]))
+        end_coords = (float(lat[1]), float(lon[1]))
+        if mode:
+            dist = routed_distance(start_coords, end_coords, mode)
+            if dist is not None:
+                return dist
         return geodesic(start_coords, end_coords).kilometers
     except:
         return None
 
 
+# ------------------ Speicherschema der Wege ------------------
+# Zeitpunkte werden als ganzzahlige Sekunden seit 01.01.1970 gespeichert. Die Uhrzeit wird
+# dabei als lokale Wanduhrzeit ohne Zeitzone interpretiert (keine Sommerzeit-Umrechnung),
+# damit die Anzeige-Strings exakt so zurückkommen, wie sie eingegeben wurden.
+START_EPOCH = "Startzeit (epoch)"
+END_EPOCH = "Endzeit (epoch)"
+DURATION = "Dauer (s)"
+TRIP_COLUMNS = [
+    "Benutzer/in", START_EPOCH, END_EPOCH, DURATION,
+    "Startpunkt", "Endpunkt", "Distanz (km)", "Modus", "Wegezweck",
+]
+# Koordinatenspalten, wenn die Wege aus der Binärdatei geladen werden (statt "lat, lon"-Texten)
+START_LAT = "Start_Lat"
+START_LON = "Start_Lon"
+END_LAT = "Ziel_Lat"
+END_LON = "Ziel_Lon"
+TRIP_DTYPES = {START_EPOCH: "int64", END_EPOCH: "int64", DURATION: "int64", "Distanz (km)": "float64"}
+LEGACY_TIME_COLUMNS = [
+    "Startdatum", "Startzeit", "Enddatum", "Endzeit", "Startzeit_kombiniert", "Endzeit_kombiniert",
+]
+DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(dt):
+    """Wandelt ein (zeitzonenloses) datetime in Sekunden seit 01.01.1970 um."""
+    return int((dt - _EPOCH).total_seconds())
+
+
+def epoch_to_datetime(seconds):
+    """Wandelt Epoch-Sekunden (Skalar oder Series) in Zeitstempel um, ohne Text zu parsen."""
+    return pd.to_datetime(seconds, unit="s")
+
+
+def format_trip_times(df):
+    """
+    Leitet die Anzeige-Spalten (Startdatum, Startzeit, ..., Endzeit_kombiniert)
+    bei Bedarf aus den Epoch-Spalten ab. Gibt eine Kopie des DataFrames zurück.
+    """
+    df = df.copy()
+    for prefix, col in (("Start", START_EPOCH), ("End", END_EPOCH)):
+        ts = epoch_to_datetime(df[col])
+        df[f"{prefix}datum"] = ts.dt.strftime("%d.%m.%Y")
+        df[f"{prefix}zeit"] = ts.dt.strftime("%H:%M")
+        df[f"{prefix}zeit_kombiniert"] = ts.dt.strftime(DATETIME_FORMAT)
+    return df
+
+
+def convert_legacy_trips(df):
+    """
+    Wandelt Daten im alten Schema (Datum/Uhrzeit als Text) in das Epoch-Schema um.
+    Daten im neuen Schema werden unverändert zurückgegeben.
+    """
+    if START_EPOCH in df.columns or "Startzeit_kombiniert" not in df.columns:
+        return df
+    df = df.copy()
+    for col, source in ((START_EPOCH, "Startzeit_kombiniert"), (END_EPOCH, "Endzeit_kombiniert")):
+        ts = pd.to_datetime(df[source], format=DATETIME_FORMAT)
+        df[col] = (ts - pd.Timestamp(_EPOCH)) // pd.Timedelta(seconds=1)
+    df[DURATION] = df[END_EPOCH] - df[START_EPOCH]
+    return df.drop(columns=LEGACY_TIME_COLUMNS)[TRIP_COLUMNS]
+
+
+def migrate_trip_file(file_name=DATA_FILE):
+    """
+    Schreibt eine Datendatei im alten Schema einmalig (atomar) in das Epoch-Schema um.
+    Gibt True zurück, wenn migriert wurde.
+    """
+    if not os.path.exists(file_name):
+        return False
+    with file_lock(file_name):
+        with open(file_name, encoding="utf-8") as f:
+            header = f.readline()
+        if "Startzeit_kombiniert" not in header:
+            return False
+        write_csv_atomic(convert_legacy_trips(pd.read_csv(file_name)), file_name)
+    return True
+
+
+# ------------------ Dateisperren für mehrere Terminals ------------------
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(file_name, timeout=LOCK_TIMEOUT):
+    """
+    Exklusive, advisory Sperre auf 'file_name' über eine daneben liegende .lock-Datei.
+    Mehrere Programminstanzen im Erhebungsraum warten so aufeinander,
+    statt sich gegenseitig Zeilen zu zerschießen. Ist die Sperre nach 'timeout'
+    Sekunden nicht frei, wird ein TimeoutError ausgelöst.
+    Die Sperre ist nicht wiedereintrittsfähig: innerhalb des Blocks nicht erneut sperren.
+    """
+    fd = os.open(file_name + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                _try_lock(fd)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Datei {file_name} ist gesperrt (Timeout nach {timeout} s).")
+                time.sleep(LOCK_RETRY_INTERVAL)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+# ------------------ Absturzsichere CSV-Schreibzugriffe ------------------
+def _fsync_directory(file_name):
+    """Synchronisiert den Verzeichniseintrag (nach Anlegen/Umbenennen), soweit das OS es zulässt."""
+    directory = os.path.dirname(os.path.abspath(file_name))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # z.B. Windows: Verzeichnisse lassen sich nicht öffnen
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_csv_atomic(df, file_name):
+    """
+    Schreibt ein DataFrame vollständig in eine temporäre Datei und ersetzt dann die Zieldatei.
+    Bei einem Absturz bleibt entweder die alte oder die neue Version erhalten, nie eine halbe.
+    """
+    tmp_name = file_name + TMP_SUFFIX
+    with open(tmp_name, "wb") as f:
+        f.write(df.to_csv(index=False).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)
+    _fsync_directory(file_name)
+
+
+def save_many_to_csv(rows, file_name):
+    """
+    Hängt mehrere Dictionary-Einträge (Zeilen) an eine CSV-Datei an.
+    Alle Zeilen werden mit einem einzigen Schreibvorgang und einem einzigen fsync
+    festgeschrieben (Group Commit), was Masseneingaben deutlich günstiger macht.
+    Existiert die Datei nicht, wird sie atomar mit Kopfzeile angelegt.
+    Der gesamte Vorgang läuft unter der Dateisperre, parallele Instanzen verzahnen sich nicht.
+    """
+    if not rows:
+        return
+    df = pd.DataFrame(rows)
+    payload = df.to_csv(header=False, index=False).encode("utf-8")
+    with file_lock(file_name):
+        if not os.path.exists(file_name):
+            write_csv_atomic(df, file_name)
+            return
+        with open(file_name, "ab") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+
 def save_to_csv(data, file_name):
     """
     Hängt einen Dictionary-Eintrag (Zeile) an eine CSV-Datei an.
     Existiert sie nicht, wird sie neu erstellt.
     """
-    df = pd.DataFrame([data])
+    save_many_to_csv([data], file_name)
+
+
+class CsvAppender:
+    """
+    Hängt Zeilen in einem Hintergrund-Thread an eine CSV-Datei an (Group Commit): Zeilen, die eingereicht
+    werden, während ein Schreibvorgang läuft, werden danach gemeinsam mit einem einzigen fsync geschrieben.
+    submit() gibt ein Future zurück (Ergebnis None oder die Exception, z.B. TimeoutError bei gesperrter Datei),
+    so wartet der UI-Thread weder auf die Dateisperre noch auf fsync.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, row):
+        future = Future()
+        self.queue.put((row, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                save_many_to_csv([row for row, _ in batch], self.file_name)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+
+def recover_csv(file_name):
+    """
+    Stellt nach einem Absturz einen konsistenten Zustand der CSV-Datei her:
+    - übrig gebliebene temporäre Dateien werden gelöscht (das Original ist noch intakt),
+    - eine unvollständig geschriebene letzte Zeile (ohne Zeilenumbruch) wird abgeschnitten,
+    - eine Datei ohne einen einzigen Zeilenumbruch wird nach <Datei>.defekt-<Zeitstempel> verschoben.
+    Gibt True zurück, wenn etwas repariert wurde.
+    """
+    # Unter der Sperre, damit kein gerade laufender Schreibvorgang einer anderen Instanz
+    # fälschlich als Absturzrest abgeschnitten wird.
+    with file_lock(file_name):
+        return _recover_csv_locked(file_name)
+
+
+def _recover_csv_locked(file_name):
+    repaired = False
+    tmp_name = file_name + TMP_SUFFIX
+    if os.path.exists(tmp_name):
+        os.remove(tmp_name)
+        repaired = True
+
     if not os.path.exists(file_name):
-        df.to_csv(file_name, index=False)
-    else:
-        df.to_csv(file_name, mode="a", header=False, index=False)
+        return repaired
+
+    with open(file_name, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return repaired
+        # Rückwärts blockweise nach dem letzten Zeilenumbruch suchen
+        pos = size
+        while pos > 0:
+            block_start = max(0, pos - 4096)
+            f.seek(block_start)
+            block = f.read(pos - block_start)
+            idx = block.rfind(b"\n")
+            if idx != -1:
+                last_newline = block_start + idx
+                break
+            pos = block_start
+        else:
+            last_newline = -1
+
+        if last_newline == size - 1:
+            return repaired
+        if last_newline == -1:
+            # Nicht einmal die Kopfzeile ist vollständig: Datei nicht löschen, sondern beiseitelegen
+            f.close()
+            quarantine_name = f"{file_name}{CORRUPT_SUFFIX}-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(file_name, quarantine_name)
+            _fsync_directory(file_name)
+            return True
+        f.truncate(last_newline + 1)
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def recover_data_files():
+    """
+    Wird beim Programmstart aufgerufen: repariert Daten- und Benutzerdatei
+    und migriert eine Datendatei im alten Text-Schema auf Epoch-Zeitstempel.
+    """
+    repaired = [name for name in (DATA_FILE, USER_FILE) if recover_csv(name)]
+    migrate_trip_file(DATA_FILE)
+    return repaired
+
+
+def add_user(first_name, last_name, weight=1.0):
+    """
+    Legt eine/n neue/n Benutzer/in in der Benutzerdatei an.
+    'weight' ist der Hochrechnungsfaktor der Person (Spalte WEIGHT_COLUMN, Standard 1).
+    Prüfen und Schreiben geschehen unter der Dateisperre (kein Lost Update bei mehreren Terminals).
+    Die Zeile wird angehängt (gleiche Inode, andere Instanzen lesen nur die neue Zeile); nur ältere
+    Dateien ohne Gewichtsspalte werden einmalig vollständig neu geschrieben.
+    Gibt False zurück, wenn der Name (ohne Groß-/Kleinschreibung) bereits existiert.
+    """
+    new_user = pd.DataFrame([{"Vorname": first_name, "Nachname": last_name, WEIGHT_COLUMN: weight}])
+    with file_lock(USER_FILE):
+        if not os.path.exists(USER_FILE):
+            write_csv_atomic(new_user, USER_FILE)
+            return True
+        existing_users = pd.read_csv(USER_FILE)
+        existing_full_names_lower = participant_names(existing_users).str.lower()
+        if f"{first_name} {last_name}".lower() in existing_full_names_lower:
+            return False
+        if WEIGHT_COLUMN not in existing_users.columns:
+            updated_users = pd.concat([existing_users, new_user], ignore_index=True)
+            # Ältere Benutzerdateien ohne Gewichtsspalte: bisherige Personen erhalten Gewicht 1
+            updated_users[WEIGHT_COLUMN] = updated_users[WEIGHT_COLUMN].fillna(1.0)
+            write_csv_atomic(updated_users, USER_FILE)
+            return True
+        # Spalten in der Reihenfolge der Datei (z.B. Kohorten, Attribute); fehlende Werte bleiben leer
+        payload = new_user.reindex(columns=existing_users.columns).to_csv(header=False, index=False)
+        with open(USER_FILE, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    payload = "\n" + payload
+            f.write(payload.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+
+def save_cohort(name, members):
+    """
+    Speichert eine benannte Kohorte bei den Teilnehmer/innen (Spalte COHORT_COLUMN der Benutzerdatei).
+    Eine bestehende Kohorte gleichen Namens wird durch die neue Mitgliederliste ersetzt.
+    """
+    name = name.strip()
+    if not name or COHORT_SEPARATOR in name:
+        raise ValueError(f"Ungültiger Kohortenname: {name!r}")
+    members = set(members)
+    with file_lock(USER_FILE):
+        users = pd.read_csv(USER_FILE)
+        full_names = participant_names(users)
+        current = users[COHORT_COLUMN] if COHORT_COLUMN in users.columns else pd.Series("", index=users.index)
+        updated = []
+        for full_name, cohorts in zip(full_names, current.fillna("").astype(str)):
+            names = [c for c in cohorts.split(COHORT_SEPARATOR) if c and c != name]
+            if full_name in members:
+                names.append(name)
+            updated.append(COHORT_SEPARATOR.join(names))
+        users[COHORT_COLUMN] = updated
+        write_csv_atomic(users, USER_FILE)
+
+
+def participant_names(user_df):
+    """Volle Namen in der Reihenfolge der Benutzerdatei (Position = Teilnehmer-ID)."""
+    return pd.Index(user_df["Vorname"].astype(str) + " " + user_df["Nachname"].astype(str))
+
+
+def load_user_weights():
+    """
+    Gibt die Hochrechnungsfaktoren als Series (voller Name -> Gewicht) zurück.
+    Fehlt die Datei oder die Spalte, ist das Ergebnis leer bzw. alle Gewichte sind 1.
+    """
+    users = load_csv(USER_FILE)
+    if users is None:
+        return pd.Series(dtype="float64")
+    names = participant_names(users)
+    if WEIGHT_COLUMN not in users.columns:
+        return pd.Series(1.0, index=names)
+    weights = pd.to_numeric(users[WEIGHT_COLUMN], errors="coerce").fillna(1.0)
+    return pd.Series(weights.to_numpy(), index=names)
 
 
 def load_csv(file_name):
@@ -85,4 +484,22 @@ def load_csv(file_name):
     """
     if not os.path.exists(file_name):
         return None
-    return pd.read_csv(file_name)
\ No newline at end of file
+    # Sperre verhindert, dass eine gerade angehängte, halbe Zeile gelesen wird
+    with file_lock(file_name):
+        return pd.read_csv(file_name)
+
+
+def load_trips_csv(file_name=DATA_FILE):
+    """
+    Lädt das Wegetagebuch mit nativen Ganzzahl-/Gleitkommaspalten (kein Datums-Parsing).
+    Ältere Dateien im Text-Schema werden beim Laden umgewandelt. Existiert die Datei nicht, None.
+    """
+    if not os.path.exists(file_name):
+        return None
+    with file_lock(file_name):
+        with open(file_name, encoding="utf-8") as f:
+            header = f.readline()
+        if START_EPOCH in header:
+            return pd.read_csv(file_name, dtype=TRIP_DTYPES)
+        df = pd.read_csv(file_name)
+    return convert_legacy_trips(df)
\ No newline at end of file
@@ -4,10 +4,23 @@
 
 import tkinter as tk
 from ui import TrafficDiaryApp
+from logic import handle_error, recover_data_files
+from trip_store import session_store
 
 def main():
+    startup_error = None
+    try:
+        # Nach einem Absturz halb geschriebene Zeilen entfernen, bevor etwas gelesen wird
+        recover_data_files()
+        # Wege einmal in den Sitzungsspeicher laden; danach werden nur neue Einträge übernommen
+        session_store()
+    except (OSError, ValueError, KeyError) as e:
+        # z.B. beschädigte oder gesperrte Datei: das Programm startet trotzdem und zeigt den Fehler an
+        startup_error = f"Daten konnten nicht geladen werden: {e}"
     root = tk.Tk()
     app = TrafficDiaryApp(root)
+    if startup_error:
+        handle_error(startup_error, app.message_label)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,256 @@
+# This module exports analysis results as self-contained reports (HTML with inline SVG charts, or PDF).
+# Individual reports for many participants are rendered in parallel worker processes, e.g. for mailing to panel members.
+
+import html
+import io
+import os
+import re
+from concurrent.futures import as_completed
+from datetime import datetime
+
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from logic import TMP_SUFFIX
+from analysis import (
+    AnalysisError, chart_figures, compute_participant_aggregates, filter_trips, load_analysis_trips,
+    participant_aggregate, process_pool
+)
+
+# global constants
+REPORT_DIRECTORY = "reports"
+REPORT_FORMATS = ("html", "pdf")
+A4_PORTRAIT = (8.27, 11.69)     # Zoll
+REPORT_BLOCKS_PER_WORKER = 4    # Aufgabenblöcke je Prozess (Lastausgleich bei unterschiedlich großen Berichten)
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; margin: 2em auto; max-width: 1100px; color: #222; }}
+h1 {{ margin-bottom: 0.2em; }}
+table {{ border-collapse: collapse; margin: 1em 0; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+.chart svg {{ max-width: 100%; height: auto; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{metadata}
+<h2>Durchschnittliche Tageswerte</h2>
+{daily}
+{tables}
+<h2>Diagramme</h2>
+{charts}
+</body>
+</html>
+"""
+
+
+def daily_values_table(aggregates):
+    """Die Tabelle "Durchschnittliche Tageswerte" wie im Analysefenster."""
+    return pd.DataFrame(
+        {"Wert": [aggregates["avg_ways"], aggregates["avg_distance"]]},
+        index=pd.Index(
+            ["Durchschnittliche Wegeanzahl pro Tag", "Durchschnittlich zurückgelegte Strecke (km/Tag)"],
+            name="Kennwert",
+        ),
+    )
+
+
+def report_metadata(aggregates, title, participants="alle", start_date="", end_date=""):
+    """Metadaten für den Kopf des Berichts (Reihenfolge = Anzeigereihenfolge)."""
+    return {
+        "Titel": title,
+        "Benutzer/innen": participants,
+        "Zeitraum": f"{start_date} - {end_date}" if start_date and end_date else "gesamter Zeitraum",
+        "Wege": aggregates.get("trip_count", ""),
+        "Tage mit Wegen": aggregates.get("day_count", ""),
+        "Gewichtet": "ja" if aggregates["weighted"] else "nein",
+        "Erstellt am": datetime.now().strftime("%d.%m.%Y %H:%M"),
+    }
+
+
+def report_tables(aggregates):
+    """Zusätzliche Tabellen des Berichts (nur die Kennwerte, die im Ergebnis vorhanden sind)."""
+    tables = {}
+    titles = {
+        "ways": "Modal Split Wege mit 95%-Konfidenzintervall",
+        "km": "Modal Split Personenkilometer mit 95%-Konfidenzintervall",
+        "purpose": "Wegezwecke mit 95%-Konfidenzintervall",
+    }
+    for key, table in aggregates.get("confidence", {}).items():
+        tables[titles[key]] = table
+    if "speed" in aggregates:
+        tables["Reisezeit und Geschwindigkeit je Verkehrsmittel"] = aggregates["speed"]["by_mode"]
+    return tables
+
+
+def figure_to_svg(fig):
+    """Gibt eine Figure als SVG-Element zurück (ohne XML-Prolog, zum Einbetten in HTML)."""
+    buffer = io.StringIO()
+    fig.savefig(buffer, format="svg")
+    svg = buffer.getvalue()
+    return svg[svg.index("<svg"):]
+
+
+def _html_table(table):
+    return table.to_html(float_format=lambda v: f"{v:.2f}", border=0)
+
+
+def build_html_report(aggregates, metadata):
+    """Erzeugt einen eigenständigen HTML-Bericht; die Diagramme sind als Vektorgrafik (SVG) eingebettet."""
+    rows = "".join(
+        f"<tr><th>{html.escape(str(k))}</th><td>{html.escape(str(v))}</td></tr>" for k, v in metadata.items()
+    )
+    tables = "".join(
+        f"<h2>{html.escape(title)}</h2>\n{_html_table(table)}\n" for title, table in report_tables(aggregates).items()
+    )
+    charts = "".join(
+        f'<div class="chart">{figure_to_svg(fig)}</div>\n' for _, fig in chart_figures(aggregates).values()
+    )
+    return _HTML_TEMPLATE.format(
+        title=html.escape(str(metadata["Titel"])),
+        metadata=f"<table>{rows}</table>",
+        daily=_html_table(daily_values_table(aggregates)),
+        tables=tables,
+        charts=charts,
+    )
+
+
+def _table_page(title, sections):
+    """Eine A4-Seite mit Überschrift und untereinander angeordneten Tabellen (Titel, DataFrame)."""
+    fig = Figure(figsize=A4_PORTRAIT)
+    fig.text(0.08, 0.95, title, fontsize=16, fontweight="bold")
+    top = 0.9
+    for heading, table in sections:
+        fig.text(0.08, top, heading, fontsize=11, fontweight="bold")
+        height = 0.022 * (len(table) + 1)
+        ax = fig.add_axes([0.08, top - 0.015 - height, 0.84, height])
+        ax.axis("off")
+        cells = [
+            [str(index)] + [f"{v:.2f}" if isinstance(v, float) else str(v) for v in row]
+            for index, *row in table.itertuples()
+        ]
+        cell_table = ax.table(
+            cellText=cells,
+            colLabels=[table.index.name or ""] + [str(c) for c in table.columns],
+            cellLoc="left",
+            bbox=[0, 0, 1, 1],
+        )
+        cell_table.auto_set_font_size(False)
+        cell_table.set_fontsize(8)
+        top -= height + 0.06
+    return fig
+
+
+def write_pdf_report(aggregates, metadata, path):
+    """Schreibt einen PDF-Bericht: eine Seite mit Metadaten und Tabellen, danach je Diagramm eine Seite."""
+    metadata_table = pd.DataFrame(
+        {"Wert": [str(v) for v in metadata.values()]}, index=pd.Index(list(metadata), name="Angabe")
+    )
+    sections = [("Angaben zum Bericht", metadata_table), ("Durchschnittliche Tageswerte", daily_values_table(aggregates))]
+    with PdfPages(path, metadata={"Title": str(metadata["Titel"])}) as pdf:
+        pdf.savefig(_table_page(str(metadata["Titel"]), sections))
+        extra = list(report_tables(aggregates).items())
+        if extra:
+            pdf.savefig(_table_page("Kennwerte", extra))
+        for _, fig in chart_figures(aggregates).values():
+            pdf.savefig(fig)
+
+
+def export_report(aggregates, metadata, path):
+    """
+    Exportiert einen Bericht; das Format ergibt sich aus der Endung (".html" oder ".pdf").
+    Die Datei wird zuerst unter einem temporären Namen geschrieben und dann ersetzt.
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension not in REPORT_FORMATS:
+        raise AnalysisError(f"Unbekanntes Berichtsformat: '{extension}'.")
+    tmp_path = path + TMP_SUFFIX
+    if extension == "html":
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(build_html_report(aggregates, metadata))
+    else:
+        write_pdf_report(aggregates, metadata, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+# ------------------ Stapelverarbeitung ------------------
+def report_file_name(name):
+    """Dateiname (ohne Endung) für den Bericht einer Person."""
+    return "bericht_" + re.sub(r"[^\w\-]+", "_", name).strip("_")
+
+
+def _participant_reports(tasks):
+    """
+    Worker: schreibt die Berichte für einen Block von Personen.
+    Jede Aufgabe enthält nur die bereits berechneten Kennwerte, keine Wege.
+    Gibt je Person (Name, Pfade, Fehlermeldung oder None) zurück.
+    """
+    results = []
+    for name, aggregates, start_date, end_date, directory, formats in tasks:
+        try:
+            metadata = report_metadata(aggregates, f"Mobilitätsbericht {name}", name, start_date, end_date)
+            base = os.path.join(directory, report_file_name(name))
+            results.append((name, [export_report(aggregates, metadata, f"{base}.{fmt}") for fmt in formats], None))
+        except Exception as e:
+            # ein Fehler (z.B. OSError) betrifft nur diese Person, nicht den Rest des Blocks
+            results.append((name, [], f"{type(e).__name__}: {e}"))
+    return results
+
+
+def write_participant_reports(df, start_date="", end_date="", formats=REPORT_FORMATS,
+                              directory=REPORT_DIRECTORY, workers=None, progress=None):
+    """
+    Schreibt für jede Person in 'df' einen eigenen Bericht in 'directory'.
+    Die Kennwerte aller Personen entstehen in einem gruppierten Durchlauf über die Wege;
+    nur das Rendern der Diagramme und Dateien wird blockweise auf 'workers' Prozesse verteilt.
+    'progress' wird nach jedem Block mit (erledigte Personen, alle Personen) aufgerufen und darf
+    AnalysisCancelled auslösen; noch nicht begonnene Blöcke werden dann verworfen.
+    Gibt eine Liste von (Name, Pfade, Fehlermeldung oder None) zurück.
+    """
+    progress = progress or (lambda done: None)
+    os.makedirs(directory, exist_ok=True)
+    table = compute_participant_aggregates(df)
+    results, tasks = [], []
+    for i, name in enumerate(table["names"]):
+        try:
+            aggregates = participant_aggregate(table, i)
+        except AnalysisError as e:
+            results.append((name, [], str(e)))
+            continue
+        tasks.append((name, aggregates, start_date, end_date, directory, tuple(formats)))
+    total = len(table["names"])
+    progress((len(results), total))
+
+    workers = workers or os.cpu_count() or 1
+    # Wenige große Blöcke je Prozess: weniger Pickling- und Verwaltungsaufwand als eine Aufgabe je Person
+    n_blocks = workers * REPORT_BLOCKS_PER_WORKER
+    blocks = [b for b in (tasks[i::n_blocks] for i in range(n_blocks)) if b]
+    if workers == 1 or len(tasks) < 2:
+        for block in blocks:
+            results.extend(_participant_reports(block))
+            progress((len(results), total))
+        return results
+    pool = process_pool(workers)
+    try:
+        for future in as_completed([pool.submit(_participant_reports, block) for block in blocks]):
+            results.extend(future.result())
+            progress((len(results), total))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def generate_participant_reports(selected_users=None, start_date="", end_date="",
+                                 formats=REPORT_FORMATS, directory=REPORT_DIRECTORY, workers=None, progress=None):
+    """Lädt und filtert das Wegetagebuch einmal und schreibt die Einzelberichte der ausgewählten Personen."""
+    df, participants = load_analysis_trips()
+    df = filter_trips(df, selected_users, start_date, end_date, participants)
+    return write_participant_reports(df, start_date, end_date, formats, directory, workers, progress)
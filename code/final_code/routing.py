@@ -0,0 +1,177 @@
+# This module provides routed (network) distances on a locally loaded road graph.
+# The graph is optional: if no graph file exists, logic.py falls back to the geodesic distance.
+
+import heapq
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+
+import pandas as pd
+
+# global constants
+ROAD_GRAPH_FILE = "road_graph.csv"
+
+# Zuordnung der Verkehrsmittel aus dem Formular zu den Routing-Profilen.
+# ÖV und Sonstiges werden nicht geroutet (Luftlinie).
+MODE_PROFILES = {
+    "Fuß": "walk",
+    "Fahrrad": "bike",
+    "MIV": "car",
+    "MIV-Mitfahrer": "car",
+}
+
+EARTH_RADIUS_M = 6371008.8
+GRID_CELL_DEG = 0.01          # Zellgröße des Fangrasters (ca. 1 km)
+MAX_SNAP_DISTANCE_M = 500     # Punkte weiter weg vom Netz werden nicht geroutet
+ROUTE_CACHE_SIZE = 100_000
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Großkreisdistanz in Metern (schnelle Näherung für Heuristik und Kantenlängen)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class RoadGraph:
+    """
+    Straßengraph für ein Routing-Profil (walk/bike/car).
+    Knoten werden über ihre (gerundeten) Koordinaten identifiziert,
+    Kanten als Adjazenzlisten mit Länge in Metern gespeichert.
+    """
+
+    def __init__(self, edges, profile):
+        self.profile = profile
+        self.node_lat = []
+        self.node_lon = []
+        self.adjacency = []
+        self._node_ids = {}
+        self._grid = defaultdict(list)
+
+        lengths = edges["Laenge (m)"] if "Laenge (m)" in edges.columns else None
+        # leere Zellen in "Einbahn" bedeuten: in beide Richtungen befahrbar
+        oneway = edges["Einbahn"].fillna(0).astype(bool) if "Einbahn" in edges.columns else None
+        for i, (lat1, lon1, lat2, lon2) in enumerate(zip(
+            edges["Von_Lat"], edges["Von_Lon"], edges["Nach_Lat"], edges["Nach_Lon"]
+        )):
+            u = self._add_node(lat1, lon1)
+            v = self._add_node(lat2, lon2)
+            if lengths is not None and not pd.isna(lengths.iat[i]):
+                length = float(lengths.iat[i])
+            else:
+                length = haversine_m(lat1, lon1, lat2, lon2)
+            self.adjacency[u].append((v, length))
+            if oneway is None or not oneway.iat[i]:
+                self.adjacency[v].append((u, length))
+
+        # Routen-Cache pro Graph: (Start-Knoten, Ziel-Knoten) -> Meter
+        self.route_length = lru_cache(maxsize=ROUTE_CACHE_SIZE)(self._astar)
+
+    def _add_node(self, lat, lon):
+        key = (round(float(lat), 6), round(float(lon), 6))
+        node = self._node_ids.get(key)
+        if node is None:
+            node = len(self.node_lat)
+            self._node_ids[key] = node
+            self.node_lat.append(key[0])
+            self.node_lon.append(key[1])
+            self.adjacency.append([])
+            self._grid[self._cell(*key)].append(node)
+        return node
+
+    @staticmethod
+    def _cell(lat, lon):
+        return (int(math.floor(lat / GRID_CELL_DEG)), int(math.floor(lon / GRID_CELL_DEG)))
+
+    def nearest_node(self, lat, lon):
+        """
+        Sucht den nächstgelegenen Knoten über das Fangraster.
+        Gibt None zurück, wenn kein Knoten innerhalb von MAX_SNAP_DISTANCE_M liegt.
+        """
+        ci, cj = self._cell(lat, lon)
+        best, best_dist = None, MAX_SNAP_DISTANCE_M
+        # Eine Rasterzelle ist mindestens ~700 m breit, der Nachbarring reicht also aus.
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for node in self._grid.get((ci + di, cj + dj), ()):
+                    d = haversine_m(lat, lon, self.node_lat[node], self.node_lon[node])
+                    if d <= best_dist:
+                        best, best_dist = node, d
+        return best
+
+    def _astar(self, source, target):
+        """A*-Suche mit Luftlinie als (zulässiger) Heuristik. Gibt Meter oder None zurück."""
+        if source == target:
+            return 0.0
+        t_lat, t_lon = self.node_lat[target], self.node_lon[target]
+        best = {source: 0.0}
+        heap = [(haversine_m(self.node_lat[source], self.node_lon[source], t_lat, t_lon), 0.0, source)]
+        while heap:
+            _, dist, node = heapq.heappop(heap)
+            if node == target:
+                return dist
+            if dist > best.get(node, math.inf):
+                continue
+            for neighbor, length in self.adjacency[node]:
+                new_dist = dist + length
+                if new_dist < best.get(neighbor, math.inf):
+                    best[neighbor] = new_dist
+                    h = haversine_m(self.node_lat[neighbor], self.node_lon[neighbor], t_lat, t_lon)
+                    heapq.heappush(heap, (new_dist + h, new_dist, neighbor))
+        return None
+
+
+# ------------------ Laden der Graphen ------------------
+_graphs = None
+
+
+def load_road_graphs(file_name=ROAD_GRAPH_FILE):
+    """
+    Lädt den lokalen Straßengraphen (z.B. aus einem OSM-Extrakt exportiert).
+    Erwartete Spalten: Von_Lat, Von_Lon, Nach_Lat, Nach_Lon, Profile (z.B. "walk|bike|car"),
+    optional "Laenge (m)" und "Einbahn" (1 = nur in Richtung Von -> Nach befahrbar).
+    Gibt ein Dictionary Profil -> RoadGraph zurück (leer, falls die Datei fehlt).
+    """
+    if not os.path.exists(file_name):
+        return {}
+    edges = pd.read_csv(file_name)
+    profiles = edges["Profile"].fillna("").str.split("|")
+    graphs = {}
+    for profile in sorted(set(MODE_PROFILES.values())):
+        mask = profiles.apply(lambda p: profile in p)
+        if mask.any():
+            graphs[profile] = RoadGraph(edges[mask].reset_index(drop=True), profile)
+    return graphs
+
+
+def get_road_graph(mode):
+    """Gibt den Graphen für ein Verkehrsmittel zurück oder None (kein Graph/Profil vorhanden)."""
+    global _graphs
+    profile = MODE_PROFILES.get(mode)
+    if profile is None:
+        return None
+    if _graphs is None:
+        _graphs = load_road_graphs()
+    return _graphs.get(profile)
+
+
+# ------------------ Distanzberechnung ------------------
+def routed_distance(start_coords, end_coords, mode):
+    """
+    Netzdistanz (in km) zwischen zwei Koordinaten für ein Verkehrsmittel.
+    Gibt None zurück, wenn kein Graph vorliegt oder keine Route gefunden wird.
+    """
+    graph = get_road_graph(mode)
+    if graph is None:
+        return None
+    source = graph.nearest_node(*start_coords)
+    target = graph.nearest_node(*end_coords)
+    if source is None or target is None:
+        return None
+    meters = graph.route_length(source, target)
+    return meters / 1000 if meters is not None else None
+
@@ -0,0 +1,159 @@
+# This module tests the geocoder chain with local stand-in providers (no network access needed).
+# Run with "python -m unittest test_geocoding" or "python -m pytest" from the final_code folder.
+
+import os
+import tempfile
+import threading
+import unittest
+
+from geocoding import (
+    BREAKER_COOLDOWN_S, FAILURE_THRESHOLD, SLOW_CALL_S, CacheProvider, GeocoderChain, GeocoderProvider
+)
+
+
+class FakeClock:
+    """Steuerbare Uhr für Circuit Breaker und Antwortzeiten."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StandInProvider(GeocoderProvider):
+    """Lokaler Ersatz für einen Online-Dienst: feste Antworten, optional Fehler oder Verzögerung."""
+
+    def __init__(self, name, places=None, known=None, error=None, delay=0.0, clock=None, suggestions=None):
+        self.name = name
+        self.places = places or {}
+        self.known = known
+        self.error = error
+        self.delay = delay
+        self.clock = clock
+        self.suggestions = suggestions
+        self.calls = 0
+
+    def _answer(self, value):
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.now += self.delay
+        if self.error is not None:
+            raise self.error
+        return value
+
+    def geocode(self, address):
+        return self._answer(self.places.get(address))
+
+    def reverse(self, lat, lon):
+        return self._answer(self.known)
+
+    def suggest(self, query, limit=8):
+        return self._answer(self.suggestions or [])
+
+
+class GeocoderChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = CacheProvider(file_name=None)
+
+    def chain(self, *providers):
+        return GeocoderChain(providers, self.cache, clock=self.clock)
+
+    def test_first_provider_with_answer_wins_and_result_is_cached(self):
+        first = StandInProvider("erster", places={})
+        second = StandInProvider("zweiter", places={"Marktplatz 1": (49.0, 8.4)})
+        chain = self.chain(first, second)
+        self.assertEqual(chain.geocode("Marktplatz 1"), (49.0, 8.4))
+        self.assertEqual(chain.geocode("  marktplatz   1 "), (49.0, 8.4))
+        self.assertEqual((first.calls, second.calls), (1, 1))
+        self.assertEqual(chain.stats["Cache"].hits, 1)
+
+    def test_unknown_address_returns_none(self):
+        self.assertIsNone(self.chain(StandInProvider("leer")).geocode("Nirgendwo"))
+
+    def test_failing_provider_is_skipped_after_threshold_and_probed_after_cooldown(self):
+        broken = StandInProvider("gestört", error=TimeoutError("keine Antwort"))
+        backup = StandInProvider("Ersatz", places={"Bahnhof": (49.1, 8.5)})
+        chain = self.chain(broken, backup)
+        for _ in range(FAILURE_THRESHOLD + 2):
+            self.cache.coordinates.clear()
+            self.assertEqual(chain.geocode("Bahnhof"), (49.1, 8.5))
+        self.assertEqual(broken.calls, FAILURE_THRESHOLD)
+        self.assertEqual(chain.stats["gestört"].skipped, 2)
+        self.assertEqual(chain.breakers["gestört"].state, "offen")
+        self.assertIn("TimeoutError", chain.metrics().loc["gestört", "Letzter Fehler"])
+
+        self.clock.now += BREAKER_COOLDOWN_S
+        self.assertEqual(chain.breakers["gestört"].state, "halb offen")
+        broken.error = None
+        broken.places = {"Rathaus": (49.2, 8.6)}
+        self.assertEqual(chain.geocode("Rathaus"), (49.2, 8.6))
+        self.assertEqual(chain.breakers["gestört"].state, "geschlossen")
+
+    def test_slow_answers_count_as_failures(self):
+        slow = StandInProvider("langsam", places={"Schule": (49.3, 8.7)}, delay=SLOW_CALL_S + 1, clock=self.clock)
+        chain = self.chain(slow)
+        for _ in range(FAILURE_THRESHOLD):
+            self.cache.coordinates.clear()
+            self.assertEqual(chain.geocode("Schule"), (49.3, 8.7))
+        self.assertEqual(chain.breakers["langsam"].state, "offen")
+
+    def test_reverse_accepts_coordinate_when_nobody_can_answer(self):
+        self.assertTrue(self.chain(StandInProvider("offline", error=OSError("kein Netz"))).reverse(49.0, 8.4))
+        self.assertFalse(self.chain(StandInProvider("kennt nichts", known=False)).reverse(49.0, 8.4))
+
+    def test_confirmed_coordinate_is_answered_from_cache(self):
+        provider = StandInProvider("bestätigt", known=True)
+        chain = self.chain(provider)
+        self.assertTrue(chain.reverse(49.000001, 8.4))
+        self.assertTrue(chain.reverse(49.0, 8.4))
+        self.assertEqual(provider.calls, 1)
+
+    def test_suggest_skips_providers_without_suggestions(self):
+        remote = StandInProvider("online", suggestions=[("Marktplatz, Karlsruhe", (49.0, 8.4))])
+        chain = self.chain(remote)
+        self.assertEqual(chain.suggest("Markt"), [("Marktplatz, Karlsruhe", (49.0, 8.4))])
+        self.assertEqual(chain.stats["Cache"].calls, 0)
+
+    def test_counters_stay_consistent_under_concurrent_calls(self):
+        flaky = StandInProvider("wackelig", error=ConnectionError("Abbruch"))
+        chain = self.chain(flaky, StandInProvider("Ersatz", places={"Bahnhof": (49.1, 8.5)}))
+        threads = [threading.Thread(target=lambda: [chain.geocode(f"Adresse {i}") for i in range(200)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = chain.stats["wackelig"]
+        self.assertEqual(stats.calls + stats.skipped, 8 * 200)
+        self.assertEqual(stats.errors, stats.calls)
+        self.assertEqual(flaky.calls, stats.calls)
+
+
+class CacheProviderTest(unittest.TestCase):
+
+    def test_cache_file_is_appended_and_reloaded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "geocode_cache.csv")
+            cache = CacheProvider(file_name)
+            cache.store("Marktplatz 1", (49.0, 8.4))
+            cache.store("MARKTPLATZ 1", (0.0, 0.0))
+            cache.store("Bahnhof", (49.1, 8.5))
+            reloaded = CacheProvider(file_name)
+            self.assertEqual(reloaded.geocode("marktplatz 1"), (49.0, 8.4))
+            self.assertEqual(reloaded.geocode("Bahnhof"), (49.1, 8.5))
+            self.assertEqual(len(reloaded.coordinates), 2)
+
+    def test_half_written_last_line_is_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "geocode_cache.csv")
+            CacheProvider(file_name).store("Bahnhof", (49.1, 8.5))
+            with open(file_name, "a", encoding="utf-8") as f:
+                f.write("rathaus,49.2")
+            self.assertEqual(CacheProvider(file_name).coordinates, {"bahnhof": (49.1, 8.5)})
+
+
+if __name__ == "__main__":
+    unittest.main()
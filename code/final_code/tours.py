@@ -0,0 +1,166 @@
+# This module reconstructs trip chains and tours (e.g. home -> work -> shop -> home) per participant.
+# It works on whole arrays in one group-sorted pass, so it scales linearly with the number of trips.
+
+import numpy as np
+import pandas as pd
+
+from logic import START_EPOCH, END_EPOCH, START_LAT, START_LON, END_LAT, END_LON
+from coordinates import parse_coordinates
+
+# global constants
+LINK_RADIUS_M = 250                 # Ende eines Weges und Start des nächsten gelten als derselbe Ort
+MAX_ACTIVITY_GAP_S = 18 * 3600      # längere Pausen beenden die Wegekette (z.B. über Nacht)
+EARTH_RADIUS_M = 6371008.8
+
+
+def point_coordinates(points):
+    """
+    Liest Koordinaten (z.B. "lat, lon" wie von der Kartenauswahl gespeichert) aus einer Series.
+    Adressen ergeben NaN; sie werden später über den normalisierten Text verglichen.
+    """
+    lat, lon, _ = parse_coordinates(points)
+    return lat, lon
+
+
+def place_table(start_points, end_points, start_coords=None, end_coords=None):
+    """
+    Faktorisiert Start- und Endpunkte gemeinsam: Koordinaten werden nur einmal je
+    eindeutigem Ort gelesen, Adresstexte werden zu ganzzahligen Ort-Codes.
+    Sind die Koordinaten bereits bekannt (start_coords/end_coords = (lat, lon), z.B. aus der
+    Binärdatei), enthalten die Texte nur Adressen (NaN bei Koordinaten) und werden nicht geparst.
+    """
+    n = len(start_points)
+    if start_coords is not None:
+        codes, uniques = pd.factorize(pd.concat([start_points, end_points], ignore_index=True))
+        text_codes, _ = pd.factorize(pd.Series(uniques, dtype=object).str.strip().str.lower())
+        place = np.append(text_codes, -1)[codes]
+        lat = np.concatenate([start_coords[0], end_coords[0]])
+        lon = np.concatenate([start_coords[1], end_coords[1]])
+        return (lat[:n], lon[:n], place[:n]), (lat[n:], lon[n:], place[n:])
+    codes, uniques = pd.factorize(pd.concat([start_points, end_points], ignore_index=True).astype(str))
+    normalized = pd.Series(uniques).str.strip().str.lower()
+    text_codes, _ = pd.factorize(normalized)
+    lat, lon = point_coordinates(normalized)
+    place = text_codes[codes]
+    return (
+        (lat[codes[:n]], lon[codes[:n]], place[:n]),
+        (lat[codes[n:]], lon[codes[n:]], place[n:]),
+    )
+
+
+def trip_places(trips):
+    """place_table für ein Wege-DataFrame; vorhandene Koordinatenspalten werden direkt verwendet."""
+    if START_LAT in trips.columns:
+        return place_table(
+            trips["Startpunkt"], trips["Endpunkt"],
+            (trips[START_LAT].to_numpy(), trips[START_LON].to_numpy()),
+            (trips[END_LAT].to_numpy(), trips[END_LON].to_numpy()),
+        )
+    return place_table(trips["Startpunkt"], trips["Endpunkt"])
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def same_place(lat1, lon1, text1, lat2, lon2, text2):
+    """Vergleicht Orte über die Distanz (falls Koordinaten bekannt), sonst über den Adress-Code."""
+    with np.errstate(invalid="ignore"):
+        near = _haversine_m(lat1, lon1, lat2, lon2) <= LINK_RADIUS_M
+    known = ~(np.isnan(lat1) | np.isnan(lat2))
+    return np.where(known, near, text1 == text2)
+
+
+def build_tours(df):
+    """
+    Ordnet jedem Weg eine Wegekette und eine Tour zu.
+    - Wege einer Person werden nach Startzeit sortiert (ein Sortiervorgang für alle Personen).
+    - Ein Weg setzt die Kette fort, wenn er dort beginnt, wo der vorherige endete, und die
+      Pause dazwischen nicht negativ und höchstens MAX_ACTIVITY_GAP_S lang ist.
+    - Eine Tour endet, sobald ein Weg zum Ausgangsort der Kette (z.B. Wohnung) zurückführt;
+      der nächste Weg der Kette beginnt dann eine neue Tour.
+    Gibt die sortierten Wege mit den Spalten "Kette", "Tour", "Tour geschlossen" und
+    "Aktivitätsdauer (min)" (Aufenthalt am Ziel bis zum nächsten Weg der Kette) zurück.
+    """
+    if df.empty:
+        return df.assign(**{"Kette": [], "Tour": [], "Tour geschlossen": [], "Aktivitätsdauer (min)": []})
+    user_codes, _ = pd.factorize(df["Benutzer/in"])
+    order = np.lexsort((df[START_EPOCH].to_numpy(), user_codes))
+    trips = df.iloc[order].reset_index(drop=True)
+    user = user_codes[order]
+    start = trips[START_EPOCH].to_numpy()
+    end = trips[END_EPOCH].to_numpy()
+    (start_lat, start_lon, start_text), (end_lat, end_lon, end_text) = trip_places(trips)
+
+    n = len(trips)
+    gap = np.empty(n, dtype="int64")
+    gap[0] = -1
+    gap[1:] = start[1:] - end[:-1]
+
+    # Verknüpfung Weg i-1 -> Weg i
+    linked = np.zeros(n, dtype=bool)
+    linked[1:] = (
+        (user[1:] == user[:-1])
+        & (gap[1:] >= 0)
+        & (gap[1:] <= MAX_ACTIVITY_GAP_S)
+        & same_place(end_lat[:-1], end_lon[:-1], end_text[:-1], start_lat[1:], start_lon[1:], start_text[1:])
+    )
+    chain = np.cumsum(~linked) - 1
+
+    # Ausgangsort jeder Kette = Startpunkt ihres ersten Weges
+    first = np.flatnonzero(~linked)[chain]
+    closes = same_place(end_lat, end_lon, end_text, start_lat[first], start_lon[first], start_text[first])
+
+    new_tour = ~linked
+    new_tour[1:] |= closes[:-1]
+    tour = np.cumsum(new_tour) - 1
+    # Eine Tour gilt als geschlossen, wenn ihr letzter Weg zum Ausgangsort zurückführt
+    last_of_tour = np.append(new_tour[1:], True)
+    tour_closed = np.zeros(tour[-1] + 1 if n else 0, dtype=bool)
+    tour_closed[tour[last_of_tour]] = closes[last_of_tour]
+
+    activity = np.full(n, np.nan)
+    activity[:-1] = np.where(linked[1:], gap[1:] / 60, np.nan)
+
+    trips["Kette"] = chain
+    trips["Tour"] = tour
+    trips["Tour geschlossen"] = tour_closed[tour]
+    trips["Aktivitätsdauer (min)"] = activity
+    return trips
+
+
+def summarize_tours(trips):
+    """
+    Fasst die Ergebnisse von build_tours zusammen:
+    - "tours": eine Zeile pro Tour (Person, Beginn, Ende, Wege, km, geschlossen, Zweckfolge)
+    - "by_user": Touren, Anteil geschlossener Touren und Wege pro Tour je Person
+    - "activity_by_purpose": mittlere/mediane Aktivitätsdauer am Ziel je Wegezweck
+    """
+    # Touren liegen nach build_tours zusammenhängend vor -> Segment-Reduktionen statt groupby
+    tour = trips["Tour"].to_numpy()
+    first = np.flatnonzero(np.diff(tour, prepend=-1) != 0)
+    last = np.append(first[1:], len(tour)) - 1
+    purposes = trips["Wegezweck"].astype(str).to_numpy()
+    tours = pd.DataFrame({
+        "Benutzer/in": trips["Benutzer/in"].to_numpy()[first],
+        "Beginn (epoch)": trips[START_EPOCH].to_numpy()[first],
+        "Ende (epoch)": trips[END_EPOCH].to_numpy()[last],
+        "Wege": last - first + 1,
+        "Distanz (km)": np.add.reduceat(trips["Distanz (km)"].fillna(0).to_numpy(), first),
+        "geschlossen": trips["Tour geschlossen"].to_numpy()[first],
+        "Zweckfolge": [" → ".join(purposes[a:b + 1]) for a, b in zip(first, last)],
+    }, index=pd.Index(tour[first], name="Tour"))
+
+    by_user = tours.groupby("Benutzer/in").agg(
+        Touren=("Wege", "size"),
+        geschlossen=("geschlossen", "mean"),
+        wege_pro_tour=("Wege", "mean"),
+    )
+    by_user["geschlossen"] *= 100
+    by_user = by_user.rename(columns={"geschlossen": "geschlossen (%)", "wege_pro_tour": "Wege pro Tour"})
+
+    activity_by_purpose = trips.groupby("Wegezweck")["Aktivitätsdauer (min)"].agg(["count", "mean", "median"])
+    activity_by_purpose.columns = ["Aktivitäten", "Mittel (min)", "Median (min)"]
+    return {"tours": tours, "by_user": by_user, "activity_by_purpose": activity_by_purpose}
@@ -0,0 +1,148 @@
+# This module prepares filtered trips for the analysis map (origins, destinations and origin-destination lines).
+# Points are clustered per zoom level on a pixel grid, so the map draws a few hundred shapes instead of one marker per trip.
+
+import numpy as np
+import pandas as pd
+
+from logic import START_LAT, START_LON, END_LAT, END_LON
+from geocoding import normalize_address
+from analysis import filter_trips, load_analysis_trips
+
+# global constants
+TILE_SIZE_PX = 256
+CLUSTER_CELL_PX = 40            # Punkte innerhalb einer Zelle dieser Größe werden zu einem Kreis zusammengefasst
+MAX_CLUSTERS = 300              # je Ebene (Start/Ziel) und Kartenausschnitt
+MAX_OD_LINES = 150
+MIN_ZOOM = 3
+MAX_ZOOM = 19
+TRIP_MAP_STAGES = ("Wege laden", "Wege filtern", "Koordinaten zuordnen")
+
+
+def trip_endpoints(df, cache_coordinates=None):
+    """
+    Koordinaten von Start und Ziel je Weg (Arrays, NaN wenn unbekannt). Adressen ohne gespeicherte
+    Koordinaten werden, soweit vorhanden, aus dem Geocode-Cache ergänzt (ein Lookup je verschiedener Adresse).
+    """
+    coordinates = []
+    for lat_column, lon_column, text_column in ((START_LAT, START_LON, "Startpunkt"), (END_LAT, END_LON, "Endpunkt")):
+        lat = df[lat_column].to_numpy(dtype="float64", copy=True)
+        lon = df[lon_column].to_numpy(dtype="float64", copy=True)
+        missing = np.isnan(lat) & df[text_column].notna().to_numpy()
+        if cache_coordinates and missing.any():
+            codes, addresses = pd.factorize(df[text_column][missing])
+            found = np.full((len(addresses) + 1, 2), np.nan)
+            for i, address in enumerate(addresses):
+                location = cache_coordinates.get(normalize_address(address))
+                if location:
+                    found[i] = location
+            lat[missing] = found[codes, 0]
+            lon[missing] = found[codes, 1]
+        coordinates.append((lat, lon))
+    return coordinates
+
+
+def load_trip_map_layers(selected_users=None, start_date="", end_date="", cache_coordinates=None, progress=None):
+    """
+    Lädt und filtert die Wege wie die Auswertung und baut daraus die Kartenebenen (für einen Hintergrund-Job).
+    'progress' erhält den Index der Stufe (TRIP_MAP_STAGES) und darf AnalysisCancelled auslösen.
+    """
+    progress = progress or (lambda stage: None)
+    progress(0)
+    df, participants = load_analysis_trips()
+    progress(1)
+    df = filter_trips(df, selected_users, start_date, end_date, participants)
+    progress(2)
+    return TripMapLayers(*trip_endpoints(df, cache_coordinates))
+
+
+def to_pixels(lat, lon, zoom):
+    """Web-Mercator-Pixelkoordinaten (wie die Kartenkacheln) für eine Zoomstufe."""
+    scale = TILE_SIZE_PX * 2.0 ** zoom
+    x = (np.asarray(lon) + 180.0) / 360.0 * scale
+    phi = np.radians(np.clip(lat, -85.0511, 85.0511))
+    y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+class TripMapLayers:
+    """
+    Start- und Zielpunkte der gefilterten Wege mit einer Detailstufe je Zoomstufe: die Punkte werden einmal
+    je Zoomstufe auf ein Pixelraster (CLUSTER_CELL_PX) gelegt und zu Zellen mit Anzahl und Schwerpunkt
+    zusammengefasst (Ergebnis wird je Zoomstufe zwischengespeichert). Beim Verschieben der Karte wird
+    nur noch nach dem sichtbaren Ausschnitt gefiltert.
+    """
+
+    def __init__(self, start, end):
+        (start_lat, start_lon), (end_lat, end_lon) = start, end
+        valid = ~(np.isnan(start_lat) | np.isnan(end_lat))
+        self.trip_count = int(valid.sum())
+        self.points = {
+            "start": (start_lat[valid], start_lon[valid]),
+            "end": (end_lat[valid], end_lon[valid]),
+        }
+        self._levels = {}
+
+    def bounds(self):
+        """(Süd, West, Nord, Ost) aller Punkte oder None, wenn es keine gibt."""
+        if self.trip_count == 0:
+            return None
+        lat = np.concatenate([self.points["start"][0], self.points["end"][0]])
+        lon = np.concatenate([self.points["start"][1], self.points["end"][1]])
+        return lat.min(), lon.min(), lat.max(), lon.max()
+
+    def level(self, zoom):
+        """Zellen je Ebene für eine Zoomstufe: Zell-Code je Weg sowie Anzahl und Schwerpunkt je Zelle."""
+        zoom = int(min(max(round(zoom), MIN_ZOOM), MAX_ZOOM))
+        if zoom not in self._levels:
+            layers = {}
+            for kind, (lat, lon) in self.points.items():
+                x, y = to_pixels(lat, lon, zoom)
+                cell = (x // CLUSTER_CELL_PX).astype("int64") * (1 << 32) + (y // CLUSTER_CELL_PX).astype("int64")
+                cells, inverse, counts = np.unique(cell, return_inverse=True, return_counts=True)
+                layers[kind] = {
+                    "cell_of_trip": inverse.ravel(),
+                    "count": counts,
+                    "lat": np.bincount(inverse.ravel(), weights=lat) / counts,
+                    "lon": np.bincount(inverse.ravel(), weights=lon) / counts,
+                }
+            self._levels[zoom] = layers
+        return self._levels[zoom]
+
+    def clusters(self, kind, zoom, view=None, limit=MAX_CLUSTERS):
+        """
+        Zellen einer Ebene ("start" oder "end") als DataFrame (lat, lon, Wege), größte zuerst.
+        'view' = (Süd, West, Nord, Ost) beschränkt auf den sichtbaren Ausschnitt.
+        """
+        layer = self.level(zoom)[kind]
+        table = pd.DataFrame({"lat": layer["lat"], "lon": layer["lon"], "Wege": layer["count"]})
+        if view is not None:
+            south, west, north, east = view
+            table = table[table["lat"].between(south, north) & table["lon"].between(west, east)]
+        return table.nlargest(limit, "Wege")
+
+    def od_lines(self, zoom, view=None, limit=MAX_OD_LINES):
+        """
+        Verbindungen zwischen Start- und Zielzellen der Zoomstufe (ohne Wege innerhalb einer Zelle)
+        als DataFrame (Start-/Ziel-Schwerpunkt, Wege), stärkste zuerst.
+        """
+        level = self.level(zoom)
+        start, end = level["start"], level["end"]
+        n_end = len(end["count"])
+        pair = start["cell_of_trip"] * n_end + end["cell_of_trip"]
+        pairs, counts = np.unique(pair, return_counts=True)
+        origin, destination = pairs // n_end, pairs % n_end
+        table = pd.DataFrame({
+            "start_lat": start["lat"][origin], "start_lon": start["lon"][origin],
+            "end_lat": end["lat"][destination], "end_lon": end["lon"][destination],
+            "Wege": counts,
+        })
+        # Start und Ziel in derselben Zelle ergeben auf dieser Zoomstufe keine sichtbare Linie
+        sx, sy = to_pixels(table["start_lat"], table["start_lon"], zoom)
+        ex, ey = to_pixels(table["end_lat"], table["end_lon"], zoom)
+        table = table[np.hypot(ex - sx, ey - sy) >= CLUSTER_CELL_PX / 2]
+        if view is not None:
+            south, west, north, east = view
+            inside_start = table["start_lat"].between(south, north) & table["start_lon"].between(west, east)
+            inside_end = table["end_lat"].between(south, north) & table["end_lon"].between(west, east)
+            table = table[inside_start | inside_end]
+        return table.nlargest(limit, "Wege")
@@ -0,0 +1,122 @@
+# This module holds the trips of the running session in memory as one compact structured array.
+# It is loaded once and afterwards only extended by the records that were appended to the binary trip file.
+
+import threading
+
+import numpy as np
+
+from logic import DATA_FILE
+from binary_trips import (
+    TRIP_RECORD, TripDictionary, dictionary_path, open_binary_trips, sync_binary_trips, trips_frame
+)
+
+# global constants
+INITIAL_CAPACITY = 1024
+
+
+class TripStore:
+    """
+    Sitzungsweiter Speicher aller Wege: ein wachsender Puffer aus TRIP_RECORD-Datensätzen
+    (56 Bytes je Weg) plus das Wörterbuch der Texte. Ein Weg ist kein Python-Objekt, sondern eine
+    Zeile des Arrays; DataFrames für Auswertungen entstehen erst bei Bedarf (frame()).
+    """
+
+    __slots__ = ("csv_file", "buffer", "count", "dictionary", "generation")
+
+    def __init__(self, csv_file=DATA_FILE):
+        self.csv_file = csv_file
+        self.buffer = np.zeros(0, dtype=TRIP_RECORD)
+        self.count = 0
+        self.dictionary = TripDictionary(dictionary_path(csv_file))
+        self.generation = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def records(self):
+        """Die gültigen Datensätze (Sicht auf den Puffer, keine Kopie)."""
+        return self.buffer[:self.count]
+
+    @property
+    def nbytes(self):
+        """Belegter Speicher des Puffers in Bytes (inkl. Reserve für weitere Wege)."""
+        return self.buffer.nbytes
+
+    def _append(self, records):
+        needed = self.count + len(records)
+        if needed > len(self.buffer):
+            # Kapazität verdoppeln: Anhängen bleibt im Mittel O(1) je Weg
+            grown = np.zeros(max(needed, 2 * len(self.buffer), INITIAL_CAPACITY), dtype=TRIP_RECORD)
+            grown[:self.count] = self.buffer[:self.count]
+            self.buffer = grown
+        self.buffer[self.count:needed] = records
+        self.count = needed
+
+    def clear(self):
+        self.buffer = np.zeros(0, dtype=TRIP_RECORD)
+        self.count = 0
+        self.dictionary = TripDictionary(dictionary_path(self.csv_file))
+        self.generation = None
+
+    def refresh(self):
+        """
+        Gleicht die Binärdatei mit der CSV-Datei ab und übernimmt nur neue Datensätze.
+        Wurde die Binärdatei neu aufgebaut (andere Generation im Kopf, z.B. nach dem Zurücksetzen),
+        wird alles neu geladen. Gibt die Anzahl neu übernommener Wege zurück.
+        """
+        sync_binary_trips(self.csv_file)
+        header, records = open_binary_trips(self.csv_file)
+        if header is None:
+            self.clear()
+            return 0
+        if int(header["generation"]) != self.generation:
+            self.clear()
+            self.generation = int(header["generation"])
+        if records is None or len(records) <= self.count:
+            return 0
+        added = len(records) - self.count
+        self.dictionary.refresh()
+        self._append(records[self.count:])
+        return added
+
+    def frame(self):
+        """Alle Wege als DataFrame im Analyse-Schema (neu erzeugt, darf vom Aufrufer verändert werden)."""
+        return trips_frame(self.records, self.dictionary)
+
+    def snapshot(self):
+        """Kopie der gültigen Datensätze und der Texte (unabhängig von späterem Anhängen oder Leeren)."""
+        return self.records.copy(), self.dictionary.snapshot()
+
+
+_session_store = None
+# Auswertungen laufen in einem Hintergrund-Thread: nicht zwei Threads gleichzeitig neue Datensätze anhängen lassen
+_session_lock = threading.Lock()
+
+
+def _refreshed_store(csv_file):
+    global _session_store
+    if _session_store is None or _session_store.csv_file != csv_file:
+        _session_store = TripStore(csv_file)
+    _session_store.refresh()
+    return _session_store
+
+
+def session_store(csv_file=DATA_FILE):
+    """
+    Der Wege-Speicher der laufenden Sitzung; wird beim ersten Aufruf einmal vollständig geladen.
+    Nur im UI-Thread verwenden; andere Threads lesen über session_frame().
+    """
+    with _session_lock:
+        return _refreshed_store(csv_file)
+
+
+def session_frame(csv_file=DATA_FILE):
+    """
+    Alle Wege der Sitzung als DataFrame, auch aus Hintergrund-Threads: unter der Sperre werden nur
+    Datensätze und Texte kopiert (ein memcpy), das DataFrame entsteht danach ohne Sperre, sodass
+    gleichzeitiges Anhängen im UI-Thread weder wartet noch die Auswertung stört.
+    """
+    with _session_lock:
+        records, texts = _refreshed_store(csv_file).snapshot()
+    return trips_frame(records, texts)
@@ -1,17 +1,16 @@
 # This module is the core of our application.
 # It manages the graphical user interface, data entry, tooltips and map interactions via Tkinter.
 
-import pandas as pd
+import numpy as np
 import os
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog, filedialog
 from tkcalendar import Calendar
 import matplotlib
-import matplotlib.pyplot as plt
 import seaborn as sns
 from PIL import Image, ImageTk
 from datetime import datetime
-from tkintermapview import TkinterMapView
+from tkintermapview import TkinterMapView, osm_to_decimal
 
 # Matplotlib-Backend einstellen (falls nötig für headless-Umgebungen)
 matplotlib.use("Agg")
@@ -19,10 +18,32 @@ matplotlib.use("Agg")
 # ---- Importiere alles, was wir aus logic.py brauchen ----
 from logic import (
     DATA_FILE, USER_FILE, CHART_DIRECTORY, MAPBOX_API_KEY,
-    handle_error, show_success, create_chart_directory,
+    START_EPOCH, END_EPOCH, DURATION, to_epoch,
+    handle_error, show_success,
     parse_or_reverse_geocode, calculate_distance,
-    save_to_csv, load_csv, geolocator
+    CsvAppender, file_lock, load_csv, add_user, participant_names, save_cohort, geocode_address, geolocator
 )
+from analysis import (
+    ANALYSIS_STAGES, AnalysisCancelled, AnalysisError, AnalysisJob, BackgroundJob,
+    invalidate_analysis_cache, parse_period
+)
+from validation import validate_trips
+from trip_store import session_frame, session_store
+from watcher import WATCH_INTERVAL_MS, CsvTail, FileWatcher
+from widgets import AddressSuggestions, ParticipantSelector
+from autocomplete import RemoteSuggestions, build_address_index
+from frequent_places import frequent_places
+from trip_map import TILE_SIZE_PX, TRIP_MAP_STAGES, load_trip_map_layers
+from heatmap import HEATMAP_KINDS, HeatmapWorker, overlay_geometry
+from cohorts import resolve_cohorts
+from comparison import COMPARISON_SHARES, run_comparison
+from report import REPORT_DIRECTORY, export_report, generate_participant_reports, report_metadata
+
+# global constants
+FREQUENT_PLACES_PROMPT = "Häufige Orte …"
+SAVE_POLL_MS = 20           # so oft wird geprüft, ob ein Eintrag geschrieben ist
+ANALYSIS_POLL_MS = 100      # so oft wird der Fortschritt einer laufenden Auswertung abgefragt
+MAP_REFRESH_MS = 300        # so oft prüft die Analysekarte, ob Zoom oder Ausschnitt sich geändert haben
 
 
 class TrafficDiaryApp:
@@ -40,6 +61,8 @@ class TrafficDiaryApp:
         self.user_var = tk.StringVar()
         self.user_menu = ttk.Combobox(root, textvariable=self.user_var, state="readonly")
         self.user_menu.grid(row=0, column=1, padx=5, pady=5)
+        self.user_tail = CsvTail(USER_FILE)
+        self.user_names = []
         self.load_users()
 
         ttk.Button(
@@ -83,12 +106,16 @@ class TrafficDiaryApp:
         self.start_point_entry = ttk.Entry(root, textvariable=self.start_point_var)
         self.start_point_entry.grid(row=5, column=1, padx=5, pady=5)
         self.start_point_entry.bind("<Button-1>", self.open_map_for_startpoint)
+        self.start_place_box = self.create_place_picker(row=5, variable=self.start_point_var)
 
         ttk.Label(root, text="Endpunkt:").grid(row=6, column=0, padx=5, pady=5)
         self.end_point_var = tk.StringVar()
         self.end_point_entry = ttk.Entry(root, textvariable=self.end_point_var)
         self.end_point_entry.grid(row=6, column=1, padx=5, pady=5)
         self.end_point_entry.bind("<Button-1>", self.open_map_for_endpoint)
+        self.end_place_box = self.create_place_picker(row=6, variable=self.end_point_var)
+        self._frequent_places = {}     # Person -> (Anzahl Wege beim Berechnen, Orte)
+        self.user_var.trace_add("write", self.update_frequent_places)
 
         # ------------------ GUI-Elemente: Verkehrsmittel & Wegezweck ------------------
         ttk.Label(root, text="Verkehrsmittel:").grid(row=7, column=0, padx=5, pady=5)
@@ -132,10 +159,11 @@ class TrafficDiaryApp:
         # ------------------ GUI-Elemente: Buttons & Meldungslabel ------------------
         ttk.Button(root, text="Speichern", command=self.save_entry).grid(row=9, column=0, columnspan=2, padx=5, pady=10)
         ttk.Button(root, text="Jetzt auswerten", command=self.open_analysis_options).grid(row=10, column=0, columnspan=2, padx=5, pady=10)
-        ttk.Button(root, text="Zurücksetzen", command=self.reset_all).grid(row=11, column=0, columnspan=2, padx=5, pady=10)
+        ttk.Button(root, text="Daten prüfen", command=self.open_validation_report).grid(row=11, column=0, columnspan=2, padx=5, pady=10)
+        ttk.Button(root, text="Zurücksetzen", command=self.reset_all).grid(row=12, column=0, columnspan=2, padx=5, pady=10)
 
         self.message_label = ttk.Label(root, text="")
-        self.message_label.grid(row=12, column=0, columnspan=3, padx=5, pady=5)
+        self.message_label.grid(row=13, column=0, columnspan=3, padx=5, pady=5)
 
         # Meldung zurücksetzen, wenn sich Werte ändern
         self.start_point_var.trace_add("write", self.clear_message)
@@ -152,6 +180,19 @@ class TrafficDiaryApp:
         self.analysis_start_date_var = tk.StringVar()
         self.analysis_end_date_var = tk.StringVar()
 
+        # Adressvorschläge der Kartensuche (lokaler Index wird bei Bedarf neu aufgebaut)
+        self._address_index = None
+        self._address_index_key = None
+        self.remote_suggestions = RemoteSuggestions(geolocator)
+
+        # Neue Einträge werden im Hintergrund angehängt (ein fsync je Schub statt je Eintrag)
+        self.trip_writer = CsvAppender(DATA_FILE)
+
+        # Änderungen anderer Programminstanzen an den gemeinsamen Dateien live übernehmen
+        self.watcher = FileWatcher([DATA_FILE, USER_FILE])
+        self.pending_files = set()
+        self.root.after(WATCH_INTERVAL_MS, self.check_shared_files)
+
     # ---------------------------------------------------------------------------
     #                           Analyse-Optionen
     # ---------------------------------------------------------------------------
@@ -164,16 +205,17 @@ class TrafficDiaryApp:
         checks_frame.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
         tk.Label(checks_frame, text="Bitte Benutzer auswählen:").pack(anchor="w", pady=(0, 5))
-        self.user_check_vars = {}
-
-        if os.path.exists(USER_FILE):
-            user_df = pd.read_csv(USER_FILE)
-            for _, row in user_df.iterrows():
-                full_name = f"{row['Vorname']} {row['Nachname']}"
-                var = tk.BooleanVar(value=True)
-                chk = ttk.Checkbutton(checks_frame, text=full_name, variable=var)
-                chk.pack(anchor="w", pady=2)
-                self.user_check_vars[full_name] = var
+        self.participant_selector = None
+
+        user_df = load_csv(USER_FILE)
+        if user_df is not None:
+            self.participant_selector = ParticipantSelector(
+                checks_frame, participant_names(user_df).tolist(), groups=resolve_cohorts(user_df)
+            )
+            self.participant_selector.pack(fill=tk.BOTH, expand=True)
+            ttk.Button(
+                checks_frame, text="Auswahl als Kohorte speichern", command=self.save_selection_as_cohort
+            ).pack(anchor="w", pady=(5, 0))
         else:
             tk.Label(checks_frame, text="Keine Benutzerdatei gefunden.").pack()
 
@@ -206,19 +248,75 @@ class TrafficDiaryApp:
             command=lambda: self.select_analysis_date(self.analysis_end_date_var, "Analyse-Enddatum"),
         ).pack(side=tk.LEFT)
 
+        # Vergleichsgruppen: aktuelle Auswahl + Zeitraum unter einem Namen merken
+        compare_frame = ttk.Frame(options_window)
+        compare_frame.pack(padx=10, pady=(0, 10), fill=tk.X)
+        tk.Label(compare_frame, text="Vergleichsgruppen:").pack(anchor="w", pady=(0, 5))
+        group_list = tk.Listbox(compare_frame, height=4)
+        group_list.pack(fill=tk.X)
+        comparison_groups = []
+
+        def add_comparison_group():
+            label = simpledialog.askstring(
+                "Vergleichsgruppe", "Name der Gruppe:",
+                initialvalue=f"Gruppe {len(comparison_groups) + 1}", parent=options_window
+            )
+            if not label:
+                return
+            start_date = self.analysis_start_date_var.get().strip()
+            end_date = self.analysis_end_date_var.get().strip()
+            comparison_groups.append({
+                "label": label.strip(),
+                "selected_users": self.participant_selector.selected.copy() if self.participant_selector else None,
+                "start_date": start_date,
+                "end_date": end_date,
+            })
+            period = f" ({start_date} - {end_date})" if start_date and end_date else ""
+            group_list.insert(tk.END, label.strip() + period)
+
+        def start_comparison():
+            options_window.destroy()
+            self.compare_groups(comparison_groups)
+
+        compare_buttons = ttk.Frame(compare_frame)
+        compare_buttons.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(compare_buttons, text="Auswahl als Gruppe hinzufügen", command=add_comparison_group).pack(side=tk.LEFT)
+        ttk.Button(compare_buttons, text="Vergleich starten", command=start_comparison).pack(side=tk.LEFT, padx=5)
+
         btn_frame = ttk.Frame(options_window)
         btn_frame.pack(padx=10, pady=10, fill=tk.X)
 
         def start_analysis():
-            selected_users = [
-                name for name, var_obj in self.user_check_vars.items() if var_obj.get()
-            ]
+            # Bitmap über die Zeilen der Benutzerdatei -> Filtern per Index statt per Namensvergleich
+            selected_users = self.participant_selector.selected.copy() if self.participant_selector else None
             options_window.destroy()
             self.analyze_data(selected_users)
 
         ttk.Button(btn_frame, text="Analyse starten", command=start_analysis).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Abbrechen", command=options_window.destroy).pack(side=tk.LEFT, padx=5)
 
+        def start_participant_reports():
+            selected_users = self.participant_selector.selected.copy() if self.participant_selector else None
+            options_window.destroy()
+            self.create_participant_reports(selected_users)
+
+        ttk.Button(btn_frame, text="Einzelberichte erstellen", command=start_participant_reports).pack(side=tk.LEFT, padx=5)
+        # Die Heatmap folgt der Auswahl in diesem Fenster, solange beide geöffnet sind
+        ttk.Button(btn_frame, text="Heatmap anzeigen", command=self.open_heatmap).pack(side=tk.LEFT, padx=5)
+
+    def save_selection_as_cohort(self):
+        """Speichert die aktuelle Auswahl unter einem Namen in der Benutzerdatei."""
+        name = simpledialog.askstring("Kohorte speichern", "Name der Kohorte:", parent=self.root)
+        if not name:
+            return
+        try:
+            save_cohort(name, self.participant_selector.get_selected())
+        except (ValueError, TimeoutError) as e:
+            messagebox.showerror("Fehler", str(e))
+            return
+        self.participant_selector.set_groups(resolve_cohorts(load_csv(USER_FILE)))
+        self.participant_selector.group_var.set(name.strip())
+
     def select_analysis_date(self, variable, title):
         """Zeigt einen Kalender an und speichert das gewählte Datum in 'variable'."""
         top = tk.Toplevel(self.root)
@@ -238,186 +336,88 @@ class TrafficDiaryApp:
     # ---------------------------------------------------------------------------
     def analyze_data(self, selected_users=None):
         """
-        Führt die Datenanalyse durch und zeigt die Diagramme in einem Scroll-Fenster an.
-        - selected_users: Liste der ausgewählten Benutzer/innen.
+        Startet die Datenanalyse im Hintergrund (analysis.AnalysisJob) und zeigt solange ein Fortschrittsfenster
+        mit der aktuellen Stufe und einer Abbrechen-Schaltfläche an.
+        - selected_users: Namensliste oder Bitmap (Zeilen der Benutzerdatei) der ausgewählten Benutzer/innen.
         - Zusätzlich wird der Zeitraum aus den Variablen analysis_start_date_var / analysis_end_date_var gelesen.
+        Das Ergebnis wird per after() abgeholt und im UI-Thread mit show_analysis angezeigt.
         """
-        df = load_csv(DATA_FILE)
-        if df is None or df.empty:
-            handle_error("Keine Daten zum Auswerten vorhanden.", self.message_label)
-            return
-
-        # Datums-Umwandlung
-        try:
-            df["Startzeit_kombiniert"] = pd.to_datetime(df["Startzeit_kombiniert"], format="%d.%m.%Y %H:%M")
-        except Exception as e:
-            handle_error(f"Datum/Zeit-Umwandlung fehlgeschlagen: {e}", self.message_label)
-            return
+        period = (self.analysis_start_date_var.get().strip(), self.analysis_end_date_var.get().strip())
+        self.show_job_progress(
+            AnalysisJob(selected_users, *period),
+            "Auswertung läuft",
+            lambda stage: (f"{ANALYSIS_STAGES[stage]} …", stage, len(ANALYSIS_STAGES)),
+            lambda result: self.show_analysis(*result, selected_users, period),
+        )
 
-        # Zeitraum filtern
-        analysis_start_str = self.analysis_start_date_var.get().strip()
-        analysis_end_str = self.analysis_end_date_var.get().strip()
-        if analysis_start_str and analysis_end_str:
+    def show_job_progress(self, job, title, describe, on_done):
+        """
+        Fortschrittsfenster für einen Hintergrund-Job (analysis.BackgroundJob) mit Abbrechen-Schaltfläche.
+        describe(job.progress) liefert (Text, Wert, Maximum) für Beschriftung und Fortschrittsbalken.
+        Der Job wird per after() abgefragt; sein Ergebnis geht im UI-Thread an on_done, Fehler und
+        Abbruch erscheinen im Meldungslabel.
+        """
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title(title)
+        progress_window.resizable(False, False)
+        text, value, maximum = describe(job.progress)
+        stage_label = ttk.Label(progress_window, text=text, width=40)
+        stage_label.pack(padx=15, pady=(15, 5), anchor="w")
+        progress_bar = ttk.Progressbar(progress_window, maximum=maximum, value=value, length=300)
+        progress_bar.pack(padx=15, pady=5)
+
+        def cancel():
+            job.cancel()
+            stage_label.config(text="Wird abgebrochen …")
+            cancel_button.config(state=tk.DISABLED)
+
+        cancel_button = ttk.Button(progress_window, text="Abbrechen", command=cancel)
+        cancel_button.pack(pady=(5, 15))
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+
+        def check_job():
+            if not job.done:
+                if not job.cancelled.is_set():
+                    text, value, maximum = describe(job.progress)
+                    stage_label.config(text=text)
+                    progress_bar.config(value=value, maximum=maximum)
+                self.root.after(ANALYSIS_POLL_MS, check_job)
+                return
+            progress_window.destroy()
             try:
-                analysis_start_dt = datetime.strptime(analysis_start_str, "%d.%m.%Y")
-                analysis_end_dt = datetime.strptime(analysis_end_str, "%d.%m.%Y")
-                analysis_end_dt = analysis_end_dt.replace(hour=23, minute=59, second=59)
-
-                df = df[df["Startzeit_kombiniert"] >= analysis_start_dt]
-                df = df[df["Startzeit_kombiniert"] <= analysis_end_dt]
-            except ValueError:
-                handle_error("Analyse-Zeitraum ungültig oder unvollständig.", self.message_label)
+                result = job.poll()
+            except AnalysisCancelled as e:
+                show_success(str(e), self.message_label)
                 return
-
-            if df.empty:
-                handle_error("Keine Einträge im ausgewählten Zeitraum gefunden.", self.message_label)
+            except (AnalysisError, OSError) as e:
+                handle_error(str(e), self.message_label)
                 return
-
-        # Distanzspalte in numerisches Format
-        df["Distanz (km)"] = pd.to_numeric(df["Distanz (km)"], errors="coerce")
-
-        # Filter nach Benutzern
-        if selected_users:
-            df = df[df["Benutzer/in"].isin(selected_users)]
-            if df.empty:
-                handle_error("Keine Einträge für die gewählten Benutzer/innen.", self.message_label)
+            except Exception as e:
+                handle_error(str(e), self.message_label)
                 return
+            on_done(result)
 
-        # Ordner für Diagramme sicherstellen
-        create_chart_directory()
-
-        # 1) Modal Split (Wege in %)
-        color_map_mode = {
-            "MIV": "red",
-            "MIV-Mitfahrer": "orange",
-            "Fuß": "lightskyblue",
-            "Fahrrad": "darkblue",
-            "ÖV": "green",
-            "Sonstiges": "pink",
-        }
-        ways_by_mode_percent = df["Modus"].value_counts(normalize=True) * 100
-        ways_modes = ways_by_mode_percent.index
-        ways_colors = [color_map_mode.get(m, "grey") for m in ways_modes]
-
-        ways_chart_path = os.path.join(CHART_DIRECTORY, "modal_split_ways.png")
-        plt.figure(figsize=(6, 6))
-        plt.pie(
-            ways_by_mode_percent,
-            labels=ways_modes,
-            autopct="%.1f%%",
-            startangle=140,
-            colors=ways_colors,
-        )
-        plt.title("Modal Split Wege", fontsize=14, fontweight="bold")
-        plt.figtext(0.5, 0.01, "Angaben in Prozent", ha="center", fontsize=10)
-        plt.tight_layout()
-        plt.savefig(ways_chart_path)
-        plt.close()
-
-        # 2) Modal Split Personenkilometer
-        km_sum_by_mode = df.groupby("Modus")["Distanz (km)"].sum()
-        total_km = km_sum_by_mode.sum()
-        if total_km == 0:
-            handle_error("Keine Distanz vorhanden, kein Diagramm möglich.", self.message_label)
-            return
-
-        km_by_mode_percent = (km_sum_by_mode / total_km) * 100
-        km_modes = km_by_mode_percent.index
-        km_colors = [color_map_mode.get(m, "grey") for m in km_modes]
-
-        km_chart_path = os.path.join(CHART_DIRECTORY, "modal_split_km.png")
-        plt.figure(figsize=(6, 6))
-        plt.pie(
-            km_by_mode_percent,
-            labels=km_modes,
-            autopct="%.1f%%",
-            startangle=140,
-            colors=km_colors,
-        )
-        plt.title("Modal Split Personenkilometer", fontsize=14, fontweight="bold")
-        plt.figtext(0.5, 0.01, "Angaben in Prozent", ha="center", fontsize=10)
-        plt.tight_layout()
-        plt.savefig(km_chart_path)
-        plt.close()
-
-        # 3) Verkehrsaufkommen (Wege)
-        color_map_purpose = {
-            "Arbeit": "lightskyblue",
-            "Dienstlich": "blue",
-            "Ausbildung": "darkblue",
-            "Einkauf": "brown",
-            "Erledigung": "red",
-            "Freizeit": "yellow",
-            "Begleitung": "lightgreen",
-        }
-        wegezweck_counts = df["Wegezweck"].value_counts(normalize=True) * 100
-        wegezweck_list = wegezweck_counts.index
-        wegezweck_colors = [color_map_purpose.get(wz, "grey") for wz in wegezweck_list]
-
-        wegezweck_chart_path = os.path.join(CHART_DIRECTORY, "verkehrsaufkommen_wege.png")
-        plt.figure(figsize=(6, 6))
-        plt.pie(
-            wegezweck_counts,
-            labels=wegezweck_list,
-            autopct="%.1f%%",
-            startangle=140,
-            colors=wegezweck_colors,
-        )
-        plt.title("Verkehrsaufkommen (Wege)", fontsize=14, fontweight="bold")
-        plt.figtext(0.5, 0.01, "Angaben in Prozent", ha="center", fontsize=10)
-        plt.tight_layout()
-        plt.savefig(wegezweck_chart_path)
-        plt.close()
+        self.root.after(ANALYSIS_POLL_MS, check_job)
 
+    def show_analysis(self, result, images, selected_users=None, period=("", "")):
+        """
+        Zeigt ein Analyse-Ergebnis (analysis.run_analysis) mit den vorab geladenen Diagrammbildern
+        in einem Scroll-Fenster an.
+        """
         # ------------ Neues Fenster mit den Diagrammen (scrollbar) ------------
-        analysis_window = tk.Toplevel(self.root)
-        analysis_window.title("Analyse Ergebnisse: Modal Split und Verkehrsaufkommen")
-
-        container = ttk.Frame(analysis_window)
-        container.pack(fill=tk.BOTH, expand=True)
-
-        canvas = tk.Canvas(container)
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        canvas.configure(yscrollcommand=scrollbar.set)
-        diagrams_frame = ttk.Frame(canvas)
-        canvas.create_window((0, 0), window=diagrams_frame, anchor="nw")
-
-        def on_frame_configure(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
-
-        diagrams_frame.bind("<Configure>", on_frame_configure)
-
-        def _on_mousewheel(event):
-            """Ermöglicht das Scrollen per Mausrad (auch für Linux)."""
-            if event.delta:  # Windows/Mac
-                canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-            else:  # Linux
-                if event.num == 4:
-                    canvas.yview_scroll(-1, "units")
-                elif event.num == 5:
-                    canvas.yview_scroll(1, "units")
-
-        diagrams_frame.bind("<MouseWheel>", _on_mousewheel)
-        diagrams_frame.bind("<Button-4>", _on_mousewheel)
-        diagrams_frame.bind("<Button-5>", _on_mousewheel)
+        diagrams_frame = self.create_scroll_window("Analyse Ergebnisse: Modal Split und Verkehrsaufkommen")
 
         # --- Oberer Bereich (zwei Diagramme nebeneinander) ---
         upper_frame = ttk.Frame(diagrams_frame)
         upper_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
 
         try:
-            ways_img = Image.open(ways_chart_path)
-            ways_photo = ImageTk.PhotoImage(ways_img)
+            ways_photo = ImageTk.PhotoImage(images["ways"])
             ways_label = tk.Label(upper_frame, image=ways_photo)
             ways_label.image = ways_photo
             ways_label.pack(side=tk.LEFT, anchor="n")
 
-            km_img = Image.open(km_chart_path)
-            km_photo = ImageTk.PhotoImage(km_img)
+            km_photo = ImageTk.PhotoImage(images["km"])
             km_label = tk.Label(upper_frame, image=km_photo)
             km_label.image = km_photo
             km_label.pack(side=tk.LEFT, anchor="n", padx=40)
@@ -436,8 +436,7 @@ class TrafficDiaryApp:
         lower_right_frame.pack(side=tk.LEFT, anchor="n", padx=40)
 
         try:
-            wz_img = Image.open(wegezweck_chart_path)
-            wz_photo = ImageTk.PhotoImage(wz_img)
+            wz_photo = ImageTk.PhotoImage(images["purpose"])
             wz_label = tk.Label(lower_left_frame, image=wz_photo)
             wz_label.image = wz_photo
             wz_label.pack(side=tk.TOP, anchor="n")
@@ -445,17 +444,8 @@ class TrafficDiaryApp:
             handle_error(f"Fehler beim Laden des Diagramms 'Verkehrsaufkommen (Wege)': {e}", self.message_label)
             return
 
-        # Statistikwerte berechnen
-        day_count = df["Startzeit_kombiniert"].dt.date.nunique()
-        number_of_ways = len(df)
-        total_distance = df["Distanz (km)"].sum()
-
-        if day_count > 0:
-            avg_ways = number_of_ways / day_count
-            avg_distance = total_distance / day_count
-        else:
-            avg_ways = 0
-            avg_distance = 0
+        avg_ways = result["avg_ways"]
+        avg_distance = result["avg_distance"]
 
         headline_label = ttk.Label(
             lower_right_frame,
@@ -481,18 +471,499 @@ class TrafficDiaryApp:
         )
         label_avg_distance.pack(side=tk.TOP, pady=5, anchor="w")
 
+        ttk.Button(
+            lower_right_frame,
+            text="Bericht exportieren",
+            command=lambda: self.export_analysis_report(result, selected_users),
+        ).pack(side=tk.TOP, pady=(15, 5), anchor="w")
+        ttk.Button(
+            lower_right_frame,
+            text="Karte anzeigen",
+            command=lambda: self.show_trip_map(selected_users, *period),
+        ).pack(side=tk.TOP, pady=5, anchor="w")
+
+        # --- Anteile mit Konfidenzintervallen (Bootstrap über Personen) ---
+        confidence_frame = ttk.Frame(diagrams_frame)
+        confidence_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+        weight_note = "gewichtet, " if result["weighted"] else ""
+        ttk.Label(
+            confidence_frame,
+            text=f"Anteile mit 95%-Konfidenzintervall ({weight_note}Bootstrap über Personen)",
+            font=("Helvetica", 14, "bold")
+        ).pack(side=tk.TOP, pady=(0, 5), anchor="w")
+        confidence_tables = ttk.Frame(confidence_frame)
+        confidence_tables.pack(side=tk.TOP, anchor="w")
+        for key, title in (("ways", "Modal Split Wege"), ("km", "Modal Split Personenkilometer"), ("purpose", "Wegezwecke")):
+            column_frame = ttk.Frame(confidence_tables)
+            column_frame.pack(side=tk.LEFT, anchor="n", padx=(0, 20))
+            ttk.Label(column_frame, text=title, font=("Helvetica", 12, "bold")).pack(side=tk.TOP, anchor="w")
+            self.show_table(column_frame, result["confidence"][key])
+
+        # --- Reisezeiten und Geschwindigkeiten ---
+        speed_frame = ttk.Frame(diagrams_frame)
+        speed_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+        if not self.show_chart(speed_frame, images["speed"], "Reisezeit/Geschwindigkeit"):
+            return
+
+        speed_stats = result["speed"]
+        summary_columns = [
+            "Wege", "Dauer (min) P50",
+            "Geschwindigkeit (km/h) P10", "Geschwindigkeit (km/h) P50", "Geschwindigkeit (km/h) P90",
+            "unplausibel",
+        ]
+        for title, table in (
+            ("Reisezeit und Geschwindigkeit je Verkehrsmittel", speed_stats["by_mode"]),
+            ("Reisezeit und Geschwindigkeit je Benutzer/in", speed_stats["by_user"]),
+        ):
+            ttk.Label(speed_frame, text=title, font=("Helvetica", 14, "bold")).pack(side=tk.TOP, pady=(10, 5), anchor="w")
+            self.show_table(speed_frame, table[summary_columns])
+
+        # --- Tagesganglinien und Wochentage ---
+        profile_frame = ttk.Frame(diagrams_frame)
+        profile_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+        if not self.show_chart(profile_frame, images["time_profiles"], "Tagesganglinien"):
+            return
+        ttk.Label(profile_frame, text="Wege je Wochentag", font=("Helvetica", 14, "bold")).pack(side=tk.TOP, pady=(10, 5), anchor="w")
+        weekday_counts = result["time_profiles"]["weekday_counts"]
+        self.show_table(profile_frame, weekday_counts.to_frame("Wege").T)
+
+        # --- Wegeketten und Touren ---
+        tour_frame = ttk.Frame(diagrams_frame)
+        tour_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+        tour_stats = result["tours"]
+        all_tours = tour_stats["tours"]
+        ttk.Label(tour_frame, text="Wegeketten und Touren", font=("Helvetica", 14, "bold")).pack(side=tk.TOP, pady=(0, 10), anchor="w")
+        for text in (
+            f"Anzahl Touren: {len(all_tours)}",
+            f"Davon geschlossen (zurück zum Ausgangsort): {all_tours['geschlossen'].mean() * 100:.1f} %",
+            f"Durchschnittliche Wege pro Tour: {all_tours['Wege'].mean():.2f}",
+        ):
+            ttk.Label(tour_frame, text=text, font=("Helvetica", 12)).pack(side=tk.TOP, pady=2, anchor="w")
+        ttk.Label(tour_frame, text="Aktivitätsdauer am Ziel je Wegezweck", font=("Helvetica", 12, "bold")).pack(side=tk.TOP, pady=(10, 5), anchor="w")
+        self.show_table(tour_frame, tour_stats["activity_by_purpose"])
+        ttk.Label(tour_frame, text="Touren je Benutzer/in", font=("Helvetica", 12, "bold")).pack(side=tk.TOP, pady=(10, 5), anchor="w")
+        self.show_table(tour_frame, tour_stats["by_user"])
+
         show_success("Auswertung erfolgreich abgeschlossen.", self.message_label)
 
+    def show_trip_map(self, selected_users=None, start_date="", end_date=""):
+        """
+        Zeigt Start-/Zielpunkte und Start-Ziel-Verbindungen der gefilterten Wege auf einer Karte.
+        Laden, Filtern und Zuordnen der Koordinaten laufen im Hintergrund (mit Fortschrittsfenster),
+        danach öffnet open_trip_map die Karte.
+        """
+        cache = geolocator.cache.coordinates if geolocator.cache is not None else None
+        self.show_job_progress(
+            BackgroundJob(load_trip_map_layers, selected_users, start_date, end_date, cache, initial_progress=0),
+            "Karte wird vorbereitet",
+            lambda stage: (f"{TRIP_MAP_STAGES[stage]} …", stage, len(TRIP_MAP_STAGES)),
+            self.open_trip_map,
+        )
+
+    def open_trip_map(self, layers):
+        """
+        Zeigt die vorbereiteten Kartenebenen (trip_map.TripMapLayers) an. Gezeichnet werden nur Cluster des
+        sichtbaren Ausschnitts; bei Zoom oder Verschieben wird mit der Detailstufe der neuen Zoomstufe neu gezeichnet.
+        """
+        if layers.trip_count == 0:
+            handle_error("Keine Wege mit bekannten Koordinaten im gewählten Filter.", self.message_label)
+            return
+
+        map_window = tk.Toplevel(self.root)
+        map_window.title("Wege auf der Karte")
+        options = ttk.Frame(map_window)
+        options.pack(fill=tk.X, padx=5, pady=5)
+        show_vars = {}
+        for key, text in (("start", "Startpunkte"), ("end", "Zielpunkte"), ("od", "Verbindungen")):
+            show_vars[key] = tk.BooleanVar(value=True)
+            ttk.Checkbutton(options, text=text, variable=show_vars[key], command=lambda: redraw(force=True)).pack(side=tk.LEFT, padx=5)
+        info_label = ttk.Label(options, text="")
+        info_label.pack(side=tk.RIGHT, padx=5)
+
+        map_widget = self.create_map_widget(map_window)
+        map_widget.pack(fill=tk.BOTH, expand=True)
+        south, west, north, east = layers.bounds()
+        # kleiner Rand, damit auch ein einzelner Ort einen gültigen Ausschnitt ergibt
+        map_widget.fit_bounding_box((north + 0.002, west - 0.002), (south - 0.002, east + 0.002))
+        last_view = None
+
+        def current_view():
+            zoom = round(map_widget.zoom)
+            north_west = osm_to_decimal(*map_widget.upper_left_tile_pos, zoom)
+            south_east = osm_to_decimal(*map_widget.lower_right_tile_pos, zoom)
+            return zoom, (south_east[0], north_west[1], north_west[0], south_east[1])
+
+        def circle(lat, lon, radius_px, deg_per_px):
+            angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+            d_lon = radius_px * deg_per_px
+            d_lat = d_lon * np.cos(np.radians(lat))
+            return list(zip(lat + d_lat * np.sin(angles), lon + d_lon * np.cos(angles)))
+
+        def redraw(force=False):
+            nonlocal last_view
+            zoom, view = current_view()
+            if not force and (zoom, view) == last_view:
+                return
+            last_view = (zoom, view)
+            # Pixelraster passend zur Kachelgröße der Karte (512er Kacheln = eine Stufe feiner)
+            level_zoom = zoom + np.log2(map_widget.tile_size / TILE_SIZE_PX)
+            deg_per_px = (view[3] - view[1]) / max(map_widget.winfo_width(), 1)
+            map_widget.delete_all_polygon()
+            map_widget.delete_all_path()
+            shapes = 0
+            if show_vars["od"].get():
+                lines = layers.od_lines(level_zoom, view)
+                strongest = lines["Wege"].max() if len(lines) else 1
+                for row in lines.itertuples(index=False):
+                    map_widget.set_path(
+                        [(row.start_lat, row.start_lon), (row.end_lat, row.end_lon)],
+                        color="#555555", width=1 + int(5 * row.Wege / strongest),
+                    )
+                shapes += len(lines)
+            for kind, color in (("start", "#1f77b4"), ("end", "#d62728")):
+                if not show_vars[kind].get():
+                    continue
+                clusters = layers.clusters(kind, level_zoom, view)
+                for row in clusters.itertuples(index=False):
+                    radius = min(4 + 2 * np.log2(row.Wege), 18)
+                    map_widget.set_polygon(
+                        circle(row.lat, row.lon, radius, deg_per_px),
+                        fill_color=color, outline_color=color, border_width=1,
+                    )
+                shapes += len(clusters)
+            info_label.config(text=f"{layers.trip_count} Wege, {shapes} Objekte (Zoomstufe {zoom})")
+
+        def watch_view():
+            if not map_window.winfo_exists():
+                return
+            redraw()
+            map_window.after(MAP_REFRESH_MS, watch_view)
+
+        map_window.after(MAP_REFRESH_MS, watch_view)
+
+    def open_heatmap(self):
+        """
+        Zeigt die Dichte der Start-/Zielpunkte als Heatmap über der Karte. Raster und Bild entstehen in einem
+        Hintergrund-Thread (heatmap.HeatmapWorker); ändern sich Auswahl oder Zeitraum im Optionsfenster, wird nur
+        die Differenz nachgerechnet. Das fertige Bild wird per after() abgeholt und passend zu Zoom und
+        Ausschnitt zugeschnitten auf die Karte gelegt.
+        """
+        cache = geolocator.cache.coordinates if geolocator.cache is not None else None
+        # auch das Laden der Wege läuft im Thread des Workers
+        worker = HeatmapWorker(cache)
+
+        heatmap_window = tk.Toplevel(self.root)
+        heatmap_window.title("Heatmap der Start- und Zielpunkte")
+        options = ttk.Frame(heatmap_window)
+        options.pack(fill=tk.X, padx=5, pady=5)
+        kind_var = tk.StringVar(value="both")
+        for kind, text in zip(HEATMAP_KINDS, ("Startpunkte", "Zielpunkte", "Start- und Zielpunkte")):
+            ttk.Radiobutton(options, text=text, value=kind, variable=kind_var).pack(side=tk.LEFT, padx=5)
+        info_label = ttk.Label(options, text="Wege werden geladen …")
+        info_label.pack(side=tk.RIGHT, padx=5)
+
+        map_widget = self.create_map_widget(heatmap_window)
+        map_widget.pack(fill=tk.BOTH, expand=True)
+        state = {"request": None, "image": None, "bounds": None, "view": None, "photo": None}
+
+        def current_request():
+            selector = self.participant_selector
+            selection = selector.selected if selector is not None else None
+            try:
+                period = parse_period(
+                    self.analysis_start_date_var.get().strip(), self.analysis_end_date_var.get().strip()
+                )
+            except AnalysisError:
+                period = None
+            key = (kind_var.get(), None if selection is None else np.packbits(selection).tobytes(), period)
+            return key, selection, period
+
+        def place_overlay():
+            map_widget.canvas.delete("heatmap")
+            geometry = overlay_geometry(
+                state["bounds"], map_widget.upper_left_tile_pos, map_widget.lower_right_tile_pos,
+                map_widget.width, map_widget.height, round(map_widget.zoom),
+            )
+            if geometry is None:
+                return
+            crop, (x, y, width, height) = geometry
+            state["photo"] = ImageTk.PhotoImage(state["image"].resize((width, height), Image.BILINEAR, box=crop))
+            map_widget.canvas.create_image(x, y, anchor="nw", image=state["photo"], tag="heatmap")
+
+        def fit_to_raster(world_bounds):
+            x0, y0, size = world_bounds
+            north_west = osm_to_decimal(x0 / TILE_SIZE_PX, y0 / TILE_SIZE_PX, 0)
+            south_east = osm_to_decimal((x0 + size) / TILE_SIZE_PX, (y0 + size) / TILE_SIZE_PX, 0)
+            map_widget.fit_bounding_box(north_west, south_east)
+
+        def tick():
+            if not heatmap_window.winfo_exists():
+                worker.close()
+                return
+            key, selection, period = current_request()
+            if key != state["request"]:
+                worker.request(key[0], selection, period)
+                state["request"] = key
+                if worker.loading.done():
+                    info_label.config(text="Heatmap wird berechnet …")
+            try:
+                result = worker.poll()
+            except AnalysisError as e:
+                worker.close()
+                heatmap_window.destroy()
+                handle_error(str(e), self.message_label)
+                return
+            if result is not None:
+                if state["bounds"] is None:
+                    fit_to_raster(result[1])
+                _, state["bounds"], points, state["image"] = result
+                state["view"] = None
+                info_label.config(text=f"{points} Punkte")
+            view = (map_widget.zoom, map_widget.upper_left_tile_pos, map_widget.width, map_widget.height)
+            if state["image"] is not None and view != state["view"]:
+                place_overlay()
+                state["view"] = view
+            # neu geladene Kacheln liegen sonst über der Heatmap
+            map_widget.canvas.tag_raise("heatmap")
+            heatmap_window.after(MAP_REFRESH_MS, tick)
+
+        heatmap_window.after(MAP_REFRESH_MS, tick)
+
+    def export_analysis_report(self, result, selected_users=None):
+        """Speichert das Analyseergebnis als HTML- oder PDF-Bericht (Format nach Dateiendung)."""
+        path = filedialog.asksaveasfilename(
+            title="Bericht exportieren",
+            defaultextension=".html",
+            filetypes=[("HTML-Bericht", "*.html"), ("PDF-Bericht", "*.pdf")],
+        )
+        if not path:
+            return
+        selected_count = int(np.count_nonzero(selected_users)) if selected_users is not None else 0
+        metadata = report_metadata(
+            result,
+            "Auswertung Wegetagebuch",
+            f"{selected_count} ausgewählt" if selected_count else "alle",
+            self.analysis_start_date_var.get().strip(),
+            self.analysis_end_date_var.get().strip(),
+        )
+        try:
+            export_report(result, metadata, path)
+        except (AnalysisError, OSError) as e:
+            handle_error(f"Bericht konnte nicht gespeichert werden: {e}", self.message_label)
+            return
+        show_success(f"Bericht gespeichert: {path}", self.message_label)
+
+    def create_participant_reports(self, selected_users=None):
+        """
+        Erstellt für jede ausgewählte Person einen eigenen Bericht im Ordner REPORT_DIRECTORY.
+        Die Berichte entstehen im Hintergrund (mehrere Prozesse); ein Fortschrittsfenster zeigt die
+        erledigten Personen an und erlaubt den Abbruch.
+        """
+        def describe(progress):
+            if progress is None:
+                return "Daten laden …", 0, 1
+            done, total = progress
+            return f"{done} von {total} Berichten erstellt …", done, max(total, 1)
+
+        def on_done(results):
+            failed = [name for name, _, error in results if error]
+            message = f"{len(results) - len(failed)} Berichte in '{REPORT_DIRECTORY}' erstellt."
+            if failed:
+                message += f" {len(failed)} ohne Bericht (z.B. {failed[0]})."
+            show_success(message, self.message_label)
+
+        job = BackgroundJob(
+            generate_participant_reports,
+            selected_users,
+            self.analysis_start_date_var.get().strip(),
+            self.analysis_end_date_var.get().strip(),
+        )
+        self.show_job_progress(job, "Einzelberichte werden erstellt", describe, on_done)
+
+    def compare_groups(self, groups):
+        """Vergleicht mehrere Gruppen (Kohorten und/oder Zeiträume) und zeigt Diagramm und Tabellen an."""
+        try:
+            result = run_comparison(groups)
+        except AnalysisError as e:
+            handle_error(str(e), self.message_label)
+            return
+
+        frame = self.create_scroll_window("Vergleich: " + ", ".join(g["label"] for g in groups))
+        section = ttk.Frame(frame)
+        section.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
+        if not self.show_chart(section, result["chart"], "Vergleich"):
+            return
+
+        ttk.Label(section, text="Durchschnittliche Tageswerte", font=("Helvetica", 14, "bold")).pack(
+            side=tk.TOP, pady=(10, 5), anchor="w"
+        )
+        self.show_table(section, result["daily"])
+        for key, _, _, title in COMPARISON_SHARES:
+            ttk.Label(section, text=f"{title} (%)", font=("Helvetica", 12, "bold")).pack(
+                side=tk.TOP, pady=(10, 0), anchor="w"
+            )
+            self.show_table(section, result["shares"][key].join(result["differences"][key]))
+
+    def create_scroll_window(self, title):
+        """Öffnet ein neues Fenster mit senkrechter Scrollleiste und gibt den inneren Frame zurück."""
+        window = tk.Toplevel(self.root)
+        window.title(title)
+
+        container = ttk.Frame(window)
+        container.pack(fill=tk.BOTH, expand=True)
+
+        canvas = tk.Canvas(container)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        canvas.configure(yscrollcommand=scrollbar.set)
+        content_frame = ttk.Frame(canvas)
+        canvas.create_window((0, 0), window=content_frame, anchor="nw")
+
+        def on_frame_configure(event):
+            canvas.configure(scrollregion=canvas.bbox("all"))
+
+        content_frame.bind("<Configure>", on_frame_configure)
+
+        def _on_mousewheel(event):
+            """Ermöglicht das Scrollen per Mausrad (auch für Linux)."""
+            if event.delta:  # Windows/Mac
+                canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+            else:  # Linux
+                if event.num == 4:
+                    canvas.yview_scroll(-1, "units")
+                elif event.num == 5:
+                    canvas.yview_scroll(1, "units")
+
+        content_frame.bind("<MouseWheel>", _on_mousewheel)
+        content_frame.bind("<Button-4>", _on_mousewheel)
+        content_frame.bind("<Button-5>", _on_mousewheel)
+
+        return content_frame
+
+    def show_chart(self, parent, image, name):
+        """
+        Zeigt ein gerendertes Diagramm an ('image': Dateipfad oder bereits geladenes PIL-Bild).
+        Gibt False zurück, wenn das Laden scheitert.
+        """
+        try:
+            img = image if isinstance(image, Image.Image) else Image.open(image)
+            photo = ImageTk.PhotoImage(img)
+            label = tk.Label(parent, image=photo)
+            label.image = photo
+            label.pack(side=tk.TOP, anchor="w")
+        except Exception as e:
+            handle_error(f"Fehler beim Laden des Diagramms '{name}': {e}", self.message_label)
+            return False
+        return True
+
+    def show_table(self, parent, table, height=None):
+        """
+        Zeigt ein DataFrame als Tabelle (Treeview) an; Kommazahlen mit zwei Nachkommastellen.
+        Hat die Tabelle mehr Zeilen als 'height', erhält sie eine eigene Scrollbar.
+        """
+        columns = [table.index.name or ""] + [str(c) for c in table.columns]
+        height = height or min(len(table), 15)
+        table_frame = ttk.Frame(parent)
+        tree = ttk.Treeview(
+            table_frame,
+            columns=columns,
+            show="headings",
+            height=height
+        )
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=max(90, 8 * len(col)), anchor="e")
+        tree.column(columns[0], anchor="w")
+        for index, row in table.iterrows():
+            values = [index] + [
+                f"{v:.2f}" if isinstance(v, float) and not v.is_integer() else
+                int(v) if isinstance(v, float) else v
+                for v in row.tolist()
+            ]
+            tree.insert("", tk.END, values=values)
+        tree.pack(side=tk.LEFT)
+        if len(table) > height:
+            table_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+            table_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.configure(yscrollcommand=table_scrollbar.set)
+        table_frame.pack(side=tk.TOP, anchor="w", pady=5)
+        return tree
+
+    # ---------------------------------------------------------------------------
+    #                         Datenprüfung
+    # ---------------------------------------------------------------------------
+    def open_validation_report(self):
+        """Prüft das gesamte Wegetagebuch auf Qualitätsprobleme und zeigt den Prüfbericht an."""
+        try:
+            df = session_frame()
+        except (ValueError, TimeoutError) as e:
+            handle_error(f"Daten konnten nicht gelesen werden: {e}", self.message_label)
+            return
+        if df.empty:
+            handle_error("Keine Daten zum Prüfen vorhanden.", self.message_label)
+            return
+
+        summary, details = validate_trips(df)
+
+        report_window = tk.Toplevel(self.root)
+        report_window.title("Prüfbericht Datenqualität")
+        report_frame = ttk.Frame(report_window)
+        report_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        ttk.Label(report_frame, text="Verstöße je Regel", font=("Helvetica", 14, "bold")).pack(side=tk.TOP, pady=(0, 5), anchor="w")
+        self.show_table(report_frame, summary)
+
+        if details.empty:
+            ttk.Label(report_frame, text="Keine Auffälligkeiten gefunden.", font=("Helvetica", 12)).pack(side=tk.TOP, pady=5, anchor="w")
+        else:
+            ttk.Label(
+                report_frame,
+                text=f"Betroffene Wege (Zeile = Zeilennummer in {DATA_FILE})",
+                font=("Helvetica", 14, "bold")
+            ).pack(side=tk.TOP, pady=(10, 5), anchor="w")
+            self.show_table(report_frame, details, height=20)
+
+        total = int(summary["Verstöße"].sum())
+        if total:
+            handle_error(f"Datenprüfung: {total} Verstöße gefunden.", self.message_label)
+        else:
+            show_success("Datenprüfung: keine Verstöße gefunden.", self.message_label)
+
     # ---------------------------------------------------------------------------
     #                         Benutzer-Funktionen
     # ---------------------------------------------------------------------------
     def load_users(self):
-        """Lädt vorhandene Benutzer/innen aus der CSV-Datei und füllt das Combobox-Menü."""
-        self.user_menu["values"] = []
-        if os.path.exists(USER_FILE):
-            users = pd.read_csv(USER_FILE)
-            user_list = sorted(users["Vorname"] + " " + users["Nachname"])
-            self.user_menu["values"] = user_list
+        """
+        Lädt die Benutzer/innen aus der CSV-Datei und füllt das Combobox-Menü.
+        Nach dem ersten Aufruf werden nur neu angehängte Zeilen gelesen; eine ersetzte Datei wird neu geladen.
+        """
+        reset, users = self.user_tail.read()
+        if reset:
+            self.user_names = []
+        if users is not None and len(users):
+            self.user_names = sorted(self.user_names + participant_names(users).tolist())
+        self.user_menu["values"] = self.user_names
+
+    def check_shared_files(self):
+        """
+        Übernimmt Änderungen anderer Programminstanzen an Wege- und Benutzerdatei, ohne alles neu zu laden:
+        Der Sitzungsspeicher liest nur die angehängten Wege, das Benutzermenü nur die neuen Zeilen.
+        """
+        self.pending_files |= self.watcher.poll()
+        try:
+            if os.path.abspath(DATA_FILE) in self.pending_files:
+                session_store()
+                invalidate_analysis_cache()
+                self.pending_files.discard(os.path.abspath(DATA_FILE))
+            if os.path.abspath(USER_FILE) in self.pending_files:
+                self.load_users()
+                self.pending_files.discard(os.path.abspath(USER_FILE))
+        except TimeoutError:
+            pass    # Datei gerade von einer anderen Instanz gesperrt: beim nächsten Durchlauf erneut versuchen
+        self.root.after(WATCH_INTERVAL_MS, self.check_shared_files)
 
     def add_new_user(self):
         """Öffnet ein Fenster zum Anlegen eines neuen Benutzers/einer neuen Benutzerin."""
@@ -504,27 +975,23 @@ class TrafficDiaryApp:
                 handle_error("Bitte Vor- und Nachname angeben.", message_label)
                 return
 
+            try:
+                weight = float(weight_var.get().strip().replace(",", ".") or 1)
+            except ValueError:
+                weight = -1
+            if weight <= 0:
+                handle_error("Gewicht muss eine positive Zahl sein.", message_label)
+                return
+
             user_full_name = f"{first_name} {last_name}"
-            user_full_name_lower = user_full_name.lower()
-
-            if os.path.exists(USER_FILE):
-                existing_users = pd.read_csv(USER_FILE)
-                existing_full_names_lower = (
-                    existing_users["Vorname"].str.lower()
-                    + " "
-                    + existing_users["Nachname"].str.lower()
-                )
-                if user_full_name_lower in existing_full_names_lower.values:
-                    handle_error("Benutzer/in bereits vorhanden.", message_label)
-                    return
-
-            new_user = pd.DataFrame([{"Vorname": first_name, "Nachname": last_name}])
-            if not os.path.exists(USER_FILE):
-                new_user.to_csv(USER_FILE, index=False)
-            else:
-                existing_users = pd.read_csv(USER_FILE)
-                updated_users = pd.concat([existing_users, new_user], ignore_index=True)
-                updated_users.to_csv(USER_FILE, index=False)
+            try:
+                created = add_user(first_name, last_name, weight)
+            except TimeoutError as e:
+                handle_error(str(e), message_label)
+                return
+            if not created:
+                handle_error("Benutzer/in bereits vorhanden.", message_label)
+                return
 
             self.load_users()
             self.user_var.set(user_full_name)
@@ -543,11 +1010,17 @@ class TrafficDiaryApp:
         last_name_entry = ttk.Entry(user_window, textvariable=last_name_var)
         last_name_entry.grid(row=1, column=1, padx=5, pady=5)
 
+        # Hochrechnungsfaktor für gewichtete Auswertungen (Panel-Erhebungen)
+        ttk.Label(user_window, text="Gewicht (optional):").grid(row=2, column=0, padx=5, pady=5)
+        weight_var = tk.StringVar(value="1")
+        weight_entry = ttk.Entry(user_window, textvariable=weight_var)
+        weight_entry.grid(row=2, column=1, padx=5, pady=5)
+
         message_label = ttk.Label(user_window, text="")
-        message_label.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+        message_label.grid(row=3, column=0, columnspan=2, padx=5, pady=5)
 
         save_button = ttk.Button(user_window, text="Speichern", command=save_user)
-        save_button.grid(row=3, column=0, columnspan=2, padx=5, pady=10)
+        save_button.grid(row=4, column=0, columnspan=2, padx=5, pady=10)
 
         first_name_entry.focus()
         user_window.bind("<Return>", save_user)
@@ -738,6 +1211,62 @@ class TrafficDiaryApp:
             confirm_btn_text="Diesen Endpunkt übernehmen"
         )
 
+    def create_place_picker(self, row, variable):
+        """Auswahlfeld "Häufige Orte" neben einem Start-/Endpunkt; setzt die Koordinate ohne Karte und Geocoding."""
+        place_var = tk.StringVar()
+        box = ttk.Combobox(self.root, textvariable=place_var, state="readonly", width=32)
+        box.set(FREQUENT_PLACES_PROMPT)
+        box.grid(row=row, column=2, padx=5, pady=5)
+
+        def on_pick(event):
+            places = self._frequent_places.get(self.user_var.get(), (None, []))[1]
+            index = box.current()
+            if 0 <= index < len(places):
+                lat, lon = (round(value, 5) for value in places[index][1])
+                # eigener, schon oft benutzter Ort: keine erneute Prüfung per Reverse-Geocoding
+                if geolocator.cache is not None:
+                    geolocator.cache.store_confirmed(lat, lon)
+                variable.set(f"{lat:.5f}, {lon:.5f}")
+            box.set(FREQUENT_PLACES_PROMPT)
+
+        box.bind("<<ComboboxSelected>>", on_pick)
+        return box
+
+    def update_frequent_places(self, *args):
+        """Füllt die Schnellauswahl mit den häufigsten Orten der gewählten Person (je Person und Datenstand berechnet)."""
+        user = self.user_var.get()
+        places = []
+        if user:
+            store = session_store()
+            count, places = self._frequent_places.get(user, (None, []))
+            if count != len(store):
+                cache = geolocator.cache.coordinates if geolocator.cache is not None else None
+                places = frequent_places(store.records, store.dictionary, user, cache)
+                self._frequent_places[user] = (len(store), places)
+        for box in (self.start_place_box, self.end_place_box):
+            box["values"] = [label for label, _, _ in places]
+            box.set(FREQUENT_PLACES_PROMPT if places else "")
+
+    def address_index(self):
+        """Lokaler Index für Adressvorschläge; wird neu aufgebaut, wenn Wege oder Cache-Einträge hinzukommen."""
+        store = session_store()
+        key = (len(store), len(geolocator.cache.coordinates) if geolocator.cache is not None else 0)
+        if self._address_index is None or key != self._address_index_key:
+            self._address_index = build_address_index(store, geolocator)
+            self._address_index_key = key
+        return self._address_index
+
+    def create_map_widget(self, parent):
+        """Kartenansicht mit den MapBox-Kacheln."""
+        map_widget = TkinterMapView(parent, width=800, height=600, corner_radius=0)
+        map_widget.set_tile_server(
+            f"https://api.mapbox.com/styles/v1/mapbox/streets-v11/tiles/"
+            f"{{z}}/{{x}}/{{y}}?access_token={MAPBOX_API_KEY}",
+            tile_size=512,
+            max_zoom=19
+        )
+        return map_widget
+
     def open_map_generic(self, var_name, window_title, confirm_btn_text):
         """
         Öffnet eine Karte, um Koordinaten (Marker) festzulegen.
@@ -756,7 +1285,7 @@ class TrafficDiaryApp:
         search_entry = ttk.Entry(search_frame, textvariable=search_var)
         search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
 
-        def search_location():
+        def search_location(loc=None):
             nonlocal marker
             query = search_var.get().strip()
             if not query:
@@ -765,11 +1294,12 @@ class TrafficDiaryApp:
                 handle_error("Es ist bereits ein Marker vorhanden. Bitte zurücksetzen.", self.message_label)
                 return
             try:
-                loc = geolocator.geocode(query)
+                # Vorschläge mit bekannten Koordinaten brauchen kein Geocoding
+                loc = loc or geocode_address(query)
                 if loc:
-                    map_widget.set_position(loc.latitude, loc.longitude)
+                    map_widget.set_position(*loc)
                     map_widget.set_zoom(14)
-                    marker = map_widget.set_marker(loc.latitude, loc.longitude, text="")
+                    marker = map_widget.set_marker(*loc, text="")
                     marker.set_marker_color("red")
                     disable_left_click()
                 else:
@@ -777,19 +1307,27 @@ class TrafficDiaryApp:
             except Exception as e:
                 handle_error(f"Fehler bei der Ortssuche: {e}", self.message_label)
 
-        search_button = ttk.Button(search_frame, text="Suchen", command=search_location)
+        def pick_suggestion(text, loc):
+            if loc and geolocator.cache is not None:
+                geolocator.cache.store(text, loc)
+            search_location(loc)
+
+        search_button = ttk.Button(search_frame, text="Suchen", command=lambda: search_location())
         search_button.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<Return>", lambda event: search_location())
+
+        AddressSuggestions(
+            map_window, search_entry, search_var,
+            local_suggest=self.address_index().suggest,
+            remote=self.remote_suggestions,
+            on_pick=pick_suggestion,
+            pack_options={"fill": tk.X, "padx": 10, "after": search_frame},
+        )
 
         action_frame = ttk.Frame(map_window)
         action_frame.pack(fill=tk.X, padx=5, pady=5)
 
-        map_widget = TkinterMapView(map_window, width=800, height=600, corner_radius=0)
-        map_widget.set_tile_server(
-            f"https://api.mapbox.com/styles/v1/mapbox/streets-v11/tiles/"
-            f"{{z}}/{{x}}/{{y}}?access_token={MAPBOX_API_KEY}",
-            tile_size=512,
-            max_zoom=19
-        )
+        map_widget = self.create_map_widget(map_window)
 
         karlsruhe_lat, karlsruhe_lon = 49.00937, 8.40444
         map_widget.set_position(karlsruhe_lat, karlsruhe_lon)
@@ -888,28 +1426,57 @@ class TrafficDiaryApp:
             )
             return
 
-        dist = calculate_distance(start_point, end_point)
+        dist = calculate_distance(start_point, end_point, mode)
         if dist is None:
             handle_error("Distanz konnte nicht berechnet werden.", self.message_label)
             return
 
+        # Reihenfolge entspricht TRIP_COLUMNS (Zeilen werden ohne Kopfzeile angehängt)
         entry = {
             "Benutzer/in": user,
-            "Startdatum": start_date,
-            "Startzeit": start_time,
-            "Enddatum": end_date,
-            "Endzeit": end_time,
-            "Startzeit_kombiniert": start_datetime_str,
-            "Endzeit_kombiniert": end_datetime_str,
+            START_EPOCH: to_epoch(start_dt),
+            END_EPOCH: to_epoch(end_dt),
+            DURATION: to_epoch(end_dt) - to_epoch(start_dt),
             "Startpunkt": start_point,
             "Endpunkt": end_point,
             "Distanz (km)": dist,
             "Modus": mode,
             "Wegezweck": purpose,
         }
-        save_to_csv(entry, DATA_FILE)
-        show_success("Der Eintrag wurde erfolgreich abgespeichert.", self.message_label)
+        # Geschrieben wird im Hintergrund (Group Commit); scheitert es, kommen die Eingaben zurück ins Formular
+        form = [(var, var.get()) for var in self.form_vars()]
+        future = self.trip_writer.submit(entry)
         self.clear_fields()
+        show_success("Eintrag wird gespeichert …", self.message_label)
+        self.root.after(SAVE_POLL_MS, self.finish_save, future, form)
+
+    def finish_save(self, future, form):
+        """Wartet (per after) auf das Schreiben eines Eintrags und übernimmt ihn dann in den Sitzungsspeicher."""
+        if not future.done():
+            self.root.after(SAVE_POLL_MS, self.finish_save, future, form)
+            return
+        error = future.exception()
+        if error is not None:
+            if not any(var.get() for var, _ in form):
+                for var, value in form:
+                    var.set(value)
+            handle_error(f"Der Eintrag wurde nicht gespeichert: {error}", self.message_label)
+            return
+        try:
+            # Sitzungsspeicher und Binärkopie übernehmen nur die neue Zeile
+            session_store()
+        except TimeoutError as e:
+            handle_error(str(e), self.message_label)
+            return
+        invalidate_analysis_cache()
+        show_success("Der Eintrag wurde erfolgreich abgespeichert.", self.message_label)
+
+    def form_vars(self):
+        """Die Variablen aller Eingabefelder eines Weges."""
+        return [
+            self.user_var, self.start_date_var, self.end_date_var, self.start_time_var, self.end_time_var,
+            self.start_point_var, self.end_point_var, self.mode_var, self.purpose_var,
+        ]
 
     def clear_fields(self):
         """Setzt die Eingabefelder zurück."""
@@ -933,10 +1500,17 @@ class TrafficDiaryApp:
         Alle Dateien im CHART_DIRECTORY werden ebenfalls gelöscht.
         """
         self.user_menu.set("")
-        if os.path.exists(USER_FILE):
-            os.remove(USER_FILE)
-        if os.path.exists(DATA_FILE):
-            os.remove(DATA_FILE)
+        invalidate_analysis_cache()
+        try:
+            for file_name in (USER_FILE, DATA_FILE):
+                # unter der Sperre, damit kein gerade laufender Schreibvorgang einer anderen Instanz zerschossen wird
+                with file_lock(file_name):
+                    if os.path.exists(file_name):
+                        os.remove(file_name)
+        except TimeoutError as e:
+            handle_error(str(e), self.message_label)
+            return
+        session_store()     # entfernt Binärdatei und Wörterbuch und leert den Sitzungsspeicher
         if os.path.exists(CHART_DIRECTORY):
             for filename in os.listdir(CHART_DIRECTORY):
                 file_path = os.path.join(CHART_DIRECTORY, filename)
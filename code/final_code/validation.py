@@ -0,0 +1,150 @@
+# This module checks the traffic diary for data-quality problems.
+# Rules are declared once in VALIDATION_RULES and evaluated vectorized over the whole diary.
+
+import numpy as np
+import pandas as pd
+
+from logic import START_EPOCH, END_EPOCH, DURATION, START_LAT, TRIP_COLUMNS, format_trip_times
+from analysis import COLOR_MAP_MODE, COLOR_MAP_PURPOSE, MAX_PLAUSIBLE_SPEED
+from tours import same_place, trip_places
+
+# global constants
+MAX_TRIP_DURATION_S = 24 * 3600
+MAX_SAME_DAY_GAP_S = 12 * 3600      # größere Lücken gelten nicht mehr als fehlender Weg
+MAX_DETAIL_ROWS = 5000              # Detailtabelle begrenzen, die Zusammenfassung zählt immer alles
+
+
+def _context(df):
+    """
+    Bereitet einmalig alle Arrays vor, die mehrere Regeln brauchen
+    (Daten sind nach Person und Startzeit sortiert).
+    """
+    user = df["Benutzer/in"].to_numpy()
+    start = df[START_EPOCH].to_numpy()
+    end = df[END_EPOCH].to_numpy()
+    distance = pd.to_numeric(df["Distanz (km)"], errors="coerce").to_numpy(dtype="float64")
+    same_user_prev = np.zeros(len(df), dtype=bool)
+    same_user_prev[1:] = user[1:] == user[:-1]
+    (start_lat, start_lon, start_place), (end_lat, end_lon, end_place) = trip_places(df)
+    return {
+        "start": start, "end": end, "distance": distance, "same_user_prev": same_user_prev,
+        "start_lat": start_lat, "start_lon": start_lon, "start_place": start_place,
+        "end_lat": end_lat, "end_lon": end_lon, "end_place": end_place,
+    }
+
+
+def _previous(values, fill):
+    shifted = np.empty_like(values)
+    shifted[0] = fill
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+# ------------------ Regeln ------------------
+def rule_missing_fields(df, ctx):
+    columns = TRIP_COLUMNS
+    if START_LAT in df.columns:
+        # Wege aus dem Sitzungsspeicher: Punkte mit Koordinaten haben keinen Adresstext
+        columns = [c for c in TRIP_COLUMNS if c not in ("Startpunkt", "Endpunkt")]
+    missing = df[columns].isna().to_numpy().any(axis=1)
+    missing |= np.isnan(ctx["start_lat"]) & df["Startpunkt"].isna().to_numpy()
+    missing |= np.isnan(ctx["end_lat"]) & df["Endpunkt"].isna().to_numpy()
+    for col in ("Benutzer/in", "Startpunkt", "Endpunkt", "Modus", "Wegezweck"):
+        missing |= (df[col] == "").to_numpy()
+    return missing
+
+
+def rule_invalid_distance(df, ctx):
+    return np.isnan(ctx["distance"])
+
+
+def rule_zero_distance(df, ctx):
+    return ctx["distance"] == 0
+
+
+def rule_end_before_start(df, ctx):
+    return ctx["end"] < ctx["start"]
+
+
+def rule_too_long(df, ctx):
+    return (ctx["end"] - ctx["start"]) > MAX_TRIP_DURATION_S
+
+
+def rule_duration_mismatch(df, ctx):
+    return df[DURATION].to_numpy() != ctx["end"] - ctx["start"]
+
+
+def rule_overlap(df, ctx):
+    # Start vor dem Ende des vorherigen Weges derselben Person
+    return ctx["same_user_prev"] & (ctx["start"] < _previous(ctx["end"], 0))
+
+
+def rule_location_gap(df, ctx):
+    # Nächster Weg am selben Tag beginnt woanders, als der vorherige endete -> Weg fehlt vermutlich
+    gap = ctx["start"] - _previous(ctx["end"], 0)
+    moved = ~same_place(
+        _previous(ctx["end_lat"], np.nan), _previous(ctx["end_lon"], np.nan), _previous(ctx["end_place"], -1),
+        ctx["start_lat"], ctx["start_lon"], ctx["start_place"],
+    )
+    same_day = (ctx["start"] // 86400) == (_previous(ctx["end"], 0) // 86400)
+    return ctx["same_user_prev"] & same_day & (gap >= 0) & (gap <= MAX_SAME_DAY_GAP_S) & moved
+
+
+def rule_implausible_speed(df, ctx):
+    hours = (ctx["end"] - ctx["start"]) / 3600
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(hours > 0, ctx["distance"] / hours, np.nan)
+    max_speed = df["Modus"].map(MAX_PLAUSIBLE_SPEED).fillna(np.inf).to_numpy(dtype="float64")
+    return speed > max_speed
+
+
+def rule_unknown_category(df, ctx):
+    return (~df["Modus"].isin(COLOR_MAP_MODE) | ~df["Wegezweck"].isin(COLOR_MAP_PURPOSE)).to_numpy()
+
+
+# (Name, Beschreibung, Prüffunktion) - die Funktion liefert eine boolesche Maske (True = Verstoß)
+VALIDATION_RULES = [
+    ("Fehlende Angaben", "Mindestens ein Pflichtfeld ist leer.", rule_missing_fields),
+    ("Distanz ungültig", "Distanz fehlt oder ist keine Zahl.", rule_invalid_distance),
+    ("Distanz 0 km", "Start- und Endpunkt liegen aufeinander.", rule_zero_distance),
+    ("Ende vor Start", "Endzeit liegt vor der Startzeit.", rule_end_before_start),
+    ("Sehr lange Dauer", "Weg dauert länger als 24 Stunden.", rule_too_long),
+    ("Dauer inkonsistent", "Gespeicherte Dauer passt nicht zu Start- und Endzeit.", rule_duration_mismatch),
+    ("Überschneidung", "Weg beginnt vor dem Ende des vorherigen Weges der Person.", rule_overlap),
+    ("Lücke", "Weg beginnt woanders, als der vorherige Weg am selben Tag endete.", rule_location_gap),
+    ("Unplausible Geschwindigkeit", "Durchschnittsgeschwindigkeit zu hoch für das Verkehrsmittel.", rule_implausible_speed),
+    ("Unbekannte Kategorie", "Verkehrsmittel oder Wegezweck ist nicht vorgesehen.", rule_unknown_category),
+]
+
+
+def validate_trips(df, rules=VALIDATION_RULES):
+    """
+    Prüft alle Wege gegen die Regeln.
+    Gibt (summary, details) zurück:
+    - summary: Anzahl der Verstöße je Regel (inkl. Beschreibung)
+    - details: eine Zeile je Verstoß mit Person, Startzeit, Regel und der Zeilennummer in der Datei
+      (höchstens MAX_DETAIL_ROWS Zeilen, in der Reihenfolge der Regeln)
+    """
+    df = df.reset_index(drop=True).rename_axis("Zeile")
+    df.index = df.index + 2     # Zeilennummer in der CSV-Datei (Kopfzeile = 1)
+    df = df.sort_values(["Benutzer/in", START_EPOCH], kind="stable")
+    ctx = _context(df)
+
+    masks = {name: np.asarray(check(df, ctx), dtype=bool) for name, _, check in rules}
+    summary = pd.DataFrame(
+        {
+            "Verstöße": [int(mask.sum()) for mask in masks.values()],
+            "Beschreibung": [description for _, description, _ in rules],
+        },
+        index=pd.Index(list(masks), name="Regel"),
+    )
+
+    # Anzeige-Strings nur für die betroffenen Zeilen ableiten
+    hits = [(name, np.flatnonzero(mask)) for name, mask in masks.items() if mask.any()]
+    positions = np.concatenate([pos for _, pos in hits]) if hits else np.array([], dtype="int64")
+    rule_names = np.repeat([name for name, _ in hits], [len(pos) for _, pos in hits])
+    positions, rule_names = positions[:MAX_DETAIL_ROWS], rule_names[:MAX_DETAIL_ROWS]
+    shown = format_trip_times(df.iloc[positions][["Benutzer/in", START_EPOCH, END_EPOCH, "Modus", "Distanz (km)"]])
+    shown.insert(0, "Regel", rule_names)
+    details = shown[["Regel", "Benutzer/in", "Startzeit_kombiniert", "Endzeit_kombiniert", "Modus", "Distanz (km)"]]
+    return summary, details.sort_index(kind="stable")
@@ -0,0 +1,169 @@
+# This module notices changes to the shared data files made by other program instances.
+# On Linux it uses inotify (via ctypes), elsewhere it falls back to polling the file status; only appended bytes are read.
+
+import ctypes
+import ctypes.util
+import io
+import os
+import struct
+import sys
+
+import pandas as pd
+
+# global constants
+WATCH_INTERVAL_MS = 500         # Abstand der Prüfungen in der Tk-Ereignisschleife
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_EVENTS = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, len (struct inotify_event ohne Namen)
+_READ_SIZE = 64 * 1024
+
+
+def _load_libc():
+    """libc mit inotify-Funktionen oder None (kein Linux, z.B. Windows/macOS)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _file_state(file_name):
+    """Inode, Größe und Änderungszeit einer Datei (None, wenn sie fehlt)."""
+    try:
+        st = os.stat(file_name)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class FileWatcher:
+    """
+    Überwacht einzelne Dateien auf Änderungen. poll() blockiert nie und wird aus der
+    Tk-Ereignisschleife (after) aufgerufen, es gibt also keinen eigenen Thread.
+    Mit inotify werden nur Dateien geprüft, zu denen der Kernel ein Ereignis gemeldet hat;
+    ohne inotify wird bei jedem Aufruf der Status aller Dateien verglichen.
+    """
+
+    def __init__(self, files):
+        self.files = {os.path.abspath(f) for f in files}
+        self.states = {f: _file_state(f) for f in self.files}
+        self.fd = None
+        self.watches = {}
+        self._start_inotify()
+
+    def _start_inotify(self):
+        libc = _load_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return
+        # Verzeichnisse beobachten: atomar ersetzte Dateien (neue Inode) bleiben so erfasst
+        for directory in {os.path.dirname(f) for f in self.files}:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_EVENTS)
+            if wd < 0:
+                os.close(fd)
+                self.watches = {}
+                return
+            self.watches[wd] = directory
+        self.fd = fd
+
+    @property
+    def uses_inotify(self):
+        return self.fd is not None
+
+    def _pending_files(self):
+        """Liest alle anstehenden inotify-Ereignisse und gibt die betroffenen überwachten Dateien zurück."""
+        pending = set()
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                return pending
+            if not data:
+                return pending
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Ereignisse verloren: alle Dateien prüfen
+                    pending |= self.files
+                elif wd in self.watches:
+                    path = os.path.join(self.watches[wd], os.fsdecode(name))
+                    if path in self.files:
+                        pending.add(path)
+
+    def poll(self):
+        """Gibt die überwachten Dateien zurück, die sich seit dem letzten Aufruf geändert haben."""
+        candidates = self._pending_files() if self.fd is not None else self.files
+        changed = set()
+        for file_name in candidates:
+            state = _file_state(file_name)
+            # Auch die eigenen Schreibvorgänge lösen Ereignisse aus; nur echte Änderungen melden
+            if state != self.states[file_name]:
+                self.states[file_name] = state
+                changed.add(file_name)
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class CsvTail:
+    """
+    Liest von einer CSV-Datei nur die seit dem letzten Aufruf angehängten Zeilen.
+    Wurde die Datei ersetzt (andere Inode, z.B. durch write_csv_atomic) oder gekürzt,
+    wird sie einmal vollständig gelesen.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.ino = None
+        self.offset = 0
+        self.header = b""
+
+    def read(self):
+        """
+        Gibt (neu_geladen, df) zurück. Bei neu_geladen=True enthält 'df' die ganze Datei,
+        sonst nur die neuen Zeilen (ggf. leer). 'df' ist None, wenn die Datei fehlt oder leer ist.
+        """
+        try:
+            f = open(self.file_name, "rb")
+        except FileNotFoundError:
+            reset = self.ino is not None
+            self.ino, self.offset, self.header = None, 0, b""
+            return reset, None
+        with f:
+            # Status über den geöffneten Deskriptor: passt sicher zu den gelesenen Bytes
+            st = os.fstat(f.fileno())
+            reset = st.st_ino != self.ino or st.st_size < self.offset
+            if reset:
+                self.ino, self.offset, self.header = st.st_ino, 0, b""
+            f.seek(self.offset)
+            tail = f.read(st.st_size - self.offset)
+        # eine gerade erst angehängte, unvollständige Zeile wird beim nächsten Mal gelesen
+        complete = tail[:tail.rfind(b"\n") + 1]
+        if self.offset == 0:
+            # erste vollständige Zeile ist die Kopfzeile; sie wird jedem Delta vorangestellt
+            self.header = complete[:complete.find(b"\n") + 1]
+            rows = complete[len(self.header):]
+        else:
+            rows = complete
+        self.offset += len(complete)
+        if not self.header:
+            return reset, None
+        return reset, pd.read_csv(io.BytesIO(self.header + rows))
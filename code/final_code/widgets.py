@@ -0,0 +1,345 @@
+# This module contains reusable Tkinter widgets that have to stay fast for large participant lists.
+# The participant selector only creates widgets for the visible rows and reuses them while scrolling.
+# The address suggestion list answers from a local index on every keystroke and merges remote results later.
+
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+# global constants
+ROW_HEIGHT = 24                 # Pixel pro Zeile in der Teilnehmerliste
+DEFAULT_VISIBLE_ROWS = 15
+FILTER_DELAY_MS = 120           # Filter erst nach kurzer Tipp-Pause anwenden
+SUGGESTION_ROWS = 8
+REMOTE_DELAY_MS = 350           # Online-Vorschläge erst nach einer Tipp-Pause anfragen
+REMOTE_POLL_MS = 50
+
+
+class PrefixIndex:
+    """
+    Sortierter Index über alle Namensbestandteile (Vorname, Nachname, voller Name) in Kleinbuchstaben.
+    Ein Präfix wird per Binärsuche in O(log n + Treffer) gefunden; mehrere Suchwörter werden geschnitten.
+    """
+
+    def __init__(self, names):
+        keys = []
+        positions = []
+        for i, name in enumerate(names):
+            lowered = name.lower()
+            keys.append(lowered)
+            positions.append(i)
+            for part in lowered.split()[1:]:
+                keys.append(part)
+                positions.append(i)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.positions = np.asarray(positions, dtype="int64")[order]
+
+    def lookup(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff")
+        return np.unique(self.positions[lo:hi])
+
+    def search(self, query):
+        """Gibt die (aufsteigend sortierten) Positionen aller Namen zurück, die zu jedem Suchwort passen."""
+        result = None
+        for word in query.lower().split():
+            hits = self.lookup(word)
+            result = hits if result is None else np.intersect1d(result, hits, assume_unique=True)
+        return result
+
+
+class ParticipantSelector(ttk.Frame):
+    """
+    Virtualisierte, durchsuchbare Teilnehmerliste mit Checkboxen.
+    - Es existieren nur so viele Checkbuttons, wie Zeilen sichtbar sind; beim Scrollen werden sie neu beschriftet.
+    - Die Auswahl liegt als boolesches Array vor (eine Position je Teilnehmer/in).
+    - "Alle"/"Keine" wirken auf die aktuell gefilterten Namen, Umschalt+Klick wählt einen Bereich.
+    - 'groups' (Name -> Bitmap oder Liste von Positionen) erlaubt die Auswahl ganzer Kohorten über ein Auswahlfeld.
+    """
+
+    def __init__(self, master, names, groups=None, selected=True, visible_rows=DEFAULT_VISIBLE_ROWS):
+        super().__init__(master)
+        self.names = list(names)
+        self.groups = dict(groups or {})
+        self.selected = np.full(len(self.names), bool(selected))
+        self.filtered = np.arange(len(self.names))
+        self.offset = 0
+        self._index = None          # wird erst beim ersten Suchen aufgebaut
+        self._filter_job = None
+        self._anchor = None         # letzte angeklickte Position für Umschalt+Klick
+
+        # --- Suche und Sammelaktionen ---
+        tools = ttk.Frame(self)
+        tools.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        ttk.Label(tools, text="Suchen:").pack(side=tk.LEFT)
+        self.query_var = tk.StringVar()
+        self.query_var.trace_add("write", self._schedule_filter)
+        ttk.Entry(tools, textvariable=self.query_var, width=25).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tools, text="Alle", width=6, command=lambda: self.set_filtered(True)).pack(side=tk.LEFT)
+        ttk.Button(tools, text="Keine", width=6, command=lambda: self.set_filtered(False)).pack(side=tk.LEFT, padx=(5, 0))
+
+        group_frame = ttk.Frame(self)
+        group_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        ttk.Label(group_frame, text="Kohorte:").pack(side=tk.LEFT)
+        self.group_var = tk.StringVar()
+        self.group_box = ttk.Combobox(
+            group_frame, textvariable=self.group_var, values=list(self.groups), state="readonly", width=25
+        )
+        self.group_box.pack(side=tk.LEFT, padx=5)
+        ttk.Button(group_frame, text="Hinzufügen", command=lambda: self.set_group(True)).pack(side=tk.LEFT)
+        ttk.Button(group_frame, text="Entfernen", command=lambda: self.set_group(False)).pack(side=tk.LEFT, padx=(5, 0))
+
+        # --- Liste: fester Pool an Zeilen + Scrollbar ---
+        list_frame = ttk.Frame(self, height=visible_rows * ROW_HEIGHT)
+        list_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        list_frame.pack_propagate(False)
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.rows_frame = ttk.Frame(list_frame)
+        self.rows_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.rows_frame.bind("<Configure>", self._on_resize)
+        self.row_vars = []
+        self.row_buttons = []
+        self._create_rows(visible_rows)
+
+        self.count_label = ttk.Label(self, text="")
+        self.count_label.pack(side=tk.TOP, anchor="w", pady=(5, 0))
+        self.refresh()
+
+    # ------------------ Zeilen-Pool ------------------
+    def _create_rows(self, count):
+        while len(self.row_buttons) < count:
+            slot = len(self.row_buttons)
+            var = tk.BooleanVar()
+            button = ttk.Checkbutton(self.rows_frame, variable=var, command=lambda s=slot: self._on_toggle(s))
+            button.place(x=0, y=slot * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT)
+            button.bind("<Shift-Button-1>", lambda event, s=slot: self._on_range_toggle(s))
+            for widget in (button, self.rows_frame):
+                widget.bind("<MouseWheel>", self._on_mousewheel)
+                widget.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+                widget.bind("<Button-5>", lambda event: self.scroll_rows(3))
+            self.row_vars.append(var)
+            self.row_buttons.append(button)
+
+    def _on_resize(self, event):
+        needed = max(1, event.height // ROW_HEIGHT)
+        if needed > len(self.row_buttons):
+            self._create_rows(needed)
+        self.refresh()
+
+    def _visible_count(self):
+        height = self.rows_frame.winfo_height()
+        rows = height // ROW_HEIGHT if height > 1 else len(self.row_buttons)
+        return max(1, min(rows, len(self.row_buttons)))
+
+    def refresh(self):
+        """Beschriftet die sichtbaren Zeilen für den aktuellen Ausschnitt neu."""
+        visible = self._visible_count()
+        total = len(self.filtered)
+        self.offset = max(0, min(self.offset, total - visible))
+        for slot, (button, var) in enumerate(zip(self.row_buttons, self.row_vars)):
+            row = self.offset + slot
+            if slot < visible and row < total:
+                position = self.filtered[row]
+                button.configure(text=self.names[position])
+                var.set(bool(self.selected[position]))
+                button.place(x=0, y=slot * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT)
+            else:
+                button.place_forget()
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+        self.count_label.configure(
+            text=f"{int(self.selected.sum())} von {len(self.names)} ausgewählt ({total} angezeigt)"
+        )
+
+    # ------------------ Scrollen ------------------
+    def scroll_rows(self, rows):
+        self.offset += rows
+        self.refresh()
+
+    def _on_scroll(self, action, amount, unit=None):
+        visible = self._visible_count()
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.filtered))
+        elif unit == "pages":
+            self.offset += int(amount) * visible
+        else:
+            self.offset += int(amount)
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+
+    # ------------------ Auswahl ------------------
+    def _on_toggle(self, slot):
+        row = self.offset + slot
+        self.selected[self.filtered[row]] = self.row_vars[slot].get()
+        self._anchor = row
+        self.refresh()
+
+    def _on_range_toggle(self, slot):
+        # Bereich zwischen letzter und aktueller Zeile auf den neuen Zustand der angeklickten Zeile setzen
+        row = self.offset + slot
+        if self._anchor is None or self._anchor >= len(self.filtered):
+            return None
+        lo, hi = sorted((self._anchor, row))
+        self.selected[self.filtered[lo:hi + 1]] = not self.selected[self.filtered[row]]
+        self._anchor = row
+        self.refresh()
+        return "break"
+
+    def set_filtered(self, value):
+        """Wählt alle aktuell angezeigten (gefilterten) Namen aus oder ab."""
+        self.selected[self.filtered] = value
+        self.refresh()
+
+    def set_group(self, value):
+        """Nimmt die gewählte Kohorte (Bitmap oder Positionen) in die Auswahl auf bzw. entfernt sie."""
+        members = self.groups.get(self.group_var.get())
+        if members is not None:
+            self.selected[np.asarray(members)] = value
+            self.refresh()
+
+    def set_groups(self, groups):
+        """Ersetzt die wählbaren Kohorten (z.B. nachdem eine neue gespeichert wurde)."""
+        self.groups = dict(groups)
+        self.group_box.configure(values=list(self.groups))
+
+    def get_selected(self):
+        """Gibt die Namen aller ausgewählten Teilnehmer/innen zurück."""
+        return [self.names[i] for i in np.flatnonzero(self.selected)]
+
+    # ------------------ Filter ------------------
+    def _schedule_filter(self, *args):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        self._filter_job = None
+        query = self.query_var.get().strip()
+        if not query:
+            self.filtered = np.arange(len(self.names))
+        else:
+            if self._index is None:
+                self._index = PrefixIndex(self.names)
+            self.filtered = self._index.search(query)
+        self.offset = 0
+        self._anchor = None
+        self.refresh()
+
+
+class AddressSuggestions(ttk.Frame):
+    """
+    Vorschlagsliste für ein Adress-Eingabefeld.
+    - Bei jedem Tastendruck fragt sie 'local_suggest(text)' (lokaler Index, synchron und schnell) ab.
+    - Nach einer Tipp-Pause von REMOTE_DELAY_MS wird 'remote' (Objekt mit request(text), poll() und pending) angefragt;
+      dessen Ergebnis wird per after() abgeholt und nur übernommen, wenn der Text noch aktuell ist.
+    - Auswahl per Doppelklick oder Enter ruft 'on_pick(text, (lat, lon) oder None)' auf.
+    Die Liste ist nur sichtbar, solange es Vorschläge gibt (der Aufrufer übergibt dafür 'pack_options').
+    """
+
+    def __init__(self, master, entry, variable, local_suggest, remote=None, on_pick=None,
+                 pack_options=None, rows=SUGGESTION_ROWS):
+        super().__init__(master)
+        self.entry = entry
+        self.variable = variable
+        self.local_suggest = local_suggest
+        self.remote = remote
+        self.on_pick = on_pick
+        self.pack_options = pack_options or {"fill": tk.X, "padx": 5}
+        self.rows = rows
+        self.suggestions = []
+        self._remote_job = None
+        self._poll_job = None
+        self._picking = False
+
+        self.listbox = tk.Listbox(self, height=rows, activestyle="dotbox")
+        self.listbox.pack(fill=tk.BOTH, expand=True)
+        self.listbox.bind("<Double-Button-1>", self._pick_selected)
+        self.listbox.bind("<Return>", self._pick_selected)
+        self.listbox.bind("<Escape>", lambda event: self.hide())
+        self.entry.bind("<Down>", self._focus_list)
+        self.entry.bind("<Escape>", lambda event: self.hide())
+        self.variable.trace_add("write", self._on_change)
+        self.bind("<Destroy>", self._on_destroy)
+
+    def _on_change(self, *args):
+        if self._picking:
+            return
+        query = self.variable.get().strip()
+        self.show(self.local_suggest(query) if query else [])
+        if self.remote is not None:
+            if self._remote_job is not None:
+                self.after_cancel(self._remote_job)
+            self._remote_job = self.after(REMOTE_DELAY_MS, self._request_remote) if query else None
+
+    def _request_remote(self):
+        self._remote_job = None
+        self.remote.request(self.variable.get().strip())
+        if self._poll_job is None:
+            self._poll_job = self.after(REMOTE_POLL_MS, self._poll_remote)
+
+    def _poll_remote(self):
+        self._poll_job = None
+        result = self.remote.poll()
+        if result is None:
+            if self.remote.pending:
+                self._poll_job = self.after(REMOTE_POLL_MS, self._poll_remote)
+            return
+        query, remote_suggestions = result
+        if query != self.variable.get().strip() or not remote_suggestions:
+            return
+        known = {text.lower() for text, _ in self.suggestions}
+        merged = self.suggestions + [(t, loc) for t, loc in remote_suggestions if t.lower() not in known]
+        self.show(merged[:self.rows])
+
+    def show(self, suggestions):
+        self.suggestions = list(suggestions)
+        self.listbox.delete(0, tk.END)
+        for text, _ in self.suggestions:
+            self.listbox.insert(tk.END, text)
+        if self.suggestions:
+            self.listbox.configure(height=min(self.rows, len(self.suggestions)))
+            if not self.winfo_ismapped():
+                self.pack(**self.pack_options)
+        else:
+            self.hide()
+
+    def hide(self):
+        self.pack_forget()
+
+    def _focus_list(self, event=None):
+        if self.suggestions:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def _pick_selected(self, event=None):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        text, location = self.suggestions[selection[0]]
+        self._picking = True
+        try:
+            self.variable.set(text)
+        finally:
+            self._picking = False
+        self.hide()
+        self.entry.focus_set()
+        self.entry.icursor(tk.END)
+        if self.on_pick is not None:
+            self.on_pick(text, location)
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        for job in (self._remote_job, self._poll_job):
+            if job is not None:
+                self.after_cancel(job)